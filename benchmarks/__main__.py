@@ -0,0 +1,154 @@
+"""Run the benchmark suite, optionally saving the results as json and comparing them against a previous run
+
+python -m benchmarks                                  every benchmark, with its default sizes
+python -m benchmarks crud builder --quick             a few benchmarks, with smaller sizes
+python -m benchmarks --json results.json              save the results to compare later, - writes them to stdout
+python -m benchmarks --compare baseline.json          exit with code 1 when a metric got worse than the threshold
+
+Results are matched against the baseline by their non float values, like benchmark, backend and rows, and every float
+value is compared. Values ending in per_second are better when higher, every other one, like seconds, the median or
+peak_mb, is better when lower. min and max are kept in the json but not compared, they are too noisy on a shared
+machine, run the baseline and the comparison on the same machine.
+"""
+import argparse
+import datetime
+import importlib
+import json
+import platform
+import sqlite3
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import sqlify
+from benchmarks.common import print_results
+
+# Benchmark name, module benchmarks.bench_<name>, and the arguments of its run for --quick
+SUITE: Dict[str, Dict[str, Any]] = dict(
+    builder=dict(number=10_000, repeat=1),
+    crud=dict(rows=1_000, calls=1_000, repeat=1),
+    sql_cache=dict(number=10_000),
+    query_ast=dict(number=10_000, repeat=1),
+    bulk_insert=dict(sizes=(1_000, 10_000), repeat=1),
+    bulk_update=dict(sizes=(1_000, 10_000), repeat=1),
+    upsert=dict(sizes=(1_000, 10_000), repeat=1),
+    commit_every=dict(size=1_000, repeat=1),
+    stream_memory=dict(sizes=(10_000, 100_000)),
+    fetch_arrays=dict(sizes=(10_000, 100_000)),
+    row_format=dict(sizes=(10_000,), repeat=1),
+    transfer=dict(sizes=(10_000, 100_000)),
+    parallel_fetch=dict(rows=50_000, repeat=1),
+    pool=dict(requests=100, repeat=1),
+    batch=dict(requests=20, repeat=1),
+)
+
+# Values of measure() that are saved but too noisy to compare between runs
+NOT_COMPARED = ("min", "max")
+
+
+def metadata() -> Dict[str, Any]:
+    return dict(
+        sqlify=sqlify.__version__,
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        sqlite=sqlite3.sqlite_version,
+        platform=platform.platform(),
+        machine=platform.machine(),
+        created=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    )
+
+
+def run(names: List[str], quick: bool = False, echo: bool = True) -> Dict[str, Any]:
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    for name in names:
+        module = importlib.import_module(f"benchmarks.bench_{name}")
+        results[name] = module.run(**SUITE[name]) if quick else module.run()
+        if echo:
+            print(f"# {name}")
+            print_results(results[name])
+
+    return dict(metadata=metadata(), quick=quick, results=results)
+
+
+def _key(result: Dict[str, Any]) -> Tuple:
+    return tuple((key, value) for key, value in result.items() if not isinstance(value, float))
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """Every compared metric present in both runs, with its relative change, positive when it got better
+    threshold = relative change past which a metric is reported as a regression or an improvement
+    """
+    changes = []
+    for name, results in current["results"].items():
+        previous = {_key(result): result for result in baseline["results"].get(name, [])}
+
+        for result in results:
+            match = previous.get(_key(result))
+            if match is None:
+                continue
+
+            for metric, value in result.items():
+                old = match.get(metric)
+                if not isinstance(value, float) or not isinstance(old, float) or metric in NOT_COMPARED or not old:
+                    continue
+
+                change = (value - old) / old if metric.endswith("per_second") else (old - value) / old
+                status = "regression" if change < -threshold else "improvement" if change > threshold else "same"
+                changes.append(dict(
+                    suite=name, **dict(_key(result)), metric=metric, baseline=old, current=value, change=change,
+                    status=status,
+                ))
+
+    return changes
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Run the sqlify benchmark suite")
+    parser.add_argument("names", nargs="*", metavar="name",
+                        help=f"benchmarks to run, by default all of them: {', '.join(SUITE)}")
+    parser.add_argument("--quick", action="store_true", help="run with smaller sizes and a single repeat")
+    parser.add_argument("--json", metavar="PATH", help="save the results as json, - writes them to stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="json results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative change reported as a regression or improvement, 0.1 by default")
+    arguments = parser.parse_args(argv)
+
+    unknown = [name for name in arguments.names if name not in SUITE]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    # The text results go to stderr when the json takes stdout
+    stdout = sys.stdout
+    if arguments.json == "-":
+        sys.stdout = sys.stderr
+    try:
+        current = run(arguments.names or list(SUITE), quick=arguments.quick)
+
+        changes = []
+        if arguments.compare:
+            baseline = _load(arguments.compare)
+            changes = compare(baseline, current, arguments.threshold)
+            current["baseline"] = baseline["metadata"]
+            current["changes"] = changes
+
+            print(f"# compared against sqlify {baseline['metadata']['sqlify']} of {baseline['metadata']['created']}")
+            print_results([change for change in changes if change["status"] != "same"] or [dict(status="same")])
+    finally:
+        sys.stdout = stdout
+
+    if arguments.json == "-":
+        json.dump(current, sys.stdout, indent=2)
+        print()
+    elif arguments.json:
+        with open(arguments.json, "w") as f:
+            json.dump(current, f, indent=2)
+
+    return 1 if any(change["status"] == "regression" for change in changes) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
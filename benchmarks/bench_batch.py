@@ -0,0 +1,57 @@
+"""Independent fetchone calls one by one against a single batch() round-trip of json queries
+
+SQLIFY_BENCH_DSN=postgresql://... python -m benchmarks.bench_batch
+
+Batches only save round-trips on postgres, the benchmark needs a server reachable through psycopg2. The gain grows
+with the network latency, measure it against a server on another host to see the effect on a real deployment.
+"""
+import os
+from typing import Any, Dict, List
+
+from benchmarks.common import measure, print_results
+
+
+def run(queries: int = 8, requests: int = 200, repeat: int = 3) -> List[Dict[str, Any]]:
+    dsn = os.environ.get("SQLIFY_BENCH_DSN")
+    if not dsn:
+        print("SQLIFY_BENCH_DSN is not set, skipping")
+        return []
+
+    import psycopg2
+
+    from sqlify import Psycopg2Sqlify
+
+    connection = psycopg2.connect(dsn)
+    connection.autocommit = True
+    sqlify = Psycopg2Sqlify(connection.cursor())
+    names = ["pg_class", "pg_type", "pg_proc", "pg_attribute", "pg_namespace", "pg_index", "pg_am", "pg_database"]
+
+    def sequential():
+        for _ in range(requests):
+            for i in range(queries):
+                sqlify.fetchone("pg_class", fields="oid, relname", where=("relname = %s", [names[i % len(names)]]))
+
+    def batched():
+        for _ in range(requests):
+            with sqlify.batch() as batch:
+                handles = [
+                    batch.fetchone(
+                        "pg_class", fields="oid, relname", where=("relname = %s", [names[i % len(names)]]), json=True,
+                    )
+                    for i in range(queries)
+                ]
+            [handle.result() for handle in handles]
+
+    results = []
+    try:
+        for name, fn in (("sequential_fetchone", sequential), ("batch", batched)):
+            timing = measure(fn, repeat)
+            results.append(dict(benchmark=name, backend="psycopg2", queries=queries, requests=requests, **timing))
+    finally:
+        connection.close()
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,52 @@
+"""Builder overhead per call of the select, update, delete and bulk insert rendering, with and without the sql cache
+
+python -m benchmarks.bench_builder
+
+Only the sql rendering is measured, the cursor is a mock that is never called.
+"""
+import timeit
+from typing import Any, Callable, Dict, List
+from unittest import mock
+
+from benchmarks.bench_sql_cache import SHAPES
+from benchmarks.common import print_results
+from sqlify import IncreaseSQL, RawSQL, Sqlite3Sqlify
+from sqlify.cache import SqlCache
+
+UPDATES = dict(
+    single_column=dict(table="books", data=dict(name="A book"), conditions=["id = :id"]),
+    operators=dict(table="books", data=dict(name="A book", stock=IncreaseSQL(1), updated=RawSQL("CURRENT_TIMESTAMP")),
+                   conditions=["id = :id", "stock > 0"], returning=["id", "stock"]),
+)
+
+
+def _calls(sqlify: Sqlite3Sqlify) -> Dict[str, Callable[[], Any]]:
+    calls: Dict[str, Callable[[], Any]] = {}
+    for shape, arguments in SHAPES.items():
+        calls[f"select/{shape}"] = lambda arguments=arguments: sqlify._select(**arguments)
+    for shape, arguments in UPDATES.items():
+        calls[f"update/{shape}"] = lambda arguments=arguments: sqlify._render_update(**arguments)
+    calls["delete/primary_key"] = lambda: sqlify._render_delete("books", "id = :id", returning="id")
+    calls["bulk_insert/100_rows"] = lambda: sqlify._format_bulk_insert("books", ["id", "name", "price"], 100)
+    return calls
+
+
+def run(number: int = 100_000, repeat: int = 3) -> List[Dict[str, Any]]:
+    results = []
+    variants = dict(
+        cached=Sqlite3Sqlify(mock.MagicMock(), sql_cache=SqlCache()),
+        uncached=Sqlite3Sqlify(mock.MagicMock(), sql_cache=None),
+    )
+
+    for cache, sqlify in variants.items():
+        for name, fn in _calls(sqlify).items():
+            method, shape = name.split("/")
+            seconds = min(timeit.repeat(fn, number=number, repeat=repeat))
+            results.append(dict(benchmark=method, shape=shape, cache=cache, calls=number,
+                                microseconds_per_call=seconds / number * 1_000_000))
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,51 @@
+"""Compare bulk_insert against looping over insert
+
+python -m benchmarks.bench_bulk_insert
+"""
+from typing import Dict, List, Any
+
+from benchmarks.common import measure, sqlite_sqlify, print_results
+
+SCHEMA = "id INTEGER PRIMARY KEY, name TEXT, price REAL, genre TEXT"
+
+
+def _rows(size: int):
+    return (dict(id=i, name=f"Book {i}", price=i * 1.23, genre="fiction") for i in range(size))
+
+
+def run(sizes=(1_000, 10_000, 100_000), repeat: int = 3) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        sqlify = sqlite_sqlify()
+
+        def setup():
+            sqlify.drop("books")
+            sqlify.create("books", SCHEMA)
+
+        def loop_insert():
+            setup()
+            for row in _rows(size):
+                sqlify.insert("books", data=row)
+
+        def bulk_insert():
+            setup()
+            sqlify.bulk_insert("books", _rows(size))
+
+        def bulk_insert_returning():
+            setup()
+            sqlify.bulk_insert("books", _rows(size), returning="id")
+
+        for name, fn in (
+                ("insert_loop", loop_insert),
+                ("bulk_insert", bulk_insert),
+                ("bulk_insert_returning", bulk_insert_returning),
+        ):
+            timing = measure(fn, repeat)
+            results.append(dict(benchmark=name, backend="sqlite3", rows=size, **timing,
+                                rows_per_second=size / timing["median"]))
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
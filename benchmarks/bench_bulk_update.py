@@ -0,0 +1,51 @@
+"""Compare bulk_update against one update per row
+
+python -m benchmarks.bench_bulk_update
+"""
+from typing import Any, Dict, List
+
+from benchmarks.common import measure, print_results, sqlite_sqlify
+
+SCHEMA = "id INTEGER PRIMARY KEY, name TEXT, price REAL"
+
+
+def _rows(size: int):
+    return (dict(id=i, name=f"Book {i}", price=i * 2.0) for i in range(size))
+
+
+def run(sizes=(1_000, 10_000, 50_000), repeat: int = 3) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        sqlify = sqlite_sqlify()
+        sqlify.create("books", SCHEMA)
+        sqlify.bulk_insert("books", (dict(id=i, name=f"Book {i}", price=i) for i in range(size)))
+
+        def update_loop():
+            for row in _rows(size):
+                sqlify.update("books", data=row, where=("id = :id", dict(id=row["id"])))
+
+        def bulk_update():
+            sqlify.bulk_update("books", _rows(size), key="id")
+
+        def bulk_update_case():
+            # Form used by sqlite versions older than 3.33
+            sqlify._update_from = False
+            try:
+                sqlify.bulk_update("books", _rows(size), key="id")
+            finally:
+                del sqlify._update_from
+
+        benchmarks = (
+            ("update_loop", update_loop),
+            ("bulk_update", bulk_update),
+            ("bulk_update_case", bulk_update_case),
+        )
+        for name, fn in benchmarks:
+            timing = measure(fn, repeat)
+            results.append(dict(benchmark=name, backend="sqlite3", rows=size, **timing))
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,64 @@
+"""Ingestion throughput with a commit per row, commit_every batches and a single commit, on a WAL sqlite file
+
+python -m benchmarks.bench_commit_every
+"""
+import os
+import sqlite3
+import tempfile
+from typing import Any, Dict, List
+
+from benchmarks.common import measure, print_results
+from sqlify import Sqlite3Sqlify
+
+SCHEMA = "id INTEGER PRIMARY KEY, name TEXT, price REAL"
+
+
+def run(size: int = 10_000, batches=(100, 1000), repeat: int = 3) -> List[Dict[str, Any]]:
+    directory = tempfile.mkdtemp()
+    connection = sqlite3.connect(os.path.join(directory, "bench.db"))
+    connection.execute("PRAGMA journal_mode=WAL")
+    sqlify = Sqlite3Sqlify(connection.cursor())
+    sqlify.create("books", SCHEMA)
+    connection.commit()
+
+    def rows():
+        return (dict(name=f"Book {i}", price=i * 1.5) for i in range(size))
+
+    def commit_per_row():
+        for row in rows():
+            sqlify.insert("books", row)
+            sqlify.commit()
+
+    def commit_every(n: int):
+        def ingest():
+            with sqlify.commit_every(n) as batch:
+                for row in rows():
+                    sqlify.insert("books", row)
+                    batch.step()
+        return ingest
+
+    def single_transaction():
+        with sqlify.transaction():
+            for row in rows():
+                sqlify.insert("books", row)
+
+    benchmarks = [("commit_per_row", commit_per_row)]
+    benchmarks.extend((f"commit_every_{n}", commit_every(n)) for n in batches)
+    benchmarks.append(("single_transaction", single_transaction))
+
+    results = []
+    try:
+        for name, fn in benchmarks:
+            timing = measure(fn, repeat)
+            results.append(dict(benchmark=name, backend="sqlite3", rows=size, **timing))
+    finally:
+        connection.close()
+        for filename in os.listdir(directory):
+            os.remove(os.path.join(directory, filename))
+        os.rmdir(directory)
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,71 @@
+"""Throughput of fetchone, fetchall, insert and update, against an in memory and an on disk sqlite database
+
+python -m benchmarks.bench_crud
+
+Each measured run is a single transaction, so the on disk numbers include one commit and not one per call.
+"""
+import os
+import sqlite3
+import tempfile
+from typing import Any, Dict, List
+
+from benchmarks.common import measure, print_results
+from sqlify import Sqlite3Sqlify
+
+SCHEMA = "id INTEGER PRIMARY KEY, name TEXT, price REAL, genre TEXT"
+
+
+def _fill(sqlify: Sqlite3Sqlify, rows: int) -> None:
+    sqlify.drop("books")
+    sqlify.create("books", SCHEMA)
+    with sqlify.transaction():
+        sqlify.bulk_insert(
+            "books", (dict(id=i, name=f"Book {i}", price=i * 1.23, genre="fiction") for i in range(rows))
+        )
+
+
+def _operations(sqlify: Sqlite3Sqlify, rows: int, calls: int) -> Dict[str, Any]:
+    def fetchone():
+        with sqlify.transaction():
+            for i in range(calls):
+                sqlify.fetchone("books", where=("id = :id", dict(id=i % rows)))
+
+    def fetchall():
+        with sqlify.transaction():
+            for _ in range(calls):
+                sqlify.fetchall("books", where=("genre = :genre", dict(genre="fiction")), limit=10)
+
+    def insert():
+        sqlify.delete("books", where=(f"id >= {rows}", []))
+        with sqlify.transaction():
+            for i in range(rows, rows + calls):
+                sqlify.insert("books", data=dict(id=i, name=f"Book {i}", price=i * 1.23, genre="fiction"))
+
+    def update():
+        with sqlify.transaction():
+            for i in range(calls):
+                sqlify.update("books", data=dict(price=i * 2.5), where=("id = :id", dict(id=i % rows)))
+
+    return dict(fetchone=fetchone, fetchall=fetchall, insert=insert, update=update)
+
+
+def run(rows: int = 10_000, calls: int = 10_000, repeat: int = 3) -> List[Dict[str, Any]]:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for backend, database in (("sqlite3", ":memory:"), ("sqlite3_file", os.path.join(directory, "crud.db"))):
+            connection = sqlite3.connect(database)
+            sqlify = Sqlite3Sqlify(connection.cursor())
+            _fill(sqlify, rows)
+
+            for name, fn in _operations(sqlify, rows, calls).items():
+                timing = measure(fn, repeat)
+                results.append(dict(benchmark=name, backend=backend, rows=rows, calls=calls, **timing,
+                                    operations_per_second=calls / timing["median"]))
+
+            connection.close()
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,51 @@
+"""Peak memory and time of fetch_arrays against fetchall followed by a per column conversion
+
+python -m benchmarks.bench_fetch_arrays
+"""
+import time
+import tracemalloc
+from array import array
+from typing import Any, Callable, Dict, List
+
+from benchmarks.common import print_results, sqlite_sqlify
+from sqlify.columnar import numpy
+
+SCHEMA = "id INTEGER PRIMARY KEY, price REAL, quantity INTEGER"
+
+
+def _peak(fn: Callable[[], Any]) -> Dict[str, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return dict(seconds=time.perf_counter() - start, peak_mb=peak / 1024 / 1024)
+
+
+def run(sizes=(100_000, 1_000_000), batch_size: int = 10000) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        sqlify = sqlite_sqlify()
+        sqlify.create("books", SCHEMA)
+        sqlify.bulk_insert("books", (dict(id=i, price=i * 1.23, quantity=i % 100) for i in range(size)))
+
+        def fetchall_then_convert():
+            rows = sqlify.fetchall("books")
+            convert = numpy.array if numpy is not None else lambda values: array("d", values)
+            return {column: convert([row[i] for row in rows]) for i, column in enumerate(["id", "price", "quantity"])}
+
+        def fetch_arrays():
+            return sqlify.fetch_arrays("books", batch_size=batch_size)
+
+        backend = "numpy" if numpy is not None else "array"
+        for name, fn in (("fetchall_then_convert", fetchall_then_convert), ("fetch_arrays", fetch_arrays)):
+            results.append(dict(benchmark=name, backend=f"sqlite3+{backend}", rows=size, **_peak(fn)))
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,73 @@
+"""A dozen independent aggregates run one after the other against parallel_fetch on pooled connections
+
+python -m benchmarks.bench_parallel_fetch
+
+sqlite releases the GIL while a query runs, so independent aggregates overlap on a multi-core machine, a single
+core only measures the threading overhead. Set
+SQLIFY_BENCH_DSN to also measure a postgres server through psycopg2, with the same aggregates over generate_series.
+"""
+import os
+import sqlite3
+import tempfile
+from typing import Any, Dict, List
+
+from benchmarks.common import measure, print_results
+from sqlify import Session, SessionPool
+
+# Integer arithmetic instead of %, which psycopg2 reads as a placeholder
+QUERIES = [
+    ("fetchone", dict(table="sales", fields="sum(amount), count(*)", where=f"store - store / 12 * 12 = {i}"))
+    for i in range(12)
+]
+
+
+def _compare(name: str, pool: SessionPool, workers: int, repeat: int) -> List[Dict[str, Any]]:
+    def sequential():
+        with pool.session() as sqlify:
+            return [getattr(sqlify, method)(**kwargs) for method, kwargs in QUERIES]
+
+    def parallel():
+        return pool.parallel_fetch(QUERIES, workers=workers)
+
+    return [
+        dict(benchmark=benchmark, backend=name, queries=len(QUERIES), workers=workers, **measure(fn, repeat))
+        for benchmark, fn in (("sequential", sequential), ("parallel_fetch", parallel))
+    ]
+
+
+def run(rows: int = 500_000, workers: int = 4, repeat: int = 3) -> List[Dict[str, Any]]:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "bench.db")
+        with Session(sqlite3.connect(database)) as sqlify:
+            sqlify.create("sales", "id INTEGER PRIMARY KEY, store INTEGER, amount REAL")
+            sqlify.bulk_insert("sales", (dict(id=i, store=i % 97, amount=i * 0.1) for i in range(rows)))
+
+        pool = SessionPool(lambda: sqlite3.connect(database, check_same_thread=False), max_size=workers)
+        try:
+            results.extend(_compare("sqlite3", pool, workers, repeat))
+        finally:
+            pool.close()
+
+    dsn = os.environ.get("SQLIFY_BENCH_DSN")
+    if dsn:
+        import psycopg2
+
+        pool = SessionPool(lambda: psycopg2.connect(dsn), max_size=workers)
+        try:
+            with pool.session() as sqlify:
+                sqlify.drop("sales")
+                sqlify.execute(
+                    "CREATE TABLE sales AS SELECT i AS id, mod(i, 97) AS store, i * 0.1 AS amount "
+                    "FROM generate_series(1, %s) AS i",
+                    [rows],
+                )
+            results.extend(_compare("psycopg2", pool, workers, repeat))
+        finally:
+            pool.close()
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,78 @@
+"""Per request latency with and without SessionPool
+
+python -m benchmarks.bench_pool
+
+Besides a local sqlite file, a postgres stand-in is measured: a sqlite connection that waits handshake_ms before
+returning, like the tcp and authentication round-trips of a local postgres. Set SQLIFY_BENCH_DSN to also measure a
+real postgres server through psycopg2.
+"""
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks.common import measure, print_results
+from sqlify import Session, SessionPool
+
+
+def _request(session: Session) -> None:
+    with session as sqlify:
+        sqlify.fetchone("books", where=("id = ?", [1]))
+
+
+def _postgres_request(session: Session) -> None:
+    with session as sqlify:
+        sqlify.fetchone("pg_class", fields="1", where=("relname = %s", ["pg_class"]))
+
+
+def _targets(database: str, handshake_ms: float) -> Dict[str, Callable[[], Any]]:
+    def sqlite_connect():
+        return sqlite3.connect(database, check_same_thread=False)
+
+    def stand_in_connect():
+        time.sleep(handshake_ms / 1000)
+        return sqlite_connect()
+
+    targets = dict(sqlite_file=sqlite_connect, postgres_stand_in=stand_in_connect)
+
+    dsn = os.environ.get("SQLIFY_BENCH_DSN")
+    if dsn:
+        import psycopg2
+
+        targets["postgres"] = lambda: psycopg2.connect(dsn)
+
+    return targets
+
+
+def run(requests: int = 1000, handshake_ms: float = 2.0, repeat: int = 3) -> List[Dict[str, Any]]:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "bench.db")
+        with Session(sqlite3.connect(database)) as sqlify:
+            sqlify.create("books", "id INTEGER PRIMARY KEY, name TEXT")
+            sqlify.insert("books", data=dict(id=1, name="Book"))
+
+        for target, connect in _targets(database, handshake_ms).items():
+            request = _postgres_request if target == "postgres" else _request
+            pool = SessionPool(connect, min_size=1, max_size=4)
+
+            def without_pool():
+                for _ in range(requests):
+                    request(Session(connect()))
+
+            def with_pool():
+                for _ in range(requests):
+                    request(pool.session())
+
+            for name, fn in (("without_pool", without_pool), ("with_pool", with_pool)):
+                timing = measure(fn, repeat)
+                results.append(dict(benchmark=name, target=target, requests=requests,
+                                    microseconds_per_request=timing["median"] / requests * 1_000_000))
+            pool.close()
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
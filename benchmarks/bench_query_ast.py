@@ -0,0 +1,113 @@
+"""Select statements from query nodes against the string concatenation chain the builder used before
+
+legacy = the previous chain of per clause helpers, run on every call
+render = rendering the Select node, which now only happens on a sql cache miss
+select = BaseSqlify._select with the default cache, lowering the arguments into the key and looking it up
+
+python -m benchmarks.bench_query_ast
+"""
+import timeit
+from typing import Any, Dict, List
+from unittest import mock
+
+from benchmarks.bench_sql_cache import SHAPES
+from benchmarks.common import print_results
+from sqlify import Sqlite3Sqlify
+from sqlify.cache import SqlCache
+from sqlify.query import Select
+
+
+class LegacyRenderer(object):
+    """Copy of the concatenation based _render_select, kept here as the baseline"""
+
+    def render(self, table=None, fields=(), where=None, group=None, having=None, order=None, limit=None, offset=None,
+               with_sq=None) -> str:
+        return (
+            self._with_sq(with_sq)
+            + f"SELECT {self._fields(fields)} FROM {table}"
+            + self._where(where)
+            + self._group(group)
+            + self._having(having)
+            + self._order(order)
+            + self._limit(limit)
+            + self._offset(offset)
+        )
+
+    def _where(self, conditions=None) -> str:
+        if not conditions:
+            return ""
+        if isinstance(conditions, list):
+            return f" WHERE {' AND '.join(conditions)}"
+        return f" WHERE {conditions}"
+
+    def _having(self, having=None) -> str:
+        if not having:
+            return ""
+        return f" HAVING {having}"
+
+    def _with_sq(self, with_sq=None) -> str:
+        if not with_sq:
+            return ""
+        return "WITH " + ", ".join([f"{key} as ({value})" for key, value in with_sq.items()])
+
+    def _group(self, group=None) -> str:
+        if not group:
+            return ""
+        if isinstance(group, list):
+            return f" GROUP BY {', '.join(group)}"
+        return f" GROUP BY {group} "
+
+    def _order(self, order=None) -> str:
+        if not order:
+            return ""
+        if isinstance(order, str):
+            return f" ORDER BY {order}"
+        if isinstance(order[1], str):
+            return f" ORDER BY {order[0]} {order[1]}"
+        return f" ORDER BY {order[0]} {order[1].value}"
+
+    def _limit(self, limit) -> str:
+        if limit:
+            return f" LIMIT {limit}"
+        return ""
+
+    def _offset(self, offset) -> str:
+        if offset:
+            return f" OFFSET {offset}"
+        return ""
+
+    def _fields(self, fields) -> str:
+        if isinstance(fields, str):
+            return fields
+        return ', '.join(fields)
+
+
+def _node(sqlify: Sqlite3Sqlify, arguments: Dict[str, Any]) -> Select:
+    """The Select node _select lowers arguments into, rebuilt from the cache key"""
+    with mock.patch.object(sqlify, "_statement", side_effect=lambda key: key):
+        key = sqlify._select(**arguments)
+    return Select(*key[2:])
+
+
+def run(number: int = 100_000, repeat: int = 5) -> List[Dict[str, Any]]:
+    legacy = LegacyRenderer()
+    sqlify = Sqlite3Sqlify(mock.MagicMock(), sql_cache=SqlCache())
+
+    results = []
+    for shape, arguments in SHAPES.items():
+        node = _node(sqlify, arguments)
+        variants = dict(
+            legacy=lambda: legacy.render(**arguments),
+            render=lambda: sqlify._render(node),
+            select=lambda: sqlify._select(**arguments),
+        )
+        for name, fn in variants.items():
+            seconds = min(timeit.repeat(fn, number=number, repeat=repeat))
+            results.append(dict(benchmark=name, shape=shape, calls=number,
+                                microseconds_per_call=seconds / number * 1_000_000))
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,59 @@
+"""Memory held by a fetchall result and construction time, for each row format against dict rows
+
+python -m benchmarks.bench_row_format
+"""
+import sqlite3
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.common import measure, print_results
+from sqlify import RowFormat, Sqlite3Sqlify
+
+SCHEMA = "id INTEGER PRIMARY KEY, name TEXT, price REAL, genre TEXT"
+
+
+def _dict_row(cursor, row):
+    return {column[0]: row[i] for i, column in enumerate(cursor.description)}
+
+
+def _retained_mb(sqlify: Sqlite3Sqlify) -> float:
+    """Memory still allocated while the fetchall result is alive"""
+    tracemalloc.start()
+    try:
+        result = sqlify.fetchall("books")
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    del result
+    return current / 1024 / 1024
+
+
+def run(sizes=(10_000, 100_000), repeat: int = 3) -> List[Dict[str, Any]]:
+    # name, sqlite3 row factory, sqlify row format
+    variants: List[Tuple[str, Any, Optional[RowFormat]]] = [("dict", _dict_row, None), ("driver", None, None)]
+    variants.extend((row_format.value.lower(), None, row_format) for row_format in RowFormat)
+
+    results = []
+    for size in sizes:
+        connection = sqlite3.connect(":memory:")
+        Sqlite3Sqlify(connection.cursor()).create("books", SCHEMA)
+        Sqlite3Sqlify(connection.cursor()).bulk_insert(
+            "books", (dict(id=i, name=f"Book {i}", price=i * 1.23, genre="fiction") for i in range(size))
+        )
+
+        for name, row_factory, row_format in variants:
+            connection.row_factory = row_factory
+            sqlify = Sqlite3Sqlify(connection.cursor(), row_format=row_format)
+
+            timing = measure(lambda: sqlify.fetchall("books"), repeat)
+            retained_mb = _retained_mb(sqlify)
+            results.append(
+                dict(benchmark=f"fetchall_{name}", backend="sqlite3", rows=size, retained_mb=retained_mb, **timing)
+            )
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,37 @@
+"""Builder overhead of _select with and without the sql cache
+
+python -m benchmarks.bench_sql_cache
+"""
+import timeit
+from typing import Any, Dict, List
+from unittest import mock
+
+from benchmarks.common import print_results
+from sqlify import Sqlite3Sqlify
+from sqlify.cache import SqlCache
+
+SHAPES = dict(
+    primary_key=dict(table="books", fields="*", where="id = ?", limit=1),
+    listed_fields=dict(table="books", fields=["id", "name", "price"], where=["genre = ?", "price > ?"],
+                       order=("price", "DESC"), limit=10),
+    grouped=dict(table="books", fields=["genre", "count(*)"], group=["genre"], having="count(*) > 1",
+                 with_sq=dict(cheap="SELECT * FROM books WHERE price < 10")),
+)
+
+
+def run(number: int = 100_000) -> List[Dict[str, Any]]:
+    results = []
+    cached = Sqlite3Sqlify(mock.MagicMock(), sql_cache=SqlCache())
+    uncached = Sqlite3Sqlify(mock.MagicMock(), sql_cache=None)
+
+    for shape, arguments in SHAPES.items():
+        for name, sqlify in (("cached", cached), ("uncached", uncached)):
+            seconds = timeit.timeit(lambda: sqlify._select(**arguments), number=number)
+            results.append(dict(benchmark=f"select_{name}", shape=shape, calls=number,
+                                microseconds_per_call=seconds / number * 1_000_000))
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,50 @@
+"""Peak python memory of fetchall against iterate, for growing table sizes
+
+python -m benchmarks.bench_stream_memory
+"""
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from benchmarks.common import print_results, sqlite_sqlify
+
+SCHEMA = "id INTEGER PRIMARY KEY, name TEXT, price REAL, genre TEXT"
+
+
+def _peak(fn: Callable[[], Any]) -> Dict[str, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return dict(seconds=time.perf_counter() - start, peak_mb=peak / 1024 / 1024)
+
+
+def run(sizes=(10_000, 100_000, 1_000_000), batch_size: int = 1000) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        sqlify = sqlite_sqlify()
+        sqlify.create("books", SCHEMA)
+        sqlify.bulk_insert(
+            "books", (dict(id=i, name=f"Book {i}", price=i * 1.23, genre="fiction") for i in range(size))
+        )
+
+        def fetchall():
+            for _ in sqlify.fetchall("books"):
+                pass
+
+        def iterate():
+            for _ in sqlify.iterate("books", batch_size=batch_size):
+                pass
+
+        for name, fn in (("fetchall", fetchall), ("iterate", iterate)):
+            results.append(dict(benchmark=name, backend="sqlite3", rows=size, **_peak(fn)))
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
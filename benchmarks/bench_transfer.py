@@ -0,0 +1,47 @@
+"""Export and import throughput, in rows and megabytes per second
+
+python -m benchmarks.bench_transfer
+"""
+import io
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import print_results, sqlite_sqlify
+from sqlify import DataFormat
+
+SCHEMA = "id INTEGER PRIMARY KEY, name TEXT, price REAL, genre TEXT"
+
+
+def run(sizes=(10_000, 100_000, 1_000_000), batch_size: int = 5000) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        sqlify = sqlite_sqlify()
+        sqlify.create("books", SCHEMA)
+        sqlify.bulk_insert(
+            "books", (dict(id=i, name=f"Book {i}", price=i * 1.23, genre="fiction") for i in range(size))
+        )
+
+        for format in (DataFormat.CSV, DataFormat.NDJSON):
+            file = io.StringIO()
+            start = time.perf_counter()
+            sqlify.export("books", file, format=format, batch_size=batch_size)
+            export_seconds = time.perf_counter() - start
+            megabytes = len(file.getvalue().encode()) / 1024 / 1024
+
+            sqlify.create("books_import", SCHEMA)
+            file.seek(0)
+            start = time.perf_counter()
+            sqlify.load("books_import", file, format=format, batch_size=batch_size)
+            load_seconds = time.perf_counter() - start
+            sqlify.drop("books_import")
+
+            for name, seconds in (("export", export_seconds), ("load", load_seconds)):
+                results.append(dict(benchmark=f"{name}_{format.value.lower()}", backend="sqlite3", rows=size,
+                                    seconds=seconds, rows_per_second=size / seconds,
+                                    megabytes_per_second=megabytes / seconds))
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
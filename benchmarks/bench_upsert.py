@@ -0,0 +1,47 @@
+"""Compare upsert against a fetchone followed by insert or update per row
+
+python -m benchmarks.bench_upsert
+"""
+from typing import Any, Dict, List
+
+from benchmarks.common import measure, print_results, sqlite_sqlify
+
+SCHEMA = "id INTEGER PRIMARY KEY, name TEXT, price REAL"
+
+
+def _rows(size: int):
+    # Half of the rows already exist
+    return (dict(id=i, name=f"Book {i}", price=i * 2.0) for i in range(size // 2, size + size // 2))
+
+
+def run(sizes=(1_000, 10_000, 100_000), repeat: int = 3) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        sqlify = sqlite_sqlify()
+
+        def setup():
+            sqlify.drop("books")
+            sqlify.create("books", SCHEMA)
+            sqlify.bulk_insert("books", (dict(id=i, name=f"Book {i}", price=i) for i in range(size)))
+
+        def fetch_then_write():
+            setup()
+            for row in _rows(size):
+                if sqlify.fetchone("books", fields="1", where=("id = ?", [row["id"]])) is None:
+                    sqlify.insert("books", data=row)
+                else:
+                    sqlify.update("books", data=row, where=("id = :id", dict(id=row["id"])))
+
+        def upsert():
+            setup()
+            sqlify.upsert("books", _rows(size), conflict_target="id")
+
+        for name, fn in (("fetchone_then_write", fetch_then_write), ("upsert", upsert)):
+            timing = measure(fn, repeat)
+            results.append(dict(benchmark=name, backend="sqlite3", rows=size, **timing))
+
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,31 @@
+import sqlite3
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+from sqlify import Sqlite3Sqlify
+
+
+def measure(fn: Callable[[], Any], repeat: int = 5) -> Dict[str, float]:
+    """Run fn repeat times and return timing statistics in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    return dict(
+        min=min(timings),
+        median=statistics.median(timings),
+        max=max(timings),
+    )
+
+
+def sqlite_sqlify(database: str = ":memory:") -> Sqlite3Sqlify:
+    return Sqlite3Sqlify(sqlite3.connect(database).cursor())
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    for result in results:
+        print(", ".join(f"{key}={value:.6f}" if isinstance(value, float) else f"{key}={value}"
+                        for key, value in result.items()))
@@ -5,6 +5,8 @@ __all__ = [
     "BaseSqlify",
     "Sqlite3Sqlify",
     "Psycopg2Sqlify",
+    "Psycopg3Sqlify",
+    "DuckdbSqlify",
     "Session",
     "Fetch",
     "Order",
@@ -13,15 +15,69 @@ __all__ = [
     "Order",
     "DatabaseType",
     "Migrations",
+    "Backfill",
     "build_typer_cli",
     "MigrationAlreadyAppliedException",
+    "MigrationDependencyException",
+    "MigrationTargetsFailed",
     "TyperNotFound",
+    "SqlCache",
+    "PreparedQuery",
+    "Page",
+    "SessionPool",
+    "PoolTimeout",
+    "AsyncBaseSqlify",
+    "AsyncpgSqlify",
+    "AiosqliteSqlify",
+    "AsyncSession",
+    "QueryHook",
+    "QueryEvent",
+    "SlowQueryLog",
+    "LatencyHistogram",
+    "QueryPlan",
+    "PlanNode",
+    "PlanSampler",
+    "WorkloadRecorder",
+    "QueryShape",
+    "IndexAdvice",
+    "IndexReport",
+    "DataFormat",
+    "RowFormat",
+    "ResultCache",
+    "CacheBackend",
+    "MemoryBackend",
+    "QueryBatch",
+    "BatchResult",
+    "ThreadLocalSqlify",
+    "parallel_fetch",
+    "Dialect",
+    "register_dialect",
+    "get_dialect",
+    "detect_dialect",
+    "DialectNotFound",
 ]
 
-from .builder import BaseSqlify, Sqlite3Sqlify, Psycopg2Sqlify
+from .batch import QueryBatch, BatchResult
+from .builder import BaseSqlify
+from .backends import Sqlite3Sqlify, Psycopg2Sqlify, Psycopg3Sqlify, DuckdbSqlify
+from .cache import SqlCache
+from .concurrency import ThreadLocalSqlify, parallel_fetch
+from .instrumentation import QueryHook, QueryEvent, SlowQueryLog, LatencyHistogram
+from .explain import QueryPlan, PlanNode, PlanSampler
+from .workload import WorkloadRecorder, QueryShape, IndexAdvice, IndexReport
+from .pagination import Page
+from .prepared import PreparedQuery
+from .result_cache import ResultCache, CacheBackend, MemoryBackend
 from .operators import SqlOperator, RawSQL, DecreaseSQL, IncreaseSQL
+from .dialects import Dialect, register_dialect, get_dialect, detect_dialect
 from .session import Session
-from .value_objects import Fetch, Order, DatabaseType
-from .exceptions import MigrationAlreadyAppliedException, TyperNotFound
+from .pool import SessionPool
+from .aio import AsyncBaseSqlify, AsyncpgSqlify, AiosqliteSqlify, AsyncSession
+from .value_objects import Fetch, Order, DatabaseType, DataFormat, RowFormat
+from .exceptions import (
+    MigrationAlreadyAppliedException, MigrationDependencyException, MigrationTargetsFailed, TyperNotFound, PoolTimeout,
+    DialectNotFound,
+)
+from .backfill import Backfill
 from .migrations import Migrations
 from .cli import build_typer_cli
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+from functools import lru_cache
+from logging import Logger
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type, Union
+
+from .builder import SqlBuilder, DEFAULT_SQL_CACHE
+from .cache import SqlCache
+from .operators import SqlOperator
+from .prepared import pyformat_to_numeric
+from .value_objects import DatabaseType, Order
+
+
+class AsyncBaseSqlify(SqlBuilder):
+    """Async version of BaseSqlify, the sql is rendered by the same SqlBuilder methods
+
+    Backends implement _fetchone, _fetchall, _execute and _stream for their driver
+    """
+
+    def __init__(self, connection, logger: Logger = None, sql_cache: Optional[SqlCache] = DEFAULT_SQL_CACHE):
+        super().__init__(sql_cache)
+        self._connection = connection
+        self._logger = logger
+
+    async def fetchone(
+            self,
+            table: str,
+            fields: Optional[Union[str, List[str]]] = "*",
+            where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
+            group: Optional[Union[List[str], str]] = None,
+            having: Optional[str] = None,
+            order: Optional[Union[str, Tuple[str, Union[Order, str]]]] = None,
+            offset: int = None,
+            with_sq: Optional[Dict[str, str]] = None,
+    ) -> Optional[Union[Dict, List]]:
+        """Get a single result, same arguments as BaseSqlify.fetchone"""
+        conditions, parameters = self._split_where(where)
+
+        sql = self._select(
+            table=table,
+            fields=fields,
+            where=conditions,
+            group=group,
+            having=having,
+            order=order,
+            limit=1,
+            offset=offset,
+            with_sq=with_sq,
+        )
+        return await self._fetchone(sql, parameters)
+
+    async def fetchall(
+            self,
+            table: str,
+            fields: Optional[Union[str, List[str]]] = "*",
+            where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
+            group: Optional[Union[List[str], str]] = None,
+            having: Optional[str] = None,
+            order: Optional[Union[str, Tuple[str, Union[Order, str]]]] = None,
+            limit: Optional[int] = None,
+            offset: Optional[int] = None,
+            with_sq: Optional[Dict[str, str]] = None,
+    ) -> Optional[List[Union[Dict, List]]]:
+        """Get all results, same arguments as BaseSqlify.fetchall"""
+        conditions, parameters = self._split_where(where)
+
+        sql = self._select(
+            table=table,
+            fields=fields,
+            where=conditions,
+            group=group,
+            having=having,
+            order=order,
+            limit=limit,
+            offset=offset,
+            with_sq=with_sq,
+        )
+        return await self._fetchall(sql, parameters)
+
+    async def iterate(
+            self,
+            table: str,
+            fields: Optional[Union[str, List[str]]] = "*",
+            where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
+            group: Optional[Union[List[str], str]] = None,
+            having: Optional[str] = None,
+            order: Optional[Union[str, Tuple[str, Union[Order, str]]]] = None,
+            limit: Optional[int] = None,
+            offset: Optional[int] = None,
+            with_sq: Optional[Dict[str, str]] = None,
+            batch_size: int = 1000,
+    ) -> AsyncIterator[Union[Dict, List]]:
+        """Lazily iterate over all results, fetching batch_size rows at a time
+
+        async for book in sqlify.iterate("books", order="id"):
+            ...
+        """
+        conditions, parameters = self._split_where(where)
+
+        sql = self._select(
+            table=table,
+            fields=fields,
+            where=conditions,
+            group=group,
+            having=having,
+            order=order,
+            limit=limit,
+            offset=offset,
+            with_sq=with_sq,
+        )
+        async for row in self._stream(sql, parameters, batch_size):
+            yield row
+
+    async def insert(
+            self,
+            table: str,
+            data: Dict[str, Union[str, bool, int, datetime]],
+            returning: str = None,
+    ) -> Optional[Union[Dict, int]]:
+        """Insert a record"""
+        sql = self._render_insert(table, data, returning)
+        if returning:
+            return await self._fetchone(sql, list(data.values()))
+        return await self._execute(sql, list(data.values()))
+
+    async def update(
+            self,
+            table: str,
+            data: Dict[str, Union[str, bool, int, datetime, SqlOperator]],
+            where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
+            returning: str = None,
+    ) -> Optional[Union[List, int]]:
+        """Update records based on a where condition"""
+        conditions, parameters = self._split_where(where)
+        sql = self._render_update(table, data, conditions, returning)
+        arguments = self._update_arguments(data, parameters)
+
+        if returning:
+            return await self._fetchall(sql, arguments)
+        return await self._execute(sql, arguments)
+
+    async def delete(
+            self,
+            table: str,
+            where: Optional[Tuple[Union[List, str], Union[List, Dict]]] = None,
+            returning: str = None,
+    ) -> Optional[Union[List, int]]:
+        """Delete rows based on a where condition"""
+        conditions, parameters = self._split_where(where)
+
+        sql = self._render_delete(table, conditions, returning)
+        if returning:
+            return await self._fetchall(sql, parameters)
+        return await self._execute(sql, parameters)
+
+    async def execute(self, sql: str, params: Optional[Union[List, Dict]] = None) -> int:
+        """Executes a raw query and returns the affected row count"""
+        return await self._execute(sql, params)
+
+    async def commit(self) -> None:
+        """Commit a transaction"""
+        await self._connection.commit()
+
+    async def rollback(self) -> None:
+        """Roll-back a transaction"""
+        await self._connection.rollback()
+
+    async def _begin(self) -> None:
+        """Called when a session starts, for drivers without implicit transactions"""
+
+    async def _end(self, commit: bool) -> None:
+        """Called when a session ends, commits its transaction or rolls it back when the session raised"""
+        if commit:
+            await self.commit()
+        else:
+            await self.rollback()
+
+    async def _fetchone(self, sql: str, params: Optional[Union[List, Dict]]) -> Any:
+        raise NotImplementedError("Database backend not defined")
+
+    async def _fetchall(self, sql: str, params: Optional[Union[List, Dict]]) -> List[Any]:
+        raise NotImplementedError("Database backend not defined")
+
+    async def _execute(self, sql: str, params: Optional[Union[List, Dict]]) -> int:
+        raise NotImplementedError("Database backend not defined")
+
+    def _stream(self, sql: str, params: Optional[Union[List, Dict]], batch_size: int) -> AsyncIterator[Any]:
+        raise NotImplementedError("Database backend not defined")
+
+
+class AiosqliteSqlify(AsyncBaseSqlify):
+    _unnamed_parameter = "?"
+
+    def _format_parameter(self, parameter: str) -> str:
+        return f":{parameter}"
+
+    async def _fetchone(self, sql: str, params: Optional[Union[List, Dict]]) -> Any:
+        async with self._connection.execute(sql, params or ()) as cur:
+            return await cur.fetchone()
+
+    async def _fetchall(self, sql: str, params: Optional[Union[List, Dict]]) -> List[Any]:
+        async with self._connection.execute(sql, params or ()) as cur:
+            return await cur.fetchall()
+
+    async def _execute(self, sql: str, params: Optional[Union[List, Dict]]) -> int:
+        async with self._connection.execute(sql, params or ()) as cur:
+            return cur.rowcount
+
+    async def _stream(self, sql: str, params: Optional[Union[List, Dict]], batch_size: int) -> AsyncIterator[Any]:
+        async with self._connection.execute(sql, params or ()) as cur:
+            while True:
+                rows = await cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+
+
+@lru_cache(maxsize=512)
+def _numeric_sql(sql: str) -> Tuple[str, Optional[Tuple[str, ...]]]:
+    converted, names = pyformat_to_numeric(sql)
+    return converted.replace("%%", "%"), tuple(names) if names else None
+
+
+class AsyncpgSqlify(AsyncBaseSqlify):
+    """asyncpg only supports $1 parameters, queries are written with the psycopg2 %s/%(name)s style and converted"""
+    _unnamed_parameter = "%s"
+
+    def __init__(self, connection, logger: Logger = None, sql_cache: Optional[SqlCache] = DEFAULT_SQL_CACHE):
+        super().__init__(connection, logger, sql_cache)
+        self._transaction = None
+
+    def _format_parameter(self, parameter: str) -> str:
+        return f"%({parameter})s"
+
+    @staticmethod
+    def _bind(sql: str, params: Optional[Union[List, Dict]]) -> Tuple[str, List[Any]]:
+        sql, names = _numeric_sql(sql)
+        if names is None:
+            return sql, list(params or ())
+
+        return sql, [params[name] for name in names]
+
+    async def _fetchone(self, sql: str, params: Optional[Union[List, Dict]]) -> Any:
+        sql, values = self._bind(sql, params)
+        return await self._connection.fetchrow(sql, *values)
+
+    async def _fetchall(self, sql: str, params: Optional[Union[List, Dict]]) -> List[Any]:
+        sql, values = self._bind(sql, params)
+        return await self._connection.fetch(sql, *values)
+
+    async def _execute(self, sql: str, params: Optional[Union[List, Dict]]) -> int:
+        sql, values = self._bind(sql, params)
+        status = await self._connection.execute(sql, *values)
+
+        # asyncpg returns the command status, eg: "UPDATE 5"
+        count = status.rsplit(" ", 1)[-1] if status else ""
+        return int(count) if count.isdigit() else -1
+
+    async def _stream(self, sql: str, params: Optional[Union[List, Dict]], batch_size: int) -> AsyncIterator[Any]:
+        sql, values = self._bind(sql, params)
+
+        # asyncpg cursors only exist inside a transaction, inside an existing one this becomes a savepoint
+        async with self._connection.transaction():
+            async for record in self._connection.cursor(sql, *values, prefetch=batch_size):
+                yield record
+
+    async def _begin(self) -> None:
+        self._transaction = self._connection.transaction()
+        await self._transaction.start()
+
+    async def commit(self) -> None:
+        """Commit the current transaction and start a new one, like the DB-API drivers do"""
+        if self._transaction is None:
+            return
+
+        await self._transaction.commit()
+        await self._begin()
+
+    async def rollback(self) -> None:
+        """Roll-back the current transaction and start a new one"""
+        if self._transaction is None:
+            return
+
+        await self._transaction.rollback()
+        await self._begin()
+
+    async def _end(self, commit: bool) -> None:
+        if self._transaction is None:
+            return
+
+        transaction, self._transaction = self._transaction, None
+        if commit:
+            await transaction.commit()
+        else:
+            await transaction.rollback()
+
+
+class AsyncSession(object):
+    """Async version of Session
+
+    async with AsyncSession(await aiosqlite.connect("my_test.db")) as sqlify:
+        await sqlify.fetchone(...)
+    """
+    _manager: Type[AsyncBaseSqlify]
+
+    def __init__(self, connection, database_type: Optional[Union[DatabaseType, str]] = None,
+                 autocommit: Optional[bool] = True):
+        # dialects imports the async backends from this module
+        from .dialects import detect_dialect, get_dialect
+
+        self._connection = connection
+        self._autocommit = autocommit
+
+        if database_type is not None:
+            self.dialect = get_dialect(database_type)
+        else:
+            self.dialect = detect_dialect(connection, asynchronous=True)
+
+        if not self.dialect.asynchronous:
+            raise ValueError(f"The {self.dialect.name} dialect is synchronous, use Session instead")
+
+        self._manager = self.dialect.sqlify
+        self.session = self._manager(self._connection)
+
+    @property
+    def is_open(self) -> bool:
+        return self.dialect.is_open(self._connection)
+
+    async def close(self) -> None:
+        await self._connection.close()
+
+    async def __aenter__(self) -> AsyncBaseSqlify:
+        if self._autocommit:
+            await self.session._begin()
+        return self.session
+
+    async def __aexit__(self, type_, value, traceback) -> None:
+        if self._autocommit:
+            await self.session._end(commit=type_ is None)
+
+        if self.is_open:
+            await self.close()
@@ -0,0 +1,6 @@
+"""Sqlify classes of the synchronous drivers, one module per database"""
+from .duckdb import DuckdbCursor, DuckdbSqlify
+from .postgres import Psycopg2Sqlify, Psycopg3Sqlify
+from .sqlite import Sqlite3Sqlify
+
+__all__ = ["Psycopg2Sqlify", "Psycopg3Sqlify", "Sqlite3Sqlify", "DuckdbCursor", "DuckdbSqlify"]
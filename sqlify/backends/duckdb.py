@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+import re
+import weakref
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Union
+
+from ..builder import BaseSqlify
+from ..transfer import csv_header, blocks
+from ..value_objects import DataFormat
+
+# Statements duckdb answers with a single Count row, instead of setting rowcount
+_COUNTED_STATEMENT = re.compile(r"\s*(INSERT|UPDATE|DELETE|COPY)\b", re.IGNORECASE)
+# Statements that start or end a transaction
+_TRANSACTION_STATEMENT = re.compile(r"\s*(BEGIN|START|COMMIT|END|ROLLBACK|ABORT)\b", re.IGNORECASE)
+
+# Connections with an open transaction, duckdb can't be asked and a BEGIN to find out aborts the open one
+_transactions: "weakref.WeakSet[Any]" = weakref.WeakSet()
+# Connection -> the cursor streaming results on it, a query run by another cursor would replace the results
+_streams: "weakref.WeakKeyDictionary[Any, DuckdbCursor]" = weakref.WeakKeyDictionary()
+
+
+class DuckdbCursor(object):
+    """DB-API cursor over a duckdb connection
+
+    duckdb cursors are duplicate connections with a transaction of their own, writes made through them aren't part of
+    the connection transaction. This runs every query on the connection itself and reads the row counts duckdb returns
+    as results. Transactions must be started and ended through the cursor, or statements executed on it, to be tracked
+    """
+
+    def __init__(self, connection: Any) -> None:
+        self.connection = connection
+        self._counted = False
+        self._rowcount: Optional[int] = None
+
+    def execute(self, sql: str, parameters: Optional[Union[List, Dict]] = None) -> "DuckdbCursor":
+        self._check_stream()
+        transaction = _TRANSACTION_STATEMENT.match(sql)
+        try:
+            self.connection.execute(sql, parameters or ())
+        finally:
+            if transaction:
+                # A failed COMMIT or ROLLBACK still ends the transaction
+                self._track(transaction.group(1).upper() in ("BEGIN", "START"))
+        self._counted = bool(_COUNTED_STATEMENT.match(sql)) and "RETURNING" not in sql.upper()
+        self._rowcount = None
+        return self
+
+    def executemany(self, sql: str, parameters: Iterable[Union[List, Dict]]) -> "DuckdbCursor":
+        self._check_stream()
+        self.connection.executemany(sql, parameters)
+        self._counted = False
+        self._rowcount = None
+        return self
+
+    @property
+    def rowcount(self) -> int:
+        if not self._counted:
+            return -1
+        if self._rowcount is None:
+            row = self.connection.fetchone()
+            self._rowcount = row[0] if row else -1
+        return self._rowcount
+
+    @property
+    def description(self) -> Any:
+        return self.connection.description
+
+    def fetchone(self) -> Any:
+        return self.connection.fetchone()
+
+    def fetchmany(self, size: int = 1) -> List[Any]:
+        return self.connection.fetchmany(size)
+
+    def fetchall(self) -> List[Any]:
+        return self.connection.fetchall()
+
+    def close(self) -> None:
+        """Closing the cursor leaves the connection open"""
+        if _streams.get(self.connection) is self:
+            del _streams[self.connection]
+
+    def stream(self) -> "DuckdbCursor":
+        """New cursor over the connection that owns it until closed, queries of other cursors raise meanwhile"""
+        self._check_stream()
+        stream = DuckdbCursor(self.connection)
+        _streams[self.connection] = stream
+        return stream
+
+    def _check_stream(self) -> None:
+        stream = _streams.get(self.connection)
+        if stream is not None and stream is not self:
+            raise RuntimeError(
+                "Results are being streamed on this duckdb connection inside a transaction, finish or close the "
+                "iteration before running other queries"
+            )
+
+    @property
+    def in_transaction(self) -> bool:
+        return self.connection in _transactions
+
+    def begin(self) -> None:
+        self.connection.begin()
+        self._track(True)
+
+    def commit(self) -> None:
+        try:
+            self.connection.commit()
+        finally:
+            self._track(False)
+
+    def rollback(self) -> None:
+        """Roll back the open transaction, a no-op without one like in the other drivers"""
+        if not self.in_transaction:
+            return
+        try:
+            self.connection.rollback()
+        finally:
+            self._track(False)
+
+    def _track(self, open_: bool) -> None:
+        if open_:
+            _transactions.add(self.connection)
+        else:
+            _transactions.discard(self.connection)
+
+
+class DuckdbSqlify(BaseSqlify):
+    """duckdb backend, accepts a duckdb connection or a DuckdbCursor over it
+
+    Queries use ? and $name parameters, csv imports are written to a temporary file and read with COPY FROM. Reads by
+    iterate, export and fetch_arrays run on a cursor of their own, a duplicate connection that only sees committed
+    rows. Inside a transaction they run on the connection itself, which can't run other queries until they end
+    """
+    _unnamed_parameter = "?"
+
+    def __init__(self, cursor, *args: Any, **kwargs: Any) -> None:
+        if not isinstance(cursor, DuckdbCursor):
+            cursor = DuckdbCursor(cursor)
+        super().__init__(cursor, *args, **kwargs)
+
+    def _format_parameter(self, parameter: str) -> str:
+        return f"${parameter}"
+
+    def commit(self) -> None:
+        """Commit a transaction"""
+        self._cursor.commit()
+        self._transaction_ended()
+
+    def rollback(self) -> None:
+        """Roll-back a transaction"""
+        self._cursor.rollback()
+        self._transaction_ended()
+
+    def _begin_transaction(self) -> bool:
+        """duckdb runs in autocommit mode until BEGIN, which fails when a transaction is already open"""
+        if self._cursor.in_transaction:
+            return False
+        self._cursor.begin()
+        return True
+
+    def _end_transaction(self, explicit: bool, commit: bool) -> None:
+        super()._end_transaction(explicit, commit)
+        if not explicit:
+            # The transaction was opened before, by a Session, the other drivers open the next one implicitly
+            self._cursor.begin()
+
+    def _stream_cursor(self, batch_size: int) -> Any:
+        """Duplicate connections don't see the rows written by the open transaction, streams must use its connection"""
+        if self._cursor.in_transaction:
+            return self._cursor.stream()
+        return super()._stream_cursor(batch_size)
+
+    def savepoint(self, name: Optional[str] = None) -> Iterator["BaseSqlify"]:
+        raise NotImplementedError("duckdb doesn't support savepoints, transactions can't be nested")
+
+    def _load(
+            self,
+            table: str,
+            file: Union[IO, Iterable[Union[str, bytes]]],
+            columns: Optional[List[str]],
+            format: DataFormat,
+            header: bool,
+            batch_size: int,
+    ) -> int:
+        """Import csv with COPY FROM a temporary file, duckdb only copies from files"""
+        if format is not DataFormat.CSV:
+            return super()._load(table, file, columns, format, header, batch_size)
+
+        import tempfile
+
+        if header:
+            # The header defines the columns, COPY would only skip it
+            columns, file = csv_header(file, columns)
+
+        with tempfile.NamedTemporaryFile("wb", suffix=".csv") as temporary:
+            for block in blocks(file):
+                temporary.write(block.encode() if isinstance(block, str) else block)
+            temporary.flush()
+
+            target = f"{table} ({', '.join(columns)})" if columns else table
+            path = temporary.name.replace("'", "''")
+            # Quoted empty fields are empty strings, only unquoted ones are NULL
+            copy = f"COPY {target} FROM '{path}' (FORMAT csv, HEADER false, ALLOW_QUOTED_NULLS false)"
+            return self.execute(copy).rowcount
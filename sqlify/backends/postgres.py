@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+import itertools
+import uuid
+from contextlib import ExitStack
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..batch import BatchedQuery
+from ..builder import BaseSqlify
+from ..explain import QueryPlan, postgres_nodes, scanned_rows
+from ..prepared import PreparedQuery, pyformat_to_numeric, is_prepared, mark_prepared
+from ..rows import convert_row, convert_rows, row_values
+from ..transfer import IterableReader, QueueWriter, csv_header, blocks
+from ..value_objects import DataFormat, Fetch, RowFormat
+from ..workload import index_definition_columns
+
+
+class _RolledBack(Exception):
+    """Raised to roll back the transaction of an analyzed write"""
+
+
+class Psycopg2Sqlify(BaseSqlify):
+    _unnamed_parameter = "%s"
+
+    def _format_parameter(self, parameter: str) -> str:
+        return f"%({parameter})s"
+
+    def _begin_transaction(self) -> bool:
+        """Transactions start implicitly, except on autocommit connections where COMMIT does nothing"""
+        if self._cursor.connection.autocommit:
+            self.execute("BEGIN")
+            return True
+        return False
+
+    def _explain(
+            self,
+            sql: str,
+            parameters: Optional[Union[List, Dict]],
+            analyze: bool,
+            large_table_rows: int,
+            writes: bool = False,
+    ) -> QueryPlan:
+        """EXPLAIN in json, analyzed plans also count the buffers read by each step"""
+        if analyze and writes:
+            # ANALYZE runs the statement, a savepoint undoes it without touching the rest of the transaction,
+            # autocommit connections outside of a transaction get one of their own
+            in_transaction = self._transaction_depth or not self._cursor.connection.autocommit
+            try:
+                with self.savepoint() if in_transaction else self.transaction():
+                    plan = self._explain(sql, parameters, analyze, large_table_rows)
+                    raise _RolledBack()
+            except _RolledBack:
+                return plan
+
+        options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+        cur = self._cursor.connection.cursor()
+        try:
+            cur.execute(f"EXPLAIN ({options}) {sql}", parameters or ())
+            raw = row_values(cur.fetchone())[0]
+            plan = QueryPlan(sql, parameters, postgres_nodes(raw), raw, large_table_rows=large_table_rows)
+            if isinstance(plan.raw, list):
+                plan.planning_time = plan.raw[0].get("Planning Time")
+                plan.execution_time = plan.raw[0].get("Execution Time")
+
+            tables = plan.tables()
+            if tables:
+                # reltuples is the estimate of the last VACUUM or ANALYZE, below 1 when the table never had one
+                cur.execute(
+                    "SELECT name, (SELECT reltuples FROM pg_class WHERE oid = to_regclass(name)) "
+                    "FROM unnest(%s::text[]) AS name",
+                    [tables],
+                )
+                plan.table_rows = {name: rows for name, rows in map(row_values, cur.fetchall()) if rows and rows > 0}
+        finally:
+            cur.close()
+
+        # An analyzed full scan read at least the rows it returned and the ones it filtered out
+        for node in plan.walk():
+            if node.full_scan and node.actual_rows is not None:
+                plan.table_rows[node.table] = max(plan.table_rows.get(node.table, 0), scanned_rows(node))
+
+        return plan
+
+    def _indexes(self, tables: List[str]) -> Dict[str, List[Tuple[str, Tuple[Optional[str], ...]]]]:
+        """btree indexes from pg_indexes, tables without any index are still listed"""
+        cur = self._cursor.connection.cursor()
+        try:
+            cur.execute(
+                "SELECT t.name, i.indexname, i.indexdef FROM unnest(%s::text[]) AS t(name) "
+                "LEFT JOIN pg_indexes i ON i.tablename = t.name AND i.schemaname = ANY(current_schemas(false)) "
+                "WHERE to_regclass(t.name) IS NOT NULL",
+                [tables],
+            )
+            rows = [row_values(row) for row in cur.fetchall()]
+        finally:
+            cur.close()
+
+        indexes: Dict[str, List[Tuple[str, Tuple[Optional[str], ...]]]] = {}
+        for table, name, definition in rows:
+            indexes.setdefault(table, [])
+            columns = name and index_definition_columns(definition)
+            if columns:
+                indexes[table].append((name, columns))
+        return indexes
+
+    def _run_batch(self, queries: List[BatchedQuery]) -> None:
+        """psycopg2 only returns the results of the last statement of a multi-statement execute, the queries run one
+        by one like on other backends. The ones batched with json=True are sent together in a single round-trip, each
+        one as a json subquery of a single SELECT, their rows are decoded from json, as dicts or in the configured row
+        format, so numeric values become floats and dates strings
+        """
+        combined = [query for query in queries if query.json]
+        if len(combined) < 2:
+            return super()._run_batch(queries)
+
+        try:
+            self._run_json_batch(combined)
+        except Exception as e:
+            for query in queries:
+                query.handle.set_exception(e)
+            raise
+        super()._run_batch([query for query in queries if not query.json])
+
+    def _run_json_batch(self, queries: List[BatchedQuery]) -> None:
+        """Run the queries as the json subqueries of a single SELECT"""
+        columns = []
+        for query in queries:
+            sql = self._cursor.mogrify(query.sql, query.parameters or None)
+            if isinstance(sql, bytes):
+                sql = sql.decode()
+
+            if query.fetch is Fetch.ONE:
+                columns.append(f"(SELECT row_to_json(q) FROM ({sql}) q)")
+            else:
+                columns.append(f"(SELECT coalesce(json_agg(q), '[]'::json) FROM ({sql}) q)")
+
+        # The values are already interpolated, percent signs left in them must not be read as placeholders
+        sql = "SELECT {}".format(", ".join(columns)).replace("%", "%%")
+        row = row_values(self.execute(sql).fetchone())
+        for query, value in zip(queries, row):
+            query.handle.set_result(self._json_rows(value, query.fetch))
+
+    def _json_rows(self, value: Any, fetch: Fetch) -> Any:
+        """Convert the json decoded rows of a batch into the configured row format"""
+        if self._row_format is None:
+            return value
+        if not value:
+            return {} if fetch is Fetch.ALL and self._row_format is RowFormat.COLUMNAR else value
+
+        if fetch is Fetch.ONE:
+            return convert_row(self._row_format, [(column,) for column in value], list(value.values()))
+        return convert_rows(self._row_format, [(column,) for column in value[0]], value)
+
+    def _stream_cursor(self, batch_size: int) -> Any:
+        """Named cursor, results are kept on the server and transferred batch_size rows at a time"""
+        cur = self._cursor.connection.cursor(name=f"sqlify_{uuid.uuid4().hex}", cursor_factory=type(self._cursor))
+        cur.itersize = batch_size
+        return cur
+
+    def _export(
+            self,
+            sql: str,
+            parameters: Optional[Union[List, Dict]],
+            format: DataFormat,
+            header: bool,
+            batch_size: int,
+            file: Optional[IO],
+    ) -> Union[Optional[int], Iterator[Union[str, bytes]]]:
+        """Export csv and binary with COPY TO STDOUT"""
+        if format is DataFormat.NDJSON:
+            return super()._export(sql, parameters, format, header, batch_size, file)
+
+        sql = self._cursor.mogrify(sql, parameters)
+        if isinstance(sql, bytes):
+            sql = sql.decode()
+
+        options = "FORMAT binary" if format is DataFormat.BINARY else f"FORMAT csv, HEADER {str(header).lower()}"
+        copy = f"COPY ({sql}) TO STDOUT WITH ({options})"
+
+        if file is not None:
+            self._instrumented(self._cursor, copy, None, lambda: self._cursor.copy_expert(copy, file))
+            return self._cursor.rowcount
+
+        def produce(writer: QueueWriter) -> None:
+            cur = self._cursor.connection.cursor()
+            try:
+                self._instrumented(cur, copy, None, lambda: cur.copy_expert(copy, writer))
+            finally:
+                cur.close()
+
+        chunks = QueueWriter().stream(produce)
+        if format is DataFormat.BINARY:
+            return chunks
+        return (chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in chunks)
+
+    def _load(
+            self,
+            table: str,
+            file: Union[IO, Iterable[Union[str, bytes]]],
+            columns: Optional[List[str]],
+            format: DataFormat,
+            header: bool,
+            batch_size: int,
+    ) -> int:
+        """Import csv and binary with COPY FROM STDIN"""
+        if format is DataFormat.NDJSON:
+            return super()._load(table, file, columns, format, header, batch_size)
+
+        if format is DataFormat.CSV and header:
+            # The header defines the columns, COPY would only skip it
+            columns, file = csv_header(file, columns)
+            header = False
+
+        if not hasattr(file, "read"):
+            file = IterableReader(file)
+
+        target = f"{table} ({', '.join(columns)})" if columns else table
+        options = "FORMAT binary" if format is DataFormat.BINARY else "FORMAT csv"
+        copy = f"COPY {target} FROM STDIN WITH ({options})"
+
+        self._instrumented(self._cursor, copy, None, lambda: self._cursor.copy_expert(copy, file))
+        return self._cursor.rowcount
+
+    def _execute_prepared(self, query: PreparedQuery, parameters: Optional[Union[List, Dict]]) -> Any:
+        """Run a prepared query, with server_side the statement is prepared once per connection"""
+        if not query.server_side:
+            return self.execute(query.sql, parameters)
+
+        if query.numeric is None:
+            query.numeric = pyformat_to_numeric(query.sql)
+        sql, names = query.numeric
+
+        connection = self._cursor.connection
+        if not is_prepared(connection, query.name):
+            self.execute(f"PREPARE {query.name} AS {sql}")
+            mark_prepared(connection, query.name)
+
+        if names is None:
+            values = list(parameters or ())
+        else:
+            values = [parameters[name] for name in names]
+
+        if not values:
+            return self.execute(f"EXECUTE {query.name}")
+
+        return self.execute(
+            f"EXECUTE {query.name}({', '.join([self._unnamed_parameter] * len(values))})", values
+        )
+
+    def _bulk_insert(
+            self,
+            table: str,
+            columns: List[str],
+            values: Iterator[Tuple],
+            returning: Optional[Union[str, List[str]]],
+            batch_size: int,
+    ) -> Union[int, List[Union[Dict, List]]]:
+        """Insert rows with psycopg2 execute_values, that pages the iterator without materializing it"""
+        from psycopg2.extras import execute_values
+
+        counter = itertools.count()
+        counted = (row for row, _ in zip(values, counter))
+
+        sql = "INSERT INTO {} ({}) VALUES %s".format(table, ", ".join(columns))
+        sql += self._returning(returning)
+
+        results = self._instrumented(
+            self._cursor, sql, None,
+            lambda: execute_values(self._cursor, sql, counted, page_size=batch_size, fetch=bool(returning)),
+        )
+        return results if returning else next(counter)
+
+
+class Psycopg3Sqlify(Psycopg2Sqlify):
+    """psycopg 3 backend, same parameter style as psycopg2. Batches run in pipeline mode, bulk inserts with
+    executemany, which is also pipelined, and exports and imports with the COPY protocol objects
+    """
+
+    def _run_batch(self, queries: List[BatchedQuery]) -> None:
+        """Send every query in pipeline mode, the results are read once the whole pipeline was flushed"""
+        if len(queries) < 2:
+            return BaseSqlify._run_batch(self, queries)
+
+        connection = self._cursor.connection
+        cursors = []
+        try:
+            with connection.pipeline():
+                for query in queries:
+                    cur = connection.cursor(row_factory=self._cursor.row_factory)
+                    cursors.append(cur)
+                    if not self._hooks:
+                        cur.execute(query.sql, query.parameters or None)
+                    else:
+                        self._instrumented(cur, query.sql, query.parameters,
+                                           lambda: cur.execute(query.sql, query.parameters or None))
+
+            for query, cur in zip(queries, cursors):
+                query.handle.set_result(self._fetchone(cur) if query.fetch is Fetch.ONE else self._fetchall(cur))
+        except Exception as e:
+            for query in queries:
+                if not query.handle.done():
+                    query.handle.set_exception(e)
+            raise
+        finally:
+            for cur in cursors:
+                cur.close()
+
+    def _stream_cursor(self, batch_size: int) -> Any:
+        """Server side cursor, results are kept on the server and transferred batch_size rows at a time"""
+        cur = self._cursor.connection.cursor(name=f"sqlify_{uuid.uuid4().hex}", row_factory=self._cursor.row_factory)
+        cur.itersize = batch_size
+        return cur
+
+    def _copy(self, cur, stack: ExitStack, sql: str, parameters: Optional[Union[List, Dict]]) -> Any:
+        """Start a COPY, psycopg binds its parameters client side. The copy is finished when stack closes"""
+        return self._instrumented(cur, sql, parameters, lambda: stack.enter_context(cur.copy(sql, parameters)))
+
+    def _export(
+            self,
+            sql: str,
+            parameters: Optional[Union[List, Dict]],
+            format: DataFormat,
+            header: bool,
+            batch_size: int,
+            file: Optional[IO],
+    ) -> Union[Optional[int], Iterator[Union[str, bytes]]]:
+        """Export csv and binary with COPY TO STDOUT, chunks are read from the connection as they arrive"""
+        if format is DataFormat.NDJSON:
+            return BaseSqlify._export(self, sql, parameters, format, header, batch_size, file)
+
+        options = "FORMAT binary" if format is DataFormat.BINARY else f"FORMAT csv, HEADER {str(header).lower()}"
+        copy_sql = f"COPY ({sql}) TO STDOUT WITH ({options})"
+        binary = format is DataFormat.BINARY
+
+        if file is not None:
+            with ExitStack() as stack:
+                for data in self._copy(self._cursor, stack, copy_sql, parameters):
+                    file.write(bytes(data) if binary else bytes(data).decode())
+            return self._cursor.rowcount
+
+        def chunks() -> Iterator[Union[str, bytes]]:
+            with ExitStack() as stack:
+                cur = stack.enter_context(self._cursor.connection.cursor())
+                for data in self._copy(cur, stack, copy_sql, parameters):
+                    yield bytes(data) if binary else bytes(data).decode()
+
+        return chunks()
+
+    def _load(
+            self,
+            table: str,
+            file: Union[IO, Iterable[Union[str, bytes]]],
+            columns: Optional[List[str]],
+            format: DataFormat,
+            header: bool,
+            batch_size: int,
+    ) -> int:
+        """Import csv and binary with COPY FROM STDIN"""
+        if format is DataFormat.NDJSON:
+            return BaseSqlify._load(self, table, file, columns, format, header, batch_size)
+
+        if format is DataFormat.CSV and header:
+            # The header defines the columns, COPY would only skip it
+            columns, file = csv_header(file, columns)
+
+        target = f"{table} ({', '.join(columns)})" if columns else table
+        options = "FORMAT binary" if format is DataFormat.BINARY else "FORMAT csv"
+        copy_sql = f"COPY {target} FROM STDIN WITH ({options})"
+
+        with ExitStack() as stack:
+            copy = self._copy(self._cursor, stack, copy_sql, None)
+            for block in blocks(file):
+                copy.write(block)
+        return self._cursor.rowcount
+
+    def _execute_prepared(self, query: PreparedQuery, parameters: Optional[Union[List, Dict]]) -> Any:
+        """Run a prepared query, with server_side psycopg prepares the statement on first use on each connection"""
+        if not query.server_side:
+            return self.execute(query.sql, parameters)
+
+        if not self._hooks:
+            self._cursor.execute(query.sql, parameters or None, prepare=True)
+        else:
+            self._instrumented(self._cursor, query.sql, parameters,
+                               lambda: self._cursor.execute(query.sql, parameters or None, prepare=True))
+        return self._cursor
+
+    def _bulk_insert(
+            self,
+            table: str,
+            columns: List[str],
+            values: Iterator[Tuple],
+            returning: Optional[Union[str, List[str]]],
+            batch_size: int,
+    ) -> Union[int, List[Union[Dict, List]]]:
+        """Insert rows with executemany, psycopg pipelines the statements so the iterator isn't materialized"""
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            table, ", ".join(columns), ", ".join([self._unnamed_parameter] * len(columns))
+        )
+        sql += self._returning(returning)
+
+        cur = self._cursor
+        self._instrumented(cur, sql, None, lambda: cur.executemany(sql, values, returning=bool(returning)))
+        if not returning:
+            return cur.rowcount
+
+        # Each row is a result set of its own
+        results = []
+        while True:
+            results.extend(cur.fetchall())
+            if not cur.nextset():
+                break
+        return results
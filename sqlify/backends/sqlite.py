@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import itertools
+import sqlite3
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from ..builder import BaseSqlify
+from ..explain import QueryPlan, sqlite_nodes, table_aliases
+from ..rows import row_values
+
+
+class Sqlite3Sqlify(BaseSqlify):
+    _unnamed_parameter = "?"
+    _max_parameters = 999 if sqlite3.sqlite_version_info < (3, 32, 0) else 32766
+    # UPDATE ... FROM is only available since sqlite 3.33
+    _update_from = sqlite3.sqlite_version_info >= (3, 33, 0)
+    _case_batch_size = 50
+
+    def _format_parameter(self, parameter: str) -> str:
+        return f":{parameter}"
+
+    def _begin_transaction(self) -> bool:
+        """The sqlite3 module only opens transactions before DML, DDL and reads must be inside them too"""
+        if not self._cursor.connection.in_transaction:
+            self.execute("BEGIN")
+        return False
+
+    def _explain(
+            self,
+            sql: str,
+            parameters: Optional[Union[List, Dict]],
+            analyze: bool,
+            large_table_rows: int,
+            writes: bool = False,
+    ) -> QueryPlan:
+        """EXPLAIN QUERY PLAN, which never runs the statement and has no row estimates. The rows of full scanned tables
+        come from sqlite_stat1, written by ANALYZE, or from a count that stops past large_table_rows
+        """
+        cur = self._cursor.connection.cursor()
+        try:
+            cur.execute(f"EXPLAIN QUERY PLAN {sql}", parameters or ())
+            raw = [tuple(row_values(row)) for row in cur.fetchall()]
+            nodes = sqlite_nodes(raw, table_aliases(sql))
+            plan = QueryPlan(sql, parameters, nodes, raw, large_table_rows=large_table_rows)
+
+            scanned = {node.table for node in plan.walk() if node.full_scan}
+            if scanned:
+                cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+                existing = {row_values(row)[0] for row in cur.fetchall()}
+                tables = scanned.intersection(existing)
+
+                if "sqlite_stat1" in existing:
+                    # The first number of each stat is the rows of the table, or of the index
+                    cur.execute("SELECT tbl, stat FROM sqlite_stat1")
+                    for table, stat in map(row_values, cur.fetchall()):
+                        if table in tables and stat:
+                            plan.table_rows[table] = max(plan.table_rows.get(table, 0), int(stat.split()[0]))
+
+                for table in tables.difference(plan.table_rows):
+                    # A full count would scan the large tables being flagged, it is enough to know they're large
+                    cur.execute(f'SELECT count(*) FROM (SELECT 1 FROM "{table}" LIMIT {large_table_rows + 1})')
+                    plan.table_rows[table] = row_values(cur.fetchone())[0]
+        finally:
+            cur.close()
+
+        return plan
+
+    def _indexes(self, tables: List[str]) -> Dict[str, List[Tuple[str, Tuple[Optional[str], ...]]]]:
+        """Indexes from sqlite_master, an INTEGER PRIMARY KEY is the rowid and has no index of its own"""
+        cur = self._cursor.connection.cursor()
+        try:
+            cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            existing = {row_values(row)[0] for row in cur.fetchall()}
+
+            indexes: Dict[str, List[Tuple[str, Tuple[Optional[str], ...]]]] = {}
+            for table in tables:
+                if table not in existing:
+                    continue
+
+                indexes[table] = []
+                cur.execute(f'PRAGMA table_info("{table}")')
+                keys = sorted((row[5], row[1], row[2]) for row in map(row_values, cur.fetchall()) if row[5])
+                if len(keys) == 1 and keys[0][2].upper() == "INTEGER":
+                    indexes[table].append(("PRIMARY KEY", (keys[0][1],)))
+
+                cur.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", [table])
+                for name in [row_values(row)[0] for row in cur.fetchall()]:
+                    cur.execute(f'PRAGMA index_info("{name}")')
+                    indexes[table].append((name, tuple(row[2] for row in sorted(map(row_values, cur.fetchall())))))
+        finally:
+            cur.close()
+
+        return indexes
+
+    def _render_bulk_update(
+            self, table: str, columns: List[str], keys: List[str], rows: List[Tuple]
+    ) -> Tuple[str, List[Any]]:
+        """sqlite has no column aliases for subqueries, VALUES columns are read by their column1, column2... names
+        Older versions without UPDATE ... FROM get one CASE expression per updated field
+        """
+        row = "({})".format(", ".join([self._unnamed_parameter] * len(columns)))
+        fields = [column for column in columns if column not in keys]
+
+        if self._update_from:
+            names = {column: f"v.column{i}" for i, column in enumerate(columns, 1)}
+            assignments = ", ".join(f"{field} = {names[field]}" for field in fields)
+            join = " AND ".join(f"{table}.{key} = {names[key]}" for key in keys)
+            sql = "UPDATE {} SET {} FROM (VALUES {}) AS v WHERE {}".format(
+                table, assignments, ", ".join([row] * len(rows)), join
+            )
+            return sql, list(itertools.chain.from_iterable(rows))
+
+        key_indexes = [columns.index(key) for key in keys]
+        condition = " AND ".join(f"{key} = {self._unnamed_parameter}" for key in keys)
+
+        assignments = []
+        parameters = []
+        for field in fields:
+            index = columns.index(field)
+            assignments.append(f"{field} = CASE{f' WHEN {condition} THEN ?' * len(rows)} ELSE {field} END")
+            for values in rows:
+                parameters.extend(values[i] for i in key_indexes)
+                parameters.append(values[index])
+
+        key_row = self._unnamed_parameter if len(keys) == 1 else f"({', '.join([self._unnamed_parameter] * len(keys))})"
+        key_fields = keys[0] if len(keys) == 1 else f"({', '.join(keys)})"
+        sql = "UPDATE {} SET {} WHERE {} IN ({})".format(
+            table, ", ".join(assignments), key_fields, ", ".join([key_row] * len(rows))
+        )
+        for values in rows:
+            parameters.extend(values[i] for i in key_indexes)
+
+        return sql, parameters
+
+    def _bulk_update_batch_size(self, batch_size: int, columns: int, keys: int) -> int:
+        if self._update_from:
+            return self._batch_size(batch_size, columns)
+        # Every updated row goes through the WHEN list of each CASE, the cost grows with the square of the batch
+        batch_size = min(batch_size, self._case_batch_size)
+        return self._batch_size(batch_size, (columns - keys) * (keys + 1) + keys)
+
+    def _bulk_insert(
+            self,
+            table: str,
+            columns: List[str],
+            values: Iterator[Tuple],
+            returning: Optional[Union[str, List[str]]],
+            batch_size: int,
+    ) -> Union[int, List[Union[Dict, List]]]:
+        """Insert rows with executemany, sqlite3 steps the same prepared statement for every row"""
+        if returning:
+            # executemany can't return rows, fallback to chunked multi-row inserts
+            return super()._bulk_insert(table, columns, values, returning, batch_size)
+
+        sql = "INSERT INTO {} ({}) VALUES({})".format(
+            table, ", ".join(columns), ", ".join([self._unnamed_parameter] * len(columns))
+        )
+        return self._instrumented(self._cursor, sql, None, lambda: self._cursor.executemany(sql, values)).rowcount
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .builder import BaseSqlify
+
+# Progress of a backfill, stored as json in the migrations table while it runs
+# after = key of the last updated batch, None before the first one
+# rows = rows updated so far
+# done = True once the last batch was updated
+BackfillState = Dict[str, Any]
+
+
+class Backfill(object):
+    """Python migration that updates a large table in batches, each one committed on its own
+
+    Define it as `migration` in a .py file of the migrations folder, the progress is stored in the migrations table
+    after every batch, so an interrupted run continues after the last committed batch
+
+    migration = Backfill(
+        table="books",
+        set="price_cents = price * 100",
+        where="price_cents IS NULL",
+        batch_size=5000,
+        sleep=0.1,
+    )
+    """
+
+    def __init__(
+            self,
+            table: str,
+            set: str,
+            where: Optional[str] = None,
+            key: str = "id",
+            start: Any = None,
+            end: Any = None,
+            batch_size: int = 1000,
+            sleep: float = 0.0,
+    ) -> None:
+        """
+        table = table to update
+        set = SET clause of the update, like "a = b * 2, c = NULL"
+        where = only update the rows matching this condition, ideally excluding the rows already updated
+        key = unique, indexed column the batches are ranged on
+        start, end = only update the rows with start <= key <= end, by default every row
+        batch_size = rows in each batch, each one is a short transaction holding its locks only while it runs
+        sleep = seconds to wait between batches, leaving room for the regular load and replication
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+
+        self.table = table
+        self.set = set
+        self.where = where
+        self.key = key
+        self.start = start
+        self.end = end
+        self.batch_size = batch_size
+        self.sleep = sleep
+
+    def _bounds(self, sqlify: "BaseSqlify", state: BackfillState) -> Tuple[List[str], Dict[str, Any]]:
+        """Key conditions and parameters of the rows still to update"""
+        conditions: List[str] = []
+        parameters: Dict[str, Any] = {}
+
+        if state["after"] is not None:
+            conditions.append(f"{self.key} > {sqlify._format_parameter('backfill_after')}")
+            parameters["backfill_after"] = state["after"]
+        elif self.start is not None:
+            conditions.append(f"{self.key} >= {sqlify._format_parameter('backfill_start')}")
+            parameters["backfill_start"] = self.start
+
+        if self.end is not None:
+            conditions.append(f"{self.key} <= {sqlify._format_parameter('backfill_end')}")
+            parameters["backfill_end"] = self.end
+
+        return conditions, parameters
+
+    def _upper(self, sqlify: "BaseSqlify", conditions: List[str], parameters: Dict[str, Any]) -> Any:
+        """Key of the last row of the next batch, None when the remaining rows fit in a single batch"""
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        row = sqlify.execute(
+            f"SELECT {self.key} FROM {self.table}{where} ORDER BY {self.key} LIMIT 1 OFFSET {self.batch_size - 1}",
+            parameters,
+        ).fetchone()
+
+        if row is None:
+            return None
+        if isinstance(row, dict):
+            return next(iter(row.values()))
+        return row[0]
+
+    def run(
+            self,
+            sqlify: "BaseSqlify",
+            state: Optional[BackfillState],
+            save: Callable[[BackfillState], None],
+            committed: Optional[Callable[[BackfillState], None]] = None,
+    ) -> BackfillState:
+        """Update the rows after state, save is called with the new state in the transaction of each batch
+        committed = called with the new state once each batch is committed
+        """
+        if state is None:
+            state = dict(after=None, rows=0, done=False)
+
+        while not state["done"]:
+            conditions, parameters = self._bounds(sqlify, state)
+
+            # The batch is ranged on the key, instead of LIMIT, so the update uses the key index
+            upper = self._upper(sqlify, conditions, parameters)
+            if upper is not None:
+                conditions.append(f"{self.key} <= {sqlify._format_parameter('backfill_upper')}")
+                parameters["backfill_upper"] = upper
+            if self.where:
+                conditions.append(f"({self.where})")
+
+            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+            with sqlify.transaction():
+                updated = sqlify.execute(f"UPDATE {self.table} SET {self.set}{where}", parameters).rowcount
+                state = dict(after=upper, rows=state["rows"] + max(updated, 0), done=upper is None)
+                save(state)
+            if committed is not None:
+                committed(state)
+
+            if self.sleep and not state["done"]:
+                time.sleep(self.sleep)
+
+        return state
+
+    def __repr__(self) -> str:
+        return f"<Backfill {self.table} SET {self.set}>"
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+from .value_objects import Fetch, Order
+
+if TYPE_CHECKING:
+    from .builder import BaseSqlify
+
+_PENDING = object()
+
+
+class BatchResult(object):
+    """Handle to the result of a query in a batch, available once the batch ran"""
+    __slots__ = ("_value", "_exception")
+
+    def __init__(self) -> None:
+        self._value: Any = _PENDING
+        self._exception: Optional[BaseException] = None
+
+    def done(self) -> bool:
+        return self._value is not _PENDING or self._exception is not None
+
+    def result(self) -> Any:
+        if self._exception is not None:
+            raise self._exception
+        if self._value is _PENDING:
+            raise RuntimeError("The batch didn't run yet, results are available after the batch block")
+        return self._value
+
+    def set_result(self, value: Any) -> None:
+        self._value = value
+
+    def set_exception(self, exception: BaseException) -> None:
+        self._exception = exception
+
+    def __repr__(self) -> str:
+        state = "pending" if not self.done() else ("failed" if self._exception is not None else "done")
+        return f"<BatchResult {state}>"
+
+
+class BatchedQuery(object):
+    __slots__ = ("sql", "parameters", "fetch", "json", "handle")
+
+    def __init__(self, sql: str, parameters: Optional[Union[List, Dict]], fetch: Fetch, json: bool = False) -> None:
+        self.sql = sql
+        self.parameters = parameters
+        self.fetch = fetch
+        self.json = json
+        self.handle = BatchResult()
+
+
+class QueryBatch(object):
+    """Collects independent reads and runs them together, in as few round-trips as the backend allows
+
+    with sqlify.batch() as batch:
+        book = batch.fetchone("books", where=("id = %s", [1]))
+        authors = batch.fetchall("authors")
+
+    print(book.result(), authors.result())
+    """
+
+    def __init__(self, sqlify: "BaseSqlify") -> None:
+        self.queries: List[BatchedQuery] = []
+        self._sqlify = sqlify
+
+    def fetchone(
+            self,
+            table: str,
+            fields: Optional[Union[str, List[str]]] = "*",
+            where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
+            group: Optional[Union[List[str], str]] = None,
+            having: Optional[str] = None,
+            order: Optional[Union[str, Tuple[str, Union[Order, str]]]] = None,
+            offset: Optional[int] = None,
+            with_sq: Optional[Dict[str, str]] = None,
+            json: bool = False,
+    ) -> BatchResult:
+        """Same arguments as BaseSqlify.fetchone
+        json = on psycopg2, send the query with the other json ones in a single round-trip, its row comes back as a
+               dict of json values, see Psycopg2Sqlify._run_batch
+        """
+        return self._add(Fetch.ONE, table, fields, where, group, having, order, 1, offset, with_sq, json)
+
+    def fetchall(
+            self,
+            table: str,
+            fields: Optional[Union[str, List[str]]] = "*",
+            where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
+            group: Optional[Union[List[str], str]] = None,
+            having: Optional[str] = None,
+            order: Optional[Union[str, Tuple[str, Union[Order, str]]]] = None,
+            limit: Optional[int] = None,
+            offset: Optional[int] = None,
+            with_sq: Optional[Dict[str, str]] = None,
+            json: bool = False,
+    ) -> BatchResult:
+        """Same arguments as BaseSqlify.fetchall, json is the same as in fetchone"""
+        return self._add(Fetch.ALL, table, fields, where, group, having, order, limit, offset, with_sq, json)
+
+    def _add(self, fetch: Fetch, table: str, fields: Any, where: Any, group: Any, having: Any, order: Any,
+             limit: Optional[int], offset: Optional[int], with_sq: Optional[Dict[str, str]],
+             json: bool) -> BatchResult:
+        conditions, parameters = self._sqlify._split_where(where)
+        sql = self._sqlify._select(
+            table=table,
+            fields=fields,
+            where=conditions,
+            group=group,
+            having=having,
+            order=order,
+            limit=limit,
+            offset=offset,
+            with_sq=with_sq,
+        )
+
+        query = BatchedQuery(sql, parameters, fetch, json)
+        self.queries.append(query)
+        return query.handle
+
+    def run(self) -> None:
+        """Run the queries collected so far, called when the batch block ends"""
+        queries, self.queries = self.queries, []
+        if queries:
+            self._sqlify._run_batch(queries)
+
+    def __enter__(self) -> "QueryBatch":
+        return self
+
+    def __exit__(self, type_, value, traceback) -> None:
+        if type_ is None:
+            self.run()
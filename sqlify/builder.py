@@ -1,20 +1,50 @@
 # -*- coding: utf-8 -*-
+import itertools
+from collections import OrderedDict
+from contextlib import contextmanager
+from time import perf_counter
 from datetime import datetime
 from io import StringIO
 from logging import Logger
-from typing import Optional, List, Tuple, Union, Dict, IO, Any
+from typing import Optional, List, Set, Tuple, Union, Dict, IO, Any, Iterable, Iterator, Callable
 
+from .batch import QueryBatch, BatchedQuery
+from .cache import SqlCache
+from .columnar import fetch_arrays
+from .explain import QueryPlan, PlanSampler, LARGE_TABLE_ROWS
+from .instrumentation import QueryHook, QueryEvent, LoggingHook
 from .operators import RawSQL, IncreaseSQL, DecreaseSQL, SqlOperator
-from .value_objects import Order, Fetch
+from .pagination import Page, encode_cursor, decode_cursor, column_name
+from .prepared import PreparedQuery
+from .query import Node, Select, Update, Delete, Assignment, assignments
+from .result_cache import ResultCache, MISSING, tables_of, copy_result, normalize_table
+from .rows import convert_row, convert_rows, convert_each, row_format as to_row_format
+from .transactions import CommitBatcher
+from .transfer import data_format, csv_chunks, ndjson_chunks, read_csv, read_ndjson, lines
+from .value_objects import Order, Fetch, DataFormat, RowFormat
+from .workload import WorkloadRecorder, IndexReport, advise
 
+# Rendered statements are shared by every sqlify instance, sessions are usually short-lived
+DEFAULT_SQL_CACHE = SqlCache()
 
-class BaseSqlify(object):
-    connection = None
-    logger = None
+# Query nodes are built from their cache key with tuple.__new__, skipping the namedtuple constructor arguments
+_new = tuple.__new__
 
-    def __init__(self, cursor, logger: Logger = None):
-        self._cursor = cursor
-        self._logger = logger
+
+def _joined(expressions: Union[str, Tuple[str, ...]], separator: str) -> str:
+    """Clauses hold a single expression or a tuple of them"""
+    return expressions if isinstance(expressions, str) else separator.join(expressions)
+
+
+class SqlBuilder(object):
+    """Renders sql from the structured query arguments, shared by the sync and async sqlify classes"""
+    # Maximum number of bound parameters a single statement may carry, None means unlimited
+    _max_parameters: Optional[int] = None
+    # Recorder described every rendered statement, set by record_workload
+    _workload: Optional[WorkloadRecorder] = None
+
+    def __init__(self, sql_cache: Optional[SqlCache] = DEFAULT_SQL_CACHE):
+        self._sql_cache = sql_cache
 
     @property
     def _unnamed_parameter(self):
@@ -23,13 +53,389 @@ class BaseSqlify(object):
     def _format_parameter(self, parameter: str) -> str:
         raise NotImplementedError("Database parameter not defined")
 
-    def _format_where(self, where: Optional[Union[Tuple[Union[List, str], Union[List, Dict]], Union[List, str]]]) \
-            -> Optional[Tuple[str, Union[List, Dict]]]:
-        if where and len(where) > 0 and isinstance(where[0], list):
-            # Where is a list, we must convert it into a string
-            where = (" and ".join(where[0]), where[1])
+    def _format_insert(self, data):
+        """Format insert dict values into strings"""
+        cols = ", ".join(data.keys())
+        vals = ", ".join([self._unnamed_parameter for k in data])
+
+        return cols, vals
+
+    def _render_insert(
+            self, table: str, data: Dict[str, Any], returning: Optional[Union[str, List[str]]] = None
+    ) -> str:
+        cols, vals = self._format_insert(data)
+        sql = "INSERT INTO {} ({}) VALUES({})".format(table, cols, vals)
+        return sql + self._returning(returning)
+
+    def _format_bulk_insert(
+            self, table: str, columns: List[str], rows: int, returning: Optional[Union[str, List[str]]] = None
+    ) -> str:
+        """Format a multi-row insert statement for the given number of rows"""
+        row = "({})".format(", ".join([self._unnamed_parameter] * len(columns)))
+        sql = "INSERT INTO {} ({}) VALUES {}".format(table, ", ".join(columns), ", ".join([row] * rows))
+        return sql + self._returning(returning)
+
+    def _batch_size(self, batch_size: int, columns: int, reserved: int = 0) -> int:
+        """Cap the number of rows per statement so it stays under the driver parameter limit
+        reserved = parameters used by the statement outside of the rows values
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+
+        if self._max_parameters is None:
+            return batch_size
+
+        return max(1, min(batch_size, (self._max_parameters - reserved) // max(columns, 1)))
+
+    @staticmethod
+    def _rows_values(columns: List[str], rows: Iterable[Dict[str, Any]]) -> Iterator[Tuple]:
+        """Lazily convert dict rows into value tuples ordered by columns"""
+        for row in rows:
+            if len(row) != len(columns):
+                raise ValueError(f"Every row must have the same fields: {', '.join(columns)}")
+            yield tuple([row[column] for column in columns])
+
+    @staticmethod
+    def _chunks(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+        """Split an iterable into lists of up to size items, without materializing it"""
+        iterator = iter(iterable)
+        while True:
+            chunk = list(itertools.islice(iterator, size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _format_upsert(
+            self,
+            table: str,
+            columns: List[str],
+            conflict_target: List[str],
+            update_fields: Optional[Union[List[str], Dict[str, Any]]],
+    ) -> Tuple[str, List[Any]]:
+        """Format the ON CONFLICT clause, returns it with the parameters used by the SET expressions"""
+        if update_fields is None:
+            update_fields = [column for column in columns if column not in conflict_target]
+
+        target = ", ".join(conflict_target)
+        if not update_fields:
+            return f" ON CONFLICT ({target}) DO NOTHING", []
+
+        arguments = []
+        parameters = []
+        if isinstance(update_fields, dict):
+            for key, value in update_fields.items():
+                if isinstance(value, RawSQL):
+                    arguments.append(f"{key} = {value}")
+                elif isinstance(value, IncreaseSQL):
+                    arguments.append(f"{key} = {table}.{key} + {self._unnamed_parameter}")
+                    parameters.append(value)
+                elif isinstance(value, DecreaseSQL):
+                    arguments.append(f"{key} = {table}.{key} - {self._unnamed_parameter}")
+                    parameters.append(value)
+                else:
+                    arguments.append(f"{key} = {self._unnamed_parameter}")
+                    parameters.append(value)
+        else:
+            arguments = [f"{field} = excluded.{field}" for field in update_fields]
+
+        return f" ON CONFLICT ({target}) DO UPDATE SET {', '.join(arguments)}", parameters
+
+    def _render_bulk_update(
+            self, table: str, columns: List[str], keys: List[str], rows: List[Tuple]
+    ) -> Tuple[str, List[Any]]:
+        """Update every row in a single UPDATE ... FROM (VALUES ...) statement
+        rows = value tuples ordered by columns, the key fields included
+        """
+        row = "({})".format(", ".join([self._unnamed_parameter] * len(columns)))
+        assignments = ", ".join(f"{column} = v.{column}" for column in columns if column not in keys)
+        join = " AND ".join(f"{table}.{key} = v.{key}" for key in keys)
+
+        sql = "UPDATE {} SET {} FROM (VALUES {}) AS v ({}) WHERE {}".format(
+            table, assignments, ", ".join([row] * len(rows)), ", ".join(columns), join
+        )
+        return sql, list(itertools.chain.from_iterable(rows))
+
+    def _render_update(
+            self,
+            table: str,
+            data: Dict[str, Any],
+            conditions: Optional[Union[str, List[str]]] = None,
+            returning: Optional[Union[str, List[str]]] = None,
+    ) -> str:
+        return self._statement((
+            type(self),
+            Update,
+            table,
+            assignments(data),
+            tuple(conditions) if conditions.__class__ is list else conditions or None,
+            tuple(returning) if returning.__class__ is list else returning or None,
+        ))
+
+    @staticmethod
+    def _update_arguments(data: Dict[str, Any], parameters: Optional[Union[List, Dict]] = None) -> Dict[str, Any]:
+        """Rename data keys to the _datainput parameters of the rendered SET and merge the where parameters"""
+        arguments = {}
+        for key, value in data.items():
+            arguments[key + "_datainput"] = value  # TODO
+
+        if parameters is not None:
+            arguments.update(parameters)
 
-        return where
+        return arguments
+
+    def _render_delete(
+            self,
+            table: str,
+            conditions: Optional[Union[str, List[str]]] = None,
+            returning: Optional[Union[str, List[str]]] = None,
+    ) -> str:
+        return self._statement((
+            type(self),
+            Delete,
+            table,
+            tuple(conditions) if conditions.__class__ is list else conditions or None,
+            tuple(returning) if returning.__class__ is list else returning or None,
+        ))
+
+    def _split_where(self,
+                     where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None) \
+            -> Tuple[Union[str, List[str], None], Union[List, Dict, None]]:
+        if not where:
+            return (None, None)
+
+        if not isinstance(where, tuple):
+            return (where, None)
+
+        if len(where) == 1:
+            return (where[1], None)
+
+        return (where[0], where[1])
+
+    def _returning(self, returning: Optional[Union[str, List[str]]]) -> str:
+        if not returning:
+            return ""
+
+        if isinstance(returning, list):
+            return f" RETURNING {', '.join(returning)}"
+
+        return f" RETURNING {returning}"
+
+    def _select(
+            self, table=None, fields=(), where=None, group=None, having=None, order=None, limit=None, offset=None,
+            with_sq=None
+    ) -> str:
+        return self._statement((
+            type(self),
+            Select,
+            table,
+            tuple(fields) if fields.__class__ is list else fields or "*",
+            tuple(where) if where.__class__ is list else where or None,
+            tuple(group) if group.__class__ is list else group or None,
+            having or None,
+            tuple(order) if order.__class__ is list else order or None,
+            limit or None,
+            offset or None,
+            tuple(with_sq.items()) if with_sq else None,
+        ))
+
+    def _statement(self, key: Tuple) -> str:
+        """Render a statement from its key, the sqlify class, the node class and the node fields
+        The arguments are lowered straight into the key, which is all a cache hit needs, the node is only built to
+        render a miss
+        """
+        cache = self._sql_cache
+        if cache is None or not cache.enabled:
+            sql = self._render(_new(key[1], key[2:]))
+        else:
+            sql = cache.get(key)
+            if sql is None:
+                sql = self._render(_new(key[1], key[2:]))
+                cache.set(key, sql)
+
+        if self._workload is not None:
+            self._workload.describe(sql, key[1], key[2:])
+        return sql
+
+    def _render(self, node: Node) -> str:
+        if node.__class__ is Select:
+            return self._render_select(node)
+        if node.__class__ is Update:
+            return self._render_update_node(node)
+        if node.__class__ is Delete:
+            return self._render_delete_node(node)
+
+        raise TypeError(f"Can't render {type(node).__name__} nodes")
+
+    def _render_select(self, node: Select) -> str:
+        table, fields, where, group, having, order, limit, offset, with_ = node
+        if order is not None and not isinstance(order, str):
+            order = f"{order[0]} {order[1] if isinstance(order[1], str) else order[1].value}"
+
+        parts = []
+        if with_:
+            parts.append("WITH " + ", ".join([f"{name} as ({sq})" for name, sq in with_]) + " ")
+        parts.append(f"SELECT {_joined(fields, ', ')} FROM {table}")
+        if where:
+            parts.append(f" WHERE {_joined(where, ' AND ')}")
+        if group:
+            parts.append(f" GROUP BY {_joined(group, ', ')}")
+        if having:
+            parts.append(f" HAVING {having}")
+        if order:
+            parts.append(f" ORDER BY {order}")
+        if limit:
+            parts.append(f" LIMIT {limit}")
+        if offset:
+            parts.append(f" OFFSET {offset}")
+
+        return "".join(parts)
+
+    def _render_update_node(self, node: Update) -> str:
+        arguments = []
+        for assignment in node.assignments:
+            if isinstance(assignment, str):
+                arguments.append(f"{assignment} = {self._format_parameter(assignment + '_datainput')}")
+            elif assignment.operation == Assignment.RAW:
+                arguments.append(f"{assignment.column} = {assignment.expression}")
+            else:
+                column = assignment.column
+                parameter = self._format_parameter(column + "_datainput")
+                arguments.append(f"{column} = {column} {assignment.operation} {parameter}")
+
+        parts = [f"UPDATE {node.table} SET {', '.join(arguments)}"]
+        if node.where:
+            parts.append(f" WHERE {_joined(node.where, ' AND ')}")
+        if node.returning:
+            parts.append(f" RETURNING {_joined(node.returning, ', ')}")
+
+        return "".join(parts)
+
+    def _render_delete_node(self, node: Delete) -> str:
+        parts = [f"DELETE FROM {node.table}"]
+        if node.where:
+            parts.append(f" WHERE {_joined(node.where, ' AND ')}")
+        if node.returning:
+            parts.append(f" RETURNING {_joined(node.returning, ', ')}")
+
+        return "".join(parts)
+
+    def _keyset_predicate(
+            self, keys: List[str], direction: str, values: List[Any], parameters: Optional[Union[List, Dict]]
+    ) -> Tuple[str, Union[List, Dict]]:
+        """Build the (a, b) > (x, y) condition that seeks past the last row of the previous page"""
+        operator = "<" if direction == "DESC" else ">"
+
+        if isinstance(parameters, dict):
+            names = [f"keyset_{index}" for index in range(len(keys))]
+            placeholders = [self._format_parameter(name) for name in names]
+            parameters = {**parameters, **dict(zip(names, values))}
+        else:
+            placeholders = [self._unnamed_parameter] * len(keys)
+            parameters = list(parameters or ()) + list(values)
+
+        if len(keys) == 1:
+            return f"{keys[0]} {operator} {placeholders[0]}", parameters
+
+        return f"({', '.join(keys)}) {operator} ({', '.join(placeholders)})", parameters
+
+
+class BaseSqlify(SqlBuilder):
+    connection = None
+    logger = None
+
+    def __init__(
+            self,
+            cursor,
+            logger: Logger = None,
+            sql_cache: Optional[SqlCache] = DEFAULT_SQL_CACHE,
+            hooks: Optional[List[QueryHook]] = None,
+            row_format: Optional[Union[RowFormat, str]] = None,
+            result_cache: Optional[ResultCache] = None,
+    ):
+        """
+        cursor = database cursor used to run every query
+        logger = optional logger, every query is logged with debug level
+        sql_cache = cache for rendered select statements, pass None to disable it
+        hooks = instrumentation hooks called before and after every query
+        row_format = format of the returned rows, None keeps the rows created by the cursor
+        result_cache = read-through cache for fetchone and fetchall results, disabled by default
+        """
+        super().__init__(sql_cache)
+        self._cursor = cursor
+        self._logger = logger
+        self._row_format = None if row_format is None else to_row_format(row_format)
+        self.result_cache = result_cache
+        # Tables written since the last commit or rollback, their reads skip the result cache
+        self._uncommitted: Set[str] = set()
+        self._transaction_depth = 0
+        self._savepoints = 0
+        self._hooks: List[QueryHook] = list(hooks or ())
+        if logger is not None:
+            self._hooks.append(LoggingHook(logger))
+
+    def _fetchone(self, cur) -> Any:
+        """Fetch a single row in the configured row format"""
+        row = cur.fetchone()
+        if self._row_format is None:
+            return row
+        return convert_row(self._row_format, cur.description, row)
+
+    def _fetchall(self, cur) -> Any:
+        """Fetch every row in the configured row format"""
+        result = cur.fetchall()
+        if self._row_format is None:
+            return result
+        return convert_rows(self._row_format, cur.description, result)
+
+    def _convert_rows(self, description: Any, rows: List[Any]) -> Any:
+        """Rows fetched outside of _fetchall in the configured row format"""
+        if self._row_format is None:
+            return rows
+        return convert_rows(self._row_format, description, rows)
+
+    def _cached_read(
+            self,
+            table: str,
+            with_sq: Optional[Dict[str, str]],
+            sql: str,
+            parameters: Optional[Union[List, Dict]],
+            cache_ttl: Optional[float],
+            fetch: Callable[[Any], Any],
+    ) -> Any:
+        """Run a read through the result cache, when it has a ttl"""
+        cache = self.result_cache
+        tables = tables_of(table, with_sq)
+        ttl = cache.ttl_for(tables, cache_ttl)
+        # Rows written by the open transaction must not be cached, a rollback wouldn't drop them
+        if not ttl or self._uncommitted.intersection(tables):
+            return fetch(self.execute(sql, parameters))
+
+        key = cache.key(tables, sql, parameters, self._row_format)
+        result = cache.get(key)
+        if result is MISSING:
+            result = fetch(self.execute(sql, parameters))
+            cache.set(key, result, ttl)
+        return copy_result(result)
+
+    def _invalidate(self, table: str) -> None:
+        """Drop the cached results of a table, or comma separated tables, after writing to it"""
+        if self.result_cache is not None:
+            names = table.split(",")
+            self.result_cache.invalidate(*names)
+            self._uncommitted.update(normalize_table(name.strip()) for name in names)
+
+    def _transaction_ended(self) -> None:
+        """Invalidate the tables written by the transaction again, other sessions may have cached them meanwhile"""
+        if self._uncommitted:
+            self.result_cache.invalidate(*self._uncommitted)
+            self._uncommitted.clear()
+
+    def add_hook(self, hook: QueryHook) -> None:
+        """Register an instrumentation hook"""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: QueryHook) -> None:
+        self._hooks.remove(hook)
 
     def fetchone(
             self,
@@ -41,6 +447,7 @@ class BaseSqlify(object):
             order: Optional[Union[str, Tuple[str, Union[Order, str]]]] = None,
             offset: int = None,
             with_sq: Optional[Dict[str, str]] = None,
+            cache_ttl: Optional[float] = None,
     ) -> Optional[Union[Dict, List]]:
         """Get a single result
         table = (str) table_name
@@ -48,6 +455,7 @@ class BaseSqlify(object):
         where = ("parameterized_statement", [parameters])
                 eg: ("id=%s and name=%s", [1, "test"])
         order = [field, ASC|DESC]
+        cache_ttl = seconds to keep the result in the result cache, 0 skips the cache
         """
         conditions, parameters = self._split_where(where)
 
@@ -62,8 +470,11 @@ class BaseSqlify(object):
             offset=offset,
             with_sq=with_sq,
         )
+        if self.result_cache is not None:
+            return self._cached_read(table, with_sq, sql, parameters, cache_ttl, self._fetchone)
+
         cur = self.execute(sql, parameters)
-        return cur.fetchone()
+        return self._fetchone(cur)
 
     def fetchall(
             self,
@@ -76,6 +487,7 @@ class BaseSqlify(object):
             limit: Optional[int] = None,
             offset: Optional[int] = None,
             with_sq: Optional[Dict[str, str]] = None,
+            cache_ttl: Optional[float] = None,
     ) -> Optional[List[Union[Dict, List]]]:
         """Get all results
         table = (str) table_name
@@ -83,6 +495,7 @@ class BaseSqlify(object):
         where = ("parameterized_statement", [parameters])
                 eg: ("id=%s and name=%s", [1, "test"])
         order = [field, ASC|DESC]
+        cache_ttl = seconds to keep the result in the result cache, 0 skips the cache
         limit = [limit, offset]
         """
         conditions, parameters = self._split_where(where)
@@ -98,8 +511,218 @@ class BaseSqlify(object):
             offset=offset,
             with_sq=with_sq,
         )
+        if self.result_cache is not None:
+            return self._cached_read(table, with_sq, sql, parameters, cache_ttl, self._fetchall)
+
         cur = self.execute(sql, parameters)
-        return cur.fetchall()
+        return self._fetchall(cur)
+
+    def iterate(
+            self,
+            table: str,
+            fields: Optional[Union[str, List[str]]] = "*",
+            where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
+            group: Optional[Union[List[str], str]] = None,
+            having: Optional[str] = None,
+            order: Optional[Union[str, Tuple[str, Union[Order, str]]]] = None,
+            limit: Optional[int] = None,
+            offset: Optional[int] = None,
+            with_sq: Optional[Dict[str, str]] = None,
+            batch_size: int = 1000,
+    ) -> Iterator[Union[Dict, List]]:
+        """Lazily iterate over all results, fetching batch_size rows at a time
+        Accepts the same arguments as fetchall, the query runs on a dedicated cursor so other queries can be executed
+        while iterating
+
+        for book in sqlify.iterate("books", order="id"):
+            ...
+        """
+        conditions, parameters = self._split_where(where)
+
+        sql = self._select(
+            table=table,
+            fields=fields,
+            where=conditions,
+            group=group,
+            having=having,
+            order=order,
+            limit=limit,
+            offset=offset,
+            with_sq=with_sq,
+        )
+
+        cur = self._open_stream(sql, parameters, batch_size)
+        try:
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                if self._row_format is None:
+                    yield from rows
+                else:
+                    yield from convert_each(self._row_format, cur.description, rows)
+        finally:
+            cur.close()
+
+    def fetch_arrays(
+            self,
+            table: str,
+            fields: Optional[Union[str, List[str]]] = "*",
+            where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
+            group: Optional[Union[List[str], str]] = None,
+            having: Optional[str] = None,
+            order: Optional[Union[str, Tuple[str, Union[Order, str]]]] = None,
+            limit: Optional[int] = None,
+            offset: Optional[int] = None,
+            with_sq: Optional[Dict[str, str]] = None,
+            dtypes: Optional[Dict[str, Any]] = None,
+            batch_size: int = 10000,
+            size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Get all results as a dict of column name to array, numpy arrays when numpy is installed or array.array
+        and lists otherwise. The arrays are filled batch by batch, rows are never all in memory as python objects
+        Accepts the same arguments as fetchall
+        dtypes = column name to numpy dtype or array typecode, the other columns are inferred from the first batch
+                 given dtypes are kept, values they can't hold, like nulls in an integer column, raise ValueError
+        size = expected number of rows, used to preallocate the arrays
+
+        prices = sqlify.fetch_arrays("books", fields=["id", "price"], dtypes=dict(price="float32"))["price"]
+        """
+        conditions, parameters = self._split_where(where)
+
+        sql = self._select(
+            table=table,
+            fields=fields,
+            where=conditions,
+            group=group,
+            having=having,
+            order=order,
+            limit=limit,
+            offset=offset,
+            with_sq=with_sq,
+        )
+
+        cur = self._open_stream(sql, parameters, batch_size)
+        try:
+            return fetch_arrays(lambda: cur.fetchmany(batch_size), lambda: cur.description, dtypes, size)
+        finally:
+            cur.close()
+
+    def _stream_cursor(self, batch_size: int) -> Any:
+        """Cursor used by iterate, a new one so the main cursor results are left untouched"""
+        return self._cursor.connection.cursor()
+
+    def _open_stream(self, sql: str, parameters: Optional[Union[List, Dict]], batch_size: int) -> Any:
+        """Execute sql on a new stream cursor, closing it is up to the caller"""
+        cur = self._stream_cursor(batch_size)
+        try:
+            if not self._hooks:
+                cur.execute(sql, parameters or ())
+            else:
+                self._instrumented(cur, sql, parameters, lambda: cur.execute(sql, parameters or ()))
+        except BaseException:
+            cur.close()
+            raise
+        return cur
+
+    def paginate(
+            self,
+            table: str,
+            key: Union[str, List[str]],
+            fields: Optional[Union[str, List[str]]] = "*",
+            where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
+            direction: Union[Order, str] = Order.ASC,
+            page_size: int = 100,
+            cursor: Optional[str] = None,
+            with_sq: Optional[Dict[str, str]] = None,
+    ) -> Page:
+        """Get a page of results using keyset pagination, the cost of each page is constant unlike offset
+        key = unique field or list of fields to order the results by, they must be selected in fields
+        direction = ASC|DESC, applied to every key field
+        cursor = token from the previous page, None for the first page
+
+        page = sqlify.paginate("books", key=["published", "id"], page_size=50)
+        next_page = sqlify.paginate("books", key=["published", "id"], page_size=50, cursor=page.cursor)
+        """
+        keys = [key] if isinstance(key, str) else list(key)
+        direction = direction.value if isinstance(direction, Order) else direction.upper()
+
+        conditions, parameters = self._split_where(where)
+        if conditions is None:
+            conditions = []
+        elif isinstance(conditions, str):
+            conditions = [conditions]
+        else:
+            conditions = list(conditions)
+
+        if cursor is not None:
+            values = decode_cursor(cursor)
+            if len(values) != len(keys):
+                raise ValueError("The pagination cursor doesn't match the key fields")
+
+            predicate, parameters = self._keyset_predicate(keys, direction, values, parameters)
+            conditions.append(predicate)
+
+        sql = self._select(
+            table=table,
+            fields=fields,
+            where=conditions,
+            order=", ".join(f"{field} {direction}" for field in keys),
+            limit=page_size + 1,
+            with_sq=with_sq,
+        )
+        cur = self.execute(sql, parameters)
+        rows = cur.fetchmany(page_size + 1)
+
+        if len(rows) <= page_size:
+            return Page(self._convert_rows(cur.description, rows), None)
+
+        rows = rows[:page_size]
+        names = [column[0] for column in cur.description]
+        indexes = []
+        for field in keys:
+            try:
+                indexes.append(names.index(column_name(field)))
+            except ValueError:
+                raise ValueError(f"The key field {field} must be included in the selected fields") from None
+
+        last = rows[-1]
+        if isinstance(last, dict):
+            values = [last[names[index]] for index in indexes]
+        else:
+            values = [last[index] for index in indexes]
+
+        return Page(self._convert_rows(cur.description, rows), encode_cursor(values))
+
+    def iterate_pages(
+            self,
+            table: str,
+            key: Union[str, List[str]],
+            fields: Optional[Union[str, List[str]]] = "*",
+            where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
+            direction: Union[Order, str] = Order.ASC,
+            page_size: int = 100,
+            cursor: Optional[str] = None,
+            with_sq: Optional[Dict[str, str]] = None,
+    ) -> Iterator[Page]:
+        """Walk all results page by page with keyset pagination, accepts the same arguments as paginate"""
+        while True:
+            page = self.paginate(
+                table=table,
+                key=key,
+                fields=fields,
+                where=where,
+                direction=direction,
+                page_size=page_size,
+                cursor=cursor,
+                with_sq=with_sq,
+            )
+            if len(page):
+                yield page
+
+            if page.cursor is None:
+                return
+            cursor = page.cursor
 
     def insert(
             self,
@@ -108,11 +731,10 @@ class BaseSqlify(object):
             returning: str = None,
     ) -> Optional[Union[Dict, int]]:
         """Insert a record"""
-        cols, vals = self._format_insert(data)
-        sql = "INSERT INTO {} ({}) VALUES({})".format(table, cols, vals)
-        sql += self._returning(returning)
+        sql = self._render_insert(table, data, returning)
         cur = self.execute(sql, list(data.values()))
-        return cur.fetchone() if returning else cur.rowcount
+        self._invalidate(table)
+        return self._fetchone(cur) if returning else cur.rowcount
 
     def update(
             self,
@@ -121,21 +743,14 @@ class BaseSqlify(object):
             where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
             returning: str = None,
     ) -> Optional[Union[Dict, int]]:
-        """Insert a record"""
+        """Update records based on a where condition"""
         conditions, parameters = self._split_where(where)
-        query = self._format_update(data)
-        arguments = {}
-        for key, value in data.items():
-            arguments[key + "_datainput"] = value  # TODO
-
-        sql = "UPDATE {} SET {}".format(table, query)
-        sql += self._where(conditions) + self._returning(returning)
-
-        if parameters is not None:
-            arguments.update(parameters)
+        sql = self._render_update(table, data, conditions, returning)
+        arguments = self._update_arguments(data, parameters)
 
         cur = self.execute(sql, arguments)
-        return cur.fetchall() if returning else cur.rowcount
+        self._invalidate(table)
+        return self._fetchall(cur) if returning else cur.rowcount
 
     def delete(
             self,
@@ -146,10 +761,362 @@ class BaseSqlify(object):
         """Delete rows based on a where condition"""
         conditions, parameters = self._split_where(where)
 
-        sql = f"DELETE FROM {table}"
-        sql += self._where(conditions) + self._returning(returning)
+        sql = self._render_delete(table, conditions, returning)
         cur = self.execute(sql, parameters)
-        return cur.fetchall() if returning else cur.rowcount
+        self._invalidate(table)
+        return self._fetchall(cur) if returning else cur.rowcount
+
+    def prepare(
+            self,
+            method: str,
+            table: str,
+            fields: Optional[Union[str, List[str]]] = "*",
+            where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
+            group: Optional[Union[List[str], str]] = None,
+            having: Optional[str] = None,
+            order: Optional[Union[str, Tuple[str, Union[Order, str]]]] = None,
+            limit: Optional[int] = None,
+            offset: Optional[int] = None,
+            with_sq: Optional[Dict[str, str]] = None,
+            data: Optional[Dict[str, Union[str, bool, int, datetime, SqlOperator]]] = None,
+            returning: Optional[Union[str, List[str]]] = None,
+            server_side: bool = False,
+    ) -> PreparedQuery:
+        """Render a query once and return a reusable prepared query, that is called with just the parameters
+        method = one of fetchone, fetchall, update or delete, the remaining arguments are the same as that method
+        where = conditions only, or a tuple with conditions and default parameters
+        data = update only, the keys define the SET clause, values are the defaults for each call
+        server_side = use the database PREPARE/EXECUTE statements, when the backend supports them
+
+        query = sqlify.prepare("fetchone", "books", where="id = %(id)s")
+        book = query(dict(id=1))
+        """
+        conditions, parameters = self._split_where(where)
+        sql, fetch = self._render_method(
+            method, table, fields, conditions, group, having, order, limit, offset, with_sq, data, returning
+        )
+
+        return PreparedQuery(
+            sqlify=self,
+            sql=sql,
+            fetch=fetch,
+            parameters=parameters,
+            data=data,
+            server_side=server_side,
+            writes=None if method in ("fetchone", "fetchall") else table,
+        )
+
+    def _render_method(
+            self,
+            method: str,
+            table: str,
+            fields: Optional[Union[str, List[str]]],
+            conditions: Optional[Union[str, List[str]]],
+            group: Optional[Union[List[str], str]],
+            having: Optional[str],
+            order: Optional[Union[str, Tuple[str, Union[Order, str]]]],
+            limit: Optional[int],
+            offset: Optional[int],
+            with_sq: Optional[Dict[str, str]],
+            data: Optional[Dict[str, Any]],
+            returning: Optional[Union[str, List[str]]],
+    ) -> Tuple[str, Optional[Fetch]]:
+        """Render the statement fetchone, fetchall, update or delete would run, and how its result is fetched"""
+        if method in ("fetchone", "fetchall"):
+            sql = self._select(
+                table=table,
+                fields=fields,
+                where=conditions,
+                group=group,
+                having=having,
+                order=order,
+                limit=1 if method == "fetchone" else limit,
+                offset=offset,
+                with_sq=with_sq,
+            )
+            return sql, Fetch.ONE if method == "fetchone" else Fetch.ALL
+        elif method == "update":
+            if not data:
+                raise ValueError("Updates require the data argument")
+            return self._render_update(table, data, conditions, returning), Fetch.ALL if returning else None
+        elif method == "delete":
+            return self._render_delete(table, conditions, returning), Fetch.ALL if returning else None
+
+        raise ValueError(f"Method {method} isn't supported, use fetchone, fetchall, update or delete")
+
+    def explain(
+            self,
+            method: str,
+            table: str,
+            fields: Optional[Union[str, List[str]]] = "*",
+            where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
+            group: Optional[Union[List[str], str]] = None,
+            having: Optional[str] = None,
+            order: Optional[Union[str, Tuple[str, Union[Order, str]]]] = None,
+            limit: Optional[int] = None,
+            offset: Optional[int] = None,
+            with_sq: Optional[Dict[str, str]] = None,
+            data: Optional[Dict[str, Union[str, bool, int, datetime, SqlOperator]]] = None,
+            returning: Optional[Union[str, List[str]]] = None,
+            analyze: bool = True,
+            large_table_rows: int = LARGE_TABLE_ROWS,
+    ) -> QueryPlan:
+        """Plan of the query that fetchone, fetchall, update or delete would run with the same arguments
+        method = one of fetchone, fetchall, update or delete, the remaining arguments are the same as that method
+        analyze = run the query to measure each step, analyzed updates and deletes are rolled back
+                  sqlite plans are never analyzed, EXPLAIN QUERY PLAN doesn't run the query
+        large_table_rows = full scans of tables with at least this many rows are listed in QueryPlan.seq_scans
+
+        plan = sqlify.explain("fetchall", "books", where=("genre = %(genre)s", dict(genre="fiction")))
+        for node in plan.seq_scans:
+            print(f"{node.table} is read without an index")
+        """
+        conditions, parameters = self._split_where(where)
+        sql, _ = self._render_method(
+            method, table, fields, conditions, group, having, order, limit, offset, with_sq, data, returning
+        )
+        if method == "update":
+            parameters = self._update_arguments(data, parameters)
+
+        return self._explain(sql, parameters, analyze, large_table_rows, writes=method in ("update", "delete"))
+
+    def _explain(
+            self,
+            sql: str,
+            parameters: Optional[Union[List, Dict]],
+            analyze: bool,
+            large_table_rows: int,
+            writes: bool = False,
+    ) -> QueryPlan:
+        """Run EXPLAIN on a cursor of its own, bypassing the hooks, and parse the plan
+        writes = the statement changes rows, which an analyzed plan must undo
+        """
+        raise NotImplementedError(f"{type(self).__name__} can't explain queries")
+
+    def sample_plans(
+            self, threshold: float = 0.5, large_table_rows: int = LARGE_TABLE_ROWS, maxlen: int = 100
+    ) -> PlanSampler:
+        """Capture the plan of the queries slower than threshold seconds, see PlanSampler
+
+        sampler = sqlify.sample_plans(threshold=0.2)
+        ...
+        for sql, plan in sampler.plans.items():
+            print(plan.seq_scans)
+        """
+        sampler = PlanSampler(self, threshold, large_table_rows, maxlen, self._logger)
+        self.add_hook(sampler)
+        return sampler
+
+    def record_workload(self, recorder: Optional[WorkloadRecorder] = None) -> WorkloadRecorder:
+        """Record the columns each query filters, sorts and groups on, with their timing, see WorkloadRecorder
+        recorder = shared by many sqlify objects, like the sessions of a pool, a new one by default
+
+        recorder = sqlify.record_workload()
+        ...
+        print(sqlify.advise_indexes(recorder))
+        """
+        if recorder is None:
+            recorder = WorkloadRecorder()
+        self._workload = recorder
+        self.add_hook(recorder)
+        return recorder
+
+    def advise_indexes(self, recorder: Optional[WorkloadRecorder] = None, min_calls: int = 1) -> IndexReport:
+        """Indexes that would serve the recorded query shapes no existing index serves
+        recorder = by default the one passed to record_workload
+        min_calls = skip the shapes called fewer times
+
+        report = sqlify.advise_indexes()
+        report.write_migration(migrations)
+        """
+        recorder = recorder or self._workload
+        if recorder is None:
+            raise ValueError("No workload was recorded, call record_workload first")
+
+        shapes = recorder.shapes()
+        tables = list(OrderedDict.fromkeys(shape.table for shape in shapes))
+        return advise(shapes, self._indexes(tables) if tables else {}, min_calls)
+
+    def _indexes(self, tables: List[str]) -> Dict[str, List[Tuple[str, Tuple[Optional[str], ...]]]]:
+        """Name and columns of the indexes of each table that exists, None for expression columns"""
+        raise NotImplementedError(f"{type(self).__name__} can't list indexes")
+
+    def batch(self) -> QueryBatch:
+        """Collect independent reads and run them together when the block ends, see QueryBatch
+        Backends without a way to send many queries at once run them one after the other
+        """
+        return QueryBatch(self)
+
+    def _run_batch(self, queries: List[BatchedQuery]) -> None:
+        """Run the batched queries one by one, a failure also fails the queries that didn't run"""
+        for index, query in enumerate(queries):
+            try:
+                cur = self.execute(query.sql, query.parameters)
+                query.handle.set_result(self._fetchone(cur) if query.fetch is Fetch.ONE else self._fetchall(cur))
+            except Exception as e:
+                for failed in queries[index:]:
+                    failed.handle.set_exception(e)
+                raise
+
+    def _execute_prepared(self, query: PreparedQuery, parameters: Optional[Union[List, Dict]]) -> Any:
+        """Run a prepared query, backends without server side prepared statements rely on the driver cache"""
+        return self.execute(query.sql, parameters)
+
+    def bulk_insert(
+            self,
+            table: str,
+            rows: Iterable[Dict[str, Any]],
+            returning: Optional[Union[str, List[str]]] = None,
+            batch_size: int = 1000,
+    ) -> Union[int, List[Union[Dict, List]]]:
+        """Insert many records using as few statements as possible
+        rows = any iterable of dicts with the same keys, generators are consumed lazily
+        returning = fields to return, when set a list with every inserted row is returned instead of the row count
+        batch_size = maximum number of rows sent in a single statement
+        """
+        iterator = iter(rows)
+        first = next(iterator, None)
+        if first is None:
+            return [] if returning else 0
+
+        columns = list(first.keys())
+        values = self._rows_values(columns, itertools.chain([first], iterator))
+
+        try:
+            result = self._bulk_insert(table, columns, values, returning, self._batch_size(batch_size, len(columns)))
+            return self._convert_rows(self._cursor.description, result) if returning else result
+        finally:
+            # Earlier batches may be written even when a later one fails
+            self._invalidate(table)
+
+    def _bulk_insert(
+            self,
+            table: str,
+            columns: List[str],
+            values: Iterator[Tuple],
+            returning: Optional[Union[str, List[str]]],
+            batch_size: int,
+    ) -> Union[int, List[Union[Dict, List]]]:
+        """Insert rows in chunks of multi-row VALUES statements"""
+        rowcount = 0
+        results = []
+        full_batch_sql = None
+        for chunk in self._chunks(values, batch_size):
+            if len(chunk) == batch_size:
+                if full_batch_sql is None:
+                    full_batch_sql = self._format_bulk_insert(table, columns, batch_size, returning)
+                sql = full_batch_sql
+            else:
+                sql = self._format_bulk_insert(table, columns, len(chunk), returning)
+
+            cur = self.execute(sql, list(itertools.chain.from_iterable(chunk)))
+            if returning:
+                results.extend(cur.fetchall())
+            else:
+                rowcount += cur.rowcount
+
+        return results if returning else rowcount
+
+    def upsert(
+            self,
+            table: str,
+            rows: Iterable[Dict[str, Any]],
+            conflict_target: Union[str, List[str]],
+            update_fields: Optional[Union[List[str], Dict[str, Union[str, bool, int, datetime, SqlOperator]]]] = None,
+            returning: Optional[Union[str, List[str]]] = None,
+            batch_size: int = 1000,
+    ) -> Union[int, List[Union[Dict, List]]]:
+        """Insert many records, updating the ones that conflict with existing rows
+        rows = any iterable of dicts with the same keys, generators are consumed lazily
+        conflict_target = field or list of fields with a unique constraint
+        update_fields = fields updated on conflict, by default every field outside the conflict target
+            a list of fields is set to the values being inserted, eg: name = excluded.name
+            a dict allows RawSQL, IncreaseSQL, DecreaseSQL or plain values for each field
+            an empty list or dict ignores the conflicting rows
+        returning = fields to return, when set a list with the returned rows is returned instead of the row count
+
+        sqlify.upsert("stock", rows, conflict_target="sku", update_fields=dict(quantity=RawSQL("excluded.quantity")))
+        """
+        conflict_target = [conflict_target] if isinstance(conflict_target, str) else list(conflict_target)
+
+        iterator = iter(rows)
+        first = next(iterator, None)
+        if first is None:
+            return [] if returning else 0
+
+        columns = list(first.keys())
+        values = self._rows_values(columns, itertools.chain([first], iterator))
+        on_conflict, set_parameters = self._format_upsert(table, columns, conflict_target, update_fields)
+        batch_size = self._batch_size(batch_size, len(columns), reserved=len(set_parameters))
+
+        rowcount = 0
+        results = []
+        full_batch_sql = None
+        try:
+            for chunk in self._chunks(values, batch_size):
+                if len(chunk) == batch_size:
+                    if full_batch_sql is None:
+                        full_batch_sql = self._format_bulk_insert(table, columns, batch_size) + on_conflict
+                        full_batch_sql += self._returning(returning)
+                    sql = full_batch_sql
+                else:
+                    sql = self._format_bulk_insert(table, columns, len(chunk)) + on_conflict
+                    sql += self._returning(returning)
+
+                cur = self.execute(sql, list(itertools.chain.from_iterable(chunk)) + set_parameters)
+                if returning:
+                    results.extend(cur.fetchall())
+                else:
+                    rowcount += cur.rowcount
+        finally:
+            self._invalidate(table)
+
+        return self._convert_rows(self._cursor.description, results) if returning else rowcount
+
+    def bulk_update(
+            self,
+            table: str,
+            rows: Iterable[Dict[str, Any]],
+            key: Union[str, List[str]] = "id",
+            batch_size: int = 1000,
+    ) -> int:
+        """Update many records with different values each, in batches of a single statement
+        rows = any iterable of dicts with the same keys, each one with the key fields and the fields to update
+        key = field or list of fields that identify each row
+        Returns the number of updated rows
+
+        sqlify.bulk_update("books", [dict(id=1, price=10), dict(id=2, price=12)], key="id")
+        """
+        keys = [key] if isinstance(key, str) else list(key)
+
+        iterator = iter(rows)
+        first = next(iterator, None)
+        if first is None:
+            return 0
+
+        columns = list(first.keys())
+        missing = [field for field in keys if field not in columns]
+        if missing:
+            raise ValueError(f"Every row must include the key fields: {', '.join(missing)}")
+        if len(columns) == len(keys):
+            raise ValueError("Rows must have at least one field to update besides the key fields")
+
+        values = self._rows_values(columns, itertools.chain([first], iterator))
+        batch_size = self._bulk_update_batch_size(batch_size, len(columns), len(keys))
+
+        rowcount = 0
+        try:
+            for chunk in self._chunks(values, batch_size):
+                sql, parameters = self._render_bulk_update(table, columns, keys, chunk)
+                rowcount += self.execute(sql, parameters).rowcount
+        finally:
+            self._invalidate(table)
+
+        return rowcount
+
+    def _bulk_update_batch_size(self, batch_size: int, columns: int, keys: int) -> int:
+        """Rows per statement in bulk_update, each row takes one parameter per column"""
+        return self._batch_size(batch_size, columns)
 
     def execute(
             self,
@@ -158,12 +1125,31 @@ class BaseSqlify(object):
             fetch: Optional[Fetch] = None,
     ) -> Any:
         """Executes a raw query"""
-        # self._cursor.timestamp = time.time()
-        self._cursor.execute(sql, params or ())
-        # self._logger.debug("query", self._cursor.query)
+        if not self._hooks:
+            self._cursor.execute(sql, params or ())
+        else:
+            self._instrumented(self._cursor, sql, params, lambda: self._cursor.execute(sql, params or ()))
 
         return self._cursor
 
+    def _instrumented(self, cursor, sql: str, params: Optional[Union[List, Dict]], call: Callable[[], Any]) -> Any:
+        """Run a driver call surrounded by the registered hooks"""
+        for hook in self._hooks:
+            hook.before(sql, params)
+
+        exception = None
+        start = perf_counter()
+        try:
+            return call()
+        except BaseException as e:
+            exception = e
+            raise
+        finally:
+            duration = perf_counter() - start
+            event = QueryEvent(sql, params, duration, -1 if exception else cursor.rowcount, exception)
+            for hook in self._hooks:
+                hook.after(event)
+
     def copy_expert(
             self,
             file: Union[IO, StringIO],
@@ -173,22 +1159,152 @@ class BaseSqlify(object):
             order: Optional[Tuple[str, Order]] = None,
             limit: Optional[int] = None,
             offset: Optional[int] = None,
-    ) -> IO:
-        """Export query to file
-        table = (str) table_name
-        fields = (field1, field2 ...) list of fields to select
-        where = ("parameterized_statement", [parameters])
-                eg: ("id=%s and name=%s", [1, "test"])
-        order = [field, ASC|DESC]
-        limit = [limit, offset]
+    ) -> Optional[int]:
+        """Export query to a csv file with header, kept for compatibility, see export"""
+        return self.export(
+            table=table,
+            file=file,
+            fields=fields,
+            where=where,
+            order=order,
+            limit=limit,
+            offset=offset,
+            format=DataFormat.CSV,
+        )
+
+    def export(
+            self,
+            table: str,
+            file: Optional[IO] = None,
+            fields: Optional[Union[str, List[str]]] = "*",
+            where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None,
+            group: Optional[Union[List[str], str]] = None,
+            having: Optional[str] = None,
+            order: Optional[Union[str, Tuple[str, Union[Order, str]]]] = None,
+            limit: Optional[int] = None,
+            offset: Optional[int] = None,
+            with_sq: Optional[Dict[str, str]] = None,
+            format: Union[DataFormat, str] = DataFormat.CSV,
+            header: bool = True,
+            batch_size: int = 1000,
+    ) -> Union[Optional[int], Iterator[Union[str, bytes]]]:
+        """Export query results without loading them all in memory
+        Accepts the same filters as fetchall
+        file = file-like object to write to, when None a generator of chunks is returned instead
+        format = CSV, NDJSON or BINARY (postgres only)
+        header = write the column names as the first csv line
+
+        with open("books.csv", "w") as file:
+            sqlify.export("books", file, where=("genre = %s", ["fiction"]))
         """
         conditions, parameters = self._split_where(where)
 
-        sql = self._select(table, fields, conditions, order, limit, offset)
-        sql = f"copy ({sql}) to stdout with csv delimiter ',' header"
-        sql = self._cursor.mogrify(sql, parameters)
+        sql = self._select(
+            table=table,
+            fields=fields,
+            where=conditions,
+            group=group,
+            having=having,
+            order=order,
+            limit=limit,
+            offset=offset,
+            with_sq=with_sq,
+        )
+        return self._export(sql, parameters, data_format(format), header, batch_size, file)
+
+    def _export(
+            self,
+            sql: str,
+            parameters: Optional[Union[List, Dict]],
+            format: DataFormat,
+            header: bool,
+            batch_size: int,
+            file: Optional[IO],
+    ) -> Union[Optional[int], Iterator[Union[str, bytes]]]:
+        """Export with batched fetchmany, returns the row count when writing to a file"""
+        if format is DataFormat.BINARY:
+            raise NotImplementedError("Binary exports are only supported by postgres")
+
+        counter = [0]
+        chunks = self._export_chunks(sql, parameters, format, header, batch_size, counter)
+        if file is None:
+            return chunks
+
+        for chunk in chunks:
+            file.write(chunk)
+        return counter[0]
+
+    def _export_chunks(
+            self,
+            sql: str,
+            parameters: Optional[Union[List, Dict]],
+            format: DataFormat,
+            header: bool,
+            batch_size: int,
+            counter: List[int],
+    ) -> Iterator[str]:
+        cur = self._open_stream(sql, parameters, batch_size)
+        try:
+            columns = [column[0] for column in cur.description]
+
+            def batches() -> Iterator[List[Any]]:
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        return
+                    counter[0] += len(rows)
+                    yield rows
+
+            if format is DataFormat.CSV:
+                yield from csv_chunks(columns, batches(), header)
+            else:
+                yield from ndjson_chunks(columns, batches())
+        finally:
+            cur.close()
 
-        return self._cursor.copy_expert(sql=sql, file=file)
+    def load(
+            self,
+            table: str,
+            file: Union[IO, Iterable[Union[str, bytes]]],
+            columns: Optional[List[str]] = None,
+            format: Union[DataFormat, str] = DataFormat.CSV,
+            header: bool = True,
+            batch_size: int = 1000,
+    ) -> int:
+        """Import rows from a file-like object or an iterable of chunks, returns the number of rows imported
+        columns = target columns, by default the csv header or the keys of the first json object
+        format = CSV, NDJSON or BINARY (postgres only)
+        header = the first csv line has the column names
+
+        with open("books.csv") as file:
+            sqlify.load("books", file)
+        """
+        try:
+            return self._load(table, file, columns, data_format(format), header, batch_size)
+        finally:
+            self._invalidate(table)
+
+    def _load(
+            self,
+            table: str,
+            file: Union[IO, Iterable[Union[str, bytes]]],
+            columns: Optional[List[str]],
+            format: DataFormat,
+            header: bool,
+            batch_size: int,
+    ) -> int:
+        """Import with batched bulk inserts"""
+        if format is DataFormat.CSV:
+            columns, rows = read_csv(lines(file), columns, header)
+        elif format is DataFormat.NDJSON:
+            columns, rows = read_ndjson(lines(file), columns)
+        else:
+            raise NotImplementedError("Binary imports are only supported by postgres")
+
+        if not columns:
+            return 0
+
+        return self._bulk_insert(table, columns, rows, None, self._batch_size(batch_size, len(columns)))
 
     def truncate(self, table: str, restart_identity: bool = False, cascade: bool = False) -> None:
         """Truncate a table or set of tables
@@ -201,6 +1317,7 @@ class BaseSqlify(object):
         if cascade:
             sql += " CASCADE"
         self.execute(sql)
+        self._invalidate(table)
 
     def drop(self, table: str, cascade: bool = False) -> None:
         """Drop a table"""
@@ -208,6 +1325,7 @@ class BaseSqlify(object):
         if cascade:
             sql += " CASCADE"
         self.execute(sql)
+        self._invalidate(table)
 
     def create(self, table: str, schema: str) -> None:
         """Create a table with the schema provided
@@ -217,132 +1335,76 @@ class BaseSqlify(object):
     def commit(self) -> None:
         """Commit a transaction"""
         self._cursor.connection.commit()
+        self._transaction_ended()
 
     def rollback(self) -> None:
         """Roll-back a transaction"""
         self._cursor.connection.rollback()
+        self._transaction_ended()
 
-    def _format_insert(self, data):
-        """Format insert dict values into strings"""
-        cols = ", ".join(data.keys())
-        vals = ", ".join([self._unnamed_parameter for k in data])
-
-        return cols, vals
-
-    def _format_update(self, data):
-        """Format update dict values into string"""
-        arguments = []
-        for key, value in data.items():
-            if isinstance(value, RawSQL):
-                arguments.append(f"{key} = {value}")
-            elif isinstance(value, IncreaseSQL):
-                arguments.append(f"{key} = {key} + {self._format_parameter(key + '_datainput')}")
-            elif isinstance(value, DecreaseSQL):
-                arguments.append(f"{key} = {key} - {self._format_parameter(key + '_datainput')}")
-            else:
-                arguments.append(f"{key} = {self._format_parameter(key + '_datainput')}")
-        return ", ".join(arguments)  # This removed the last comma in string
-
-    def _split_where(self,
-                     where: Optional[Union[str, List[str], Tuple[Union[List[str], str], Union[List, Dict]]]] = None) \
-            -> Tuple[Union[str, List[str], None], Union[List, Dict, None]]:
-        if not where:
-            return (None, None)
-
-        if not isinstance(where, tuple):
-            return (where, None)
-
-        if len(where) == 1:
-            return (where[1], None)
-
-        return (where[0], where[1])
-
-    def _where(self, conditions: Optional[Union[List, str]] = None) -> str:
-        if not conditions:
-            return ""
-
-        if isinstance(conditions, list):
-            return f" WHERE {' AND '.join(conditions)}"
-
-        return f" WHERE {conditions}"
-
-    def _having(self, having: Optional[str] = None) -> str:
-        if not having:
-            return ""
-
-        return f" HAVING {having}"
-
-    def _with_sq(self, with_sq: Optional[Dict[str, str]] = None) -> str:
-        if not with_sq:
-            return ""
-
-        return "WITH " + ", ".join(
-            [f"{key} as ({value})" for key, value in with_sq.items()]
-        )
-
-    def _group(self, group: Optional[Union[List[str], str]] = None) -> str:
-        if not group:
-            return ""
-
-        if isinstance(group, list):
-            return f" GROUP BY {', '.join(group)}"
-
-        return f" GROUP BY {group} "
-
-    def _order(self, order: Optional[Union[str, Tuple[str, Union[Order, str]]]] = None) -> str:
-        if not order:
-            return ""
-
-        if isinstance(order, str):
-            return f" ORDER BY {order}"
-
-        # If order is not a string, then it must be a tuple, here we just need to check the type of the 2º parameter
-        if isinstance(order[1], str):
-            return f" ORDER BY {order[0]} {order[1]}"
-
-        # Second parameter must be of type Order
-        return f" ORDER BY {order[0]} {order[1].value}"
-
-    def _limit(self, limit: Optional[int]) -> str:
-        if limit:
-            return f" LIMIT {limit}"
-        return ""
-
-    def _offset(self, offset: Optional[int]) -> str:
-        if offset:
-            return f" OFFSET {offset}"
-        return ""
+    @contextmanager
+    def transaction(self) -> Iterator["BaseSqlify"]:
+        """Run a block in a transaction, committed when the block ends and rolled back when it raises
+        Nested transactions become savepoints, only the inner block is rolled back
 
-    def _returning(self, returning: Optional[Union[str, List[str]]]) -> str:
-        if not returning:
-            return ""
-
-        if isinstance(returning, list):
-            return f" RETURNING {', '.join(returning)}"
-
-        return f" RETURNING {returning}"
-
-    def _fields(self, fields: Union[str, List[str]]) -> str:
-        if isinstance(fields, str):
-            return fields
+        with sqlify.transaction():
+            sqlify.insert("books", data=dict(name="A book"))
+        """
+        if self._transaction_depth:
+            with self.savepoint():
+                yield self
+            return
 
-        # It must be a list of strings
-        return ', '.join(fields)
+        explicit = self._begin_transaction()
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._transaction_depth -= 1
+            self._end_transaction(explicit, commit=False)
+            raise
+
+        self._transaction_depth -= 1
+        self._end_transaction(explicit, commit=True)
+
+    @contextmanager
+    def savepoint(self, name: Optional[str] = None) -> Iterator["BaseSqlify"]:
+        """Run a block inside a savepoint of the current transaction, rolled back to when the block raises"""
+        if name is None:
+            self._savepoints += 1
+            name = f"sqlify_savepoint_{self._savepoints}"
+
+        self.execute(f"SAVEPOINT {name}")
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._transaction_depth -= 1
+            self.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            self.execute(f"RELEASE SAVEPOINT {name}")
+            raise
+
+        self._transaction_depth -= 1
+        self.execute(f"RELEASE SAVEPOINT {name}")
+
+    def commit_every(self, n: int) -> CommitBatcher:
+        """Commit every n calls to step, see CommitBatcher"""
+        return CommitBatcher(self, n)
+
+    def _begin_transaction(self) -> bool:
+        """Make sure a transaction is open, returns True when it must be ended with COMMIT/ROLLBACK statements
+        instead of the connection methods
+        """
+        return False
 
-    def _select(
-            self, table=None, fields=(), where=None, group=None, having=None, order=None, limit=None, offset=None,
-            with_sq=None
-    ) -> str:
-        return (
-                self._with_sq(with_sq)
-                + f"SELECT {self._fields(fields)} FROM {table}"
-                + self._where(where)
-                + self._group(group)
-                + self._having(having)
-                + self._order(order)
-                + self._limit(limit)
-                + self._offset(offset)
-        )
+    def _end_transaction(self, explicit: bool, commit: bool) -> None:
+        if explicit:
+            self.execute("COMMIT" if commit else "ROLLBACK")
+            self._transaction_ended()
+        elif commit:
+            self.commit()
+        else:
+            self.rollback()
 
     def __del__(self):
         try:
@@ -352,15 +1414,5 @@ class BaseSqlify(object):
                 raise e
 
 
-class Psycopg2Sqlify(BaseSqlify):
-    _unnamed_parameter = "%s"
-
-    def _format_parameter(self, parameter: str) -> str:
-        return f"%({parameter})s"
-
-
-class Sqlite3Sqlify(BaseSqlify):
-    _unnamed_parameter = "?"
-
-    def _format_parameter(self, parameter: str) -> str:
-        return f":{parameter}"
+# The backends moved to sqlify.backends, imported last since they subclass BaseSqlify
+from .backends import Psycopg2Sqlify, Psycopg3Sqlify, Sqlite3Sqlify, DuckdbCursor, DuckdbSqlify  # noqa: E402,F401
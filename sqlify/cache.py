@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional
+
+
+class SqlCache(object):
+    """Bounded LRU cache of rendered sql strings, keyed on the query shape"""
+
+    def __init__(self, maxsize: int = 512) -> None:
+        self.maxsize = maxsize
+        self.enabled = True
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._data: "OrderedDict[Hashable, str]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[str]:
+        # Lookups are lock-free, single OrderedDict operations are atomic under the GIL
+        try:
+            sql = self._data[key]
+            self._data.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return sql
+
+    def set(self, key: Hashable, sql: str) -> None:
+        with self._lock:
+            self._data[key] = sql
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every cached query and reset the counters"""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            size=len(self._data),
+            maxsize=self.maxsize,
+        )
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def freeze(value: Any) -> Hashable:
+    """Convert the builder arguments into a hashable representation
+    lists and dicts are tagged with their type, so they never share a key with an equivalent tuple
+    """
+    if isinstance(value, list):
+        return (list,) + tuple(freeze(item) for item in value)
+
+    if isinstance(value, dict):
+        return (dict,) + tuple((key, freeze(item)) for key, item in value.items())
+
+    if isinstance(value, tuple):
+        return tuple(freeze(item) for item in value)
+
+    return value
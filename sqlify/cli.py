@@ -1,6 +1,8 @@
-from typing import List, Optional
+import threading
+from typing import Callable, ContextManager, Dict, List, Optional
 
-from .exceptions import TyperNotFound
+from .builder import BaseSqlify
+from .exceptions import MigrationTargetsFailed, TyperNotFound
 from .migrations import Migrations
 
 try:
@@ -10,7 +12,13 @@ except ModuleNotFoundError:
     Typer = None
 
 
-def build_typer_cli(migrations_service: Migrations) -> Typer:
+def build_typer_cli(
+        migrations_service: Migrations,
+        targets: Optional[Dict[str, Callable[[], ContextManager[BaseSqlify]]]] = None,
+) -> Typer:
+    """Typer app with the migration commands
+    targets = databases or schemas migrated together by migrate-targets, see Migrations.migrate_many
+    """
     if Typer is None:
         raise TyperNotFound("Typer dependency is not installed!")
 
@@ -35,8 +43,21 @@ def build_typer_cli(migrations_service: Migrations) -> Typer:
         display_migrations(migrations)
 
     @cli.command()
-    def make_migration():
-        typer.secho(f"{migrations_service.make_migration()} Created", fg=typer.colors.GREEN)
+    def verify():
+        drift = migrations_service.verify()
+
+        if len(drift) == 0:
+            typer.secho("Applied migrations match their files", fg=typer.colors.GREEN)
+            return
+
+        typer.secho("Applied migrations that no longer match their files:", fg=typer.colors.RED)
+        for migration in drift:
+            typer.secho(f" - {migration.name} {migration.status}", fg=typer.colors.RED)
+        raise typer.Exit(code=1)
+
+    @cli.command()
+    def make_migration(backfill: bool = False):
+        typer.secho(f"{migrations_service.make_migration(backfill=backfill)} Created", fg=typer.colors.GREEN)
 
     @cli.command()
     def migrate(filename: Optional[str] = None, fake: bool = False, yes: bool = False):
@@ -44,7 +65,8 @@ def build_typer_cli(migrations_service: Migrations) -> Typer:
 
         if filename is not None:
             if {filename, f"{filename}.sql", migrations_service.get_migration_name(filename)}.intersection(set(migrations)):
-                migrations = [migrations_service.get_migration_name(filename)]
+                name = migrations_service.get_migration_name(filename)
+                migrations = [i for i in migrations if migrations_service.get_migration_name(i) == name]
             elif filename.isdigit() and len([i for i in migrations if i.startswith(filename.zfill(4))]) > 0:
                 migrations = [i for i in migrations if i.startswith(filename.zfill(4))]
             else:
@@ -65,8 +87,53 @@ def build_typer_cli(migrations_service: Migrations) -> Typer:
             typer.echo("No Migrations applied")
             raise typer.Abort()
 
-        for file in migrations:
-            migrations_service.apply_migration(filename=file, fake=fake)
+        def applied(file: str, position: int, total: int) -> None:
             typer.secho(f"[{migrations_service.get_migration_name(file)}] Migration Applied", fg=typer.colors.GREEN)
 
+        migrations_service.migrate(migrations, fake=fake, progress=applied)
+
+    if targets is not None:
+        @cli.command()
+        def migrate_targets(workers: Optional[int] = None, fake: bool = False, yes: bool = False):
+            if fake is True:
+                typer.secho("FAKE is Active", fg=typer.colors.BRIGHT_YELLOW)
+
+            typer.secho(f"Databases to migrate: {', '.join(targets)}", fg=typer.colors.GREEN)
+            _continue = yes or typer.confirm("Are you sure you want to continue?")
+            if _continue is False:
+                typer.echo("No Migrations applied")
+                raise typer.Abort()
+
+            lock = threading.Lock()
+
+            def applied(target: str, file: str, position: int, total: int) -> None:
+                with lock:
+                    name = migrations_service.get_migration_name(file)
+                    typer.secho(f"[{target}] ({position}/{total}) {name} Migration Applied", fg=typer.colors.GREEN)
+
+            try:
+                results = migrations_service.migrate_many(targets, workers=workers, fake=fake, progress=applied)
+            except MigrationTargetsFailed as e:
+                results = e.applied
+                for target, error in e.failures.items():
+                    completed = e.completed.get(target)
+                    if completed:
+                        last = migrations_service.get_migration_name(completed[-1])
+                        typer.secho(f"[{target}] Failed after {len(completed)} Migrations Applied, the last one {last}: "
+                                    f"{error}", fg=typer.colors.RED)
+                    else:
+                        typer.secho(f"[{target}] Failed, no migrations applied: {error}", fg=typer.colors.RED)
+
+                    if target in e.backfills:
+                        file, state = e.backfills[target]
+                        typer.secho(f"[{target}] {migrations_service.get_migration_name(file)} committed "
+                                    f"{state['rows']} rows before failing, the next run resumes it",
+                                    fg=typer.colors.YELLOW)
+
+            for target, files in results.items():
+                typer.secho(f"[{target}] {len(files)} Migrations Applied", fg=typer.colors.GREEN)
+
+            if len(results) < len(targets):
+                raise typer.Exit(code=1)
+
     return cli
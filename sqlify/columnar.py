@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+from array import array
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .rows import row_values
+
+try:
+    import numpy
+except ModuleNotFoundError:
+    numpy = None
+
+
+def _infer(values: Sequence[Any]) -> Optional[str]:
+    """Type of a column from the values of the first batch, None when only a list can hold it
+    Returns a numpy dtype name, array.array typecodes are derived from it
+    """
+    kinds = {type(value) for value in values if value is not None}
+    has_nulls = any(value is None for value in values)
+
+    if kinds == {bool}:
+        return None if has_nulls else "bool"
+    if kinds == {int}:
+        # Integer arrays have no null, nan only exists for floats
+        return "float64" if has_nulls else "int64"
+    if kinds and kinds <= {int, float}:
+        return "float64"
+    return None
+
+
+_TYPECODES = {"bool": "b", "int64": "q", "float64": "d", "int32": "i", "float32": "f"}
+
+# Largest integer every float64 holds exactly
+_EXACT_FLOAT = 2 ** 53
+
+
+def _float_value(value: Any) -> bool:
+    """Whether a float64 column can hold value without losing it"""
+    if value is None or isinstance(value, float):
+        return True
+    return isinstance(value, int) and not isinstance(value, bool) and abs(value) <= _EXACT_FLOAT
+
+
+class ColumnBuilder(object):
+    """Accumulates the values of a single column, batch by batch
+    strict = the dtype was given by the caller, values it can't hold raise instead of widening it
+    """
+
+    def __init__(self, dtype: Any, capacity: int, name: Optional[str] = None, strict: bool = False) -> None:
+        self.dtype = dtype
+        self.name = name
+        self.strict = strict
+        self.size = 0
+        self._data: Any = self._allocate(capacity)
+
+    def _check_widen(self) -> None:
+        if self.strict:
+            raise ValueError(
+                f"Column {self.name} has values its dtype {self.dtype} can't hold, like nulls in an integer or bool "
+                f"column, use a float or object dtype"
+            )
+
+    def _allocate(self, capacity: int) -> Any:
+        raise NotImplementedError()
+
+    def extend(self, values: Sequence[Any]) -> None:
+        raise NotImplementedError()
+
+    def result(self) -> Any:
+        raise NotImplementedError()
+
+
+class NumpyColumn(ColumnBuilder):
+    """Preallocated numpy array, grown by doubling its capacity when a batch doesn't fit"""
+
+    def _allocate(self, capacity: int) -> Any:
+        return numpy.empty(capacity, dtype=self.dtype)
+
+    def extend(self, values: Sequence[Any]) -> None:
+        end = self.size + len(values)
+        if end > len(self._data):
+            grown = self._allocate(max(end, len(self._data) * 2))
+            grown[:self.size] = self._data[:self.size]
+            self._data = grown
+
+        try:
+            if self._data.dtype.kind == "b" and None in values:
+                # numpy would store them as False
+                raise TypeError("bool arrays have no null")
+            if not self.strict and not self._fits(values):
+                # numpy would truncate floats in integer arrays and turn numbers into True in bool ones
+                raise TypeError(f"{self.dtype} can't hold the values of this batch")
+            self._data[self.size:end] = values
+        except (TypeError, ValueError, OverflowError):
+            self._widen(values)
+            self._data[self.size:end] = values
+        self.size = end
+
+    def _fits(self, values: Sequence[Any]) -> bool:
+        """Whether the inferred dtype holds every value as it is, only checked for the kinds _infer returns"""
+        kind = self._data.dtype.kind
+        if kind == "b":
+            return all(isinstance(value, (bool, numpy.bool_)) for value in values)
+        if kind in "iu":
+            return all(isinstance(value, int) and not isinstance(value, bool) for value in values)
+        if kind == "f":
+            return all(_float_value(value) for value in values)
+        return True
+
+    def _widen(self, values: Sequence[Any]) -> None:
+        """A value the dtype can't hold, integers with nulls or floats become floats, anything else becomes objects"""
+        self._check_widen()
+        dtype: Any = object
+        if self._data.dtype.kind in "iu" and all(_float_value(value) for value in values):
+            dtype = "float64"
+        self.dtype = dtype
+        self._data = self._data.astype(dtype)
+
+    def result(self) -> Any:
+        if self.size == len(self._data):
+            return self._data
+        return self._data[:self.size].copy()
+
+
+class ArrayColumn(ColumnBuilder):
+    """array.array of the dtype typecode, or a list for values that aren't numbers"""
+
+    def _allocate(self, capacity: int) -> Any:
+        # array.array grows in place with amortized reallocations, there is nothing to preallocate
+        return [] if self.dtype is None else array(self.dtype)
+
+    def extend(self, values: Sequence[Any]) -> None:
+        if isinstance(self._data, array):
+            try:
+                if self._data.typecode in "fd":
+                    values = [float("nan") if value is None else value for value in values]
+                # Converted first so a failing batch leaves nothing half appended
+                self._data.extend(array(self._data.typecode, values))
+            except (TypeError, OverflowError):
+                self._widen(values)
+                self.extend(values)
+                return
+        else:
+            self._data.extend(values)
+        self.size += len(values)
+
+    def _widen(self, values: Sequence[Any]) -> None:
+        self._check_widen()
+        if self._data.typecode in "bhilq" and all(value is None or isinstance(value, int) for value in values):
+            self.dtype = "d"
+            self._data = array("d", self._data)
+        else:
+            self.dtype = None
+            self._data = self._data.tolist()
+
+    def result(self) -> Any:
+        return self._data
+
+
+def column_builder(
+        dtype: Optional[Any], capacity: int, use_numpy: bool, name: Optional[str] = None, strict: bool = False
+) -> ColumnBuilder:
+    """dtype = numpy dtype (or name) with numpy, array.array typecode or dtype name without it, None for objects"""
+    if use_numpy:
+        return NumpyColumn(object if dtype is None else dtype, capacity, name, strict)
+    return ArrayColumn(_TYPECODES.get(dtype, dtype) if isinstance(dtype, str) else dtype, capacity, name, strict)
+
+
+def fetch_arrays(
+        fetchmany: Callable[[], List[Any]],
+        description: Callable[[], Sequence[Sequence[Any]]],
+        dtypes: Optional[Dict[str, Any]] = None,
+        size: Optional[int] = None,
+        use_numpy: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """Fill one array per column from fetchmany batches
+    description is called after the first batch, named cursors only know their columns once they fetched
+    size = expected number of rows, the arrays are allocated once when it is right
+    """
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    elif use_numpy and numpy is None:
+        raise ModuleNotFoundError("numpy is not installed, install sqlify[numpy]")
+
+    def next_batch() -> List[Any]:
+        rows = fetchmany()
+        if rows and isinstance(rows[0], dict):
+            return [row_values(row) for row in rows]
+        return rows
+
+    dtypes = dtypes or {}
+    batch = next_batch()
+    columns = [column[0] for column in description()]
+    getters = [itemgetter(index) for index in range(len(columns))]
+    values = [list(map(getter, batch)) for getter in getters]
+
+    capacity = max(size or 0, len(batch))
+    builders = []
+    for column, column_values in zip(columns, values):
+        if column in dtypes:
+            builders.append(column_builder(dtypes[column], capacity, use_numpy, column, strict=True))
+        else:
+            builders.append(column_builder(_infer(column_values), capacity, use_numpy, column))
+
+    while batch:
+        for builder, column_values in zip(builders, values):
+            builder.extend(column_values)
+
+        batch = next_batch()
+        values = [list(map(getter, batch)) for getter in getters]
+
+    return {column: builder.result() for column, builder in zip(columns, builders)}
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+if TYPE_CHECKING:
+    from .builder import BaseSqlify
+    from .pool import SessionPool
+
+# A read for parallel_fetch, a callable that receives a sqlify object or a (method name, keyword arguments) tuple
+Query = Union[Callable[["BaseSqlify"], Any], Tuple[str, Dict[str, Any]]]
+
+
+class ThreadLocalSqlify(object):
+    """Hands every thread its own sqlify object, created on first use with factory
+
+    Sqlify objects keep a cursor, and DB-API cursors must not be shared between threads. Attribute access is forwarded
+    to the sqlify object of the calling thread, so a single instance can be shared by every thread
+
+    sqlify = ThreadLocalSqlify(lambda: Psycopg2Sqlify(connection.cursor()))
+    """
+
+    def __init__(self, factory: Callable[[], "BaseSqlify"]) -> None:
+        self._factory = factory
+        self._local = threading.local()
+        self._created: List["BaseSqlify"] = []
+        self._lock = threading.Lock()
+
+    @property
+    def sqlify(self) -> "BaseSqlify":
+        """The sqlify object of the calling thread"""
+        try:
+            return self._local.sqlify
+        except AttributeError:
+            sqlify = self._local.sqlify = self._factory()
+            with self._lock:
+                self._created.append(sqlify)
+            return sqlify
+
+    def close(self) -> None:
+        """Close the cursor of every thread"""
+        with self._lock:
+            created, self._created = self._created, []
+        for sqlify in created:
+            sqlify._cursor.close()
+        self._local = threading.local()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.sqlify, name)
+
+
+def _run(sqlify: "BaseSqlify", query: Query) -> Any:
+    if callable(query):
+        return query(sqlify)
+
+    method, kwargs = query
+    return getattr(sqlify, method)(**kwargs)
+
+
+def parallel_fetch(pool: "SessionPool", queries: Sequence[Query], workers: Optional[int] = None) -> List[Any]:
+    """Run independent reads concurrently, each on its own pooled connection, the results are returned in order
+    queries = callables that receive a sqlify object, or (method name, keyword arguments) tuples
+    workers = number of threads, by default one per query up to the pool max_size
+    The first failure is raised once the queries already running finish, the ones that didn't start are cancelled
+
+    totals, latest = parallel_fetch(pool, [
+        ("fetchone", dict(table="sales", fields="sum(amount)")),
+        lambda sqlify: sqlify.fetchall("sales", order=("id", "DESC"), limit=10),
+    ])
+    """
+    if not queries:
+        return []
+    if workers is None:
+        workers = min(len(queries), pool.max_size)
+
+    def task(query: Query) -> Any:
+        with pool.session() as sqlify:
+            return _run(sqlify, query)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sqlify") as executor:
+        futures: List[Future] = [executor.submit(task, query) for query in queries]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
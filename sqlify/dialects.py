@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+import importlib
+import threading
+import warnings
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+
+from .aio import AiosqliteSqlify, AsyncpgSqlify
+from .backends import DuckdbCursor, DuckdbSqlify, Psycopg2Sqlify, Psycopg3Sqlify, Sqlite3Sqlify
+from .exceptions import DialectNotFound
+from .value_objects import DatabaseType
+
+try:
+    from importlib.metadata import entry_points
+except ImportError:  # Python 3.7
+    try:
+        from importlib_metadata import entry_points  # type: ignore
+    except ImportError:
+        entry_points = None  # type: ignore
+
+# Entry point group third party packages register their dialects in
+ENTRY_POINT_GROUP = "sqlify.dialects"
+
+
+@lru_cache(maxsize=None)
+def _driver_class(module: str, name: str) -> Optional[type]:
+    """The connection class of a driver, None when the driver isn't installed"""
+    try:
+        return getattr(importlib.import_module(module), name)
+    except (ImportError, AttributeError):
+        return None
+
+
+class Dialect(object):
+    """A database driver sqlify can run on, the sqlify class renders its sql and runs it through the driver
+
+    Packages add dialects with an entry point in the sqlify.dialects group, pointing to a Dialect subclass or instance
+
+    [project.entry-points."sqlify.dialects"]
+    mydb = "sqlify_mydb:MyDbDialect"
+    """
+    # Name used as Session database_type
+    name: str = ""
+    # BaseSqlify subclass for the driver, or an AsyncBaseSqlify subclass for asynchronous drivers
+    sqlify: Any = None
+    asynchronous = False
+    # (module, class name) of the driver connections, the module is only imported to detect connections
+    connection_class: Optional[Tuple[str, str]] = None
+
+    def detect(self, connection: Any) -> bool:
+        """Whether connection belongs to this driver"""
+        if self.connection_class is None:
+            return False
+        cls = _driver_class(*self.connection_class)
+        return cls is not None and isinstance(connection, cls)
+
+    def cursor(self, connection: Any) -> Any:
+        """The cursor given to the sqlify object of a Session"""
+        return connection.cursor()
+
+    def begin(self, connection: Any) -> None:
+        """Called when an autocommit Session starts, for drivers that don't open transactions implicitly"""
+
+    def commit(self, connection: Any) -> None:
+        """Called when an autocommit Session ends"""
+        connection.commit()
+
+    def rollback(self, connection: Any) -> None:
+        """Called when an autocommit Session raises, and when a pool takes a connection back"""
+        connection.rollback()
+
+    def is_open(self, connection: Any) -> bool:
+        return True
+
+    def __repr__(self) -> str:
+        return f"<Dialect {self.name}>"
+
+
+class Psycopg2Dialect(Dialect):
+    name = "psycopg2"
+    sqlify = Psycopg2Sqlify
+    connection_class = ("psycopg2.extensions", "connection")
+
+    def is_open(self, connection: Any) -> bool:
+        return not connection.closed
+
+
+class Psycopg3Dialect(Dialect):
+    name = "psycopg3"
+    sqlify = Psycopg3Sqlify
+    connection_class = ("psycopg", "Connection")
+
+    def is_open(self, connection: Any) -> bool:
+        return not connection.closed
+
+
+class Sqlite3Dialect(Dialect):
+    name = "sqlite3"
+    sqlify = Sqlite3Sqlify
+    connection_class = ("sqlite3", "Connection")
+
+    def is_open(self, connection: Any) -> bool:
+        from sqlite3 import ProgrammingError
+
+        try:
+            connection.total_changes
+        except ProgrammingError:
+            return False
+        return True
+
+
+class DuckdbDialect(Dialect):
+    """duckdb cursors are separate connections with their own transactions, sessions use the connection itself"""
+    name = "duckdb"
+    sqlify = DuckdbSqlify
+    connection_class = ("duckdb", "DuckDBPyConnection")
+
+    def cursor(self, connection: Any) -> Any:
+        return DuckdbCursor(connection)
+
+    def begin(self, connection: Any) -> None:
+        # duckdb connections run in autocommit mode until a transaction is started
+        DuckdbCursor(connection).begin()
+
+    def commit(self, connection: Any) -> None:
+        DuckdbCursor(connection).commit()
+
+    def rollback(self, connection: Any) -> None:
+        DuckdbCursor(connection).rollback()
+
+    def is_open(self, connection: Any) -> bool:
+        from duckdb import ConnectionException
+
+        try:
+            connection.execute("SELECT 1")
+        except ConnectionException:
+            return False
+        return True
+
+
+class AsyncpgDialect(Dialect):
+    name = "asyncpg"
+    sqlify = AsyncpgSqlify
+    asynchronous = True
+    connection_class = ("asyncpg.connection", "Connection")
+
+    def is_open(self, connection: Any) -> bool:
+        return not connection.is_closed()
+
+
+class AiosqliteDialect(Dialect):
+    name = "aiosqlite"
+    sqlify = AiosqliteSqlify
+    asynchronous = True
+    connection_class = ("aiosqlite", "Connection")
+
+    def is_open(self, connection: Any) -> bool:
+        # aiosqlite doesn't expose a public closed flag, its sqlite3 connection is dropped on close
+        return connection._connection is not None
+
+
+_dialects: Dict[str, Dialect] = {}
+_plugins_loaded = False
+_lock = threading.Lock()
+
+
+def register_dialect(dialect: Union[Dialect, Type[Dialect]]) -> Union[Dialect, Type[Dialect]]:
+    """Add a dialect, replacing any registered with the same name, can also decorate Dialect subclasses"""
+    instance = dialect() if isinstance(dialect, type) else dialect
+    if not instance.name:
+        raise ValueError("Dialects must have a name")
+
+    with _lock:
+        _dialects[instance.name] = instance
+    return dialect
+
+
+def _entry_points() -> List[Any]:
+    if entry_points is None:
+        return []
+
+    found = entry_points()
+    if hasattr(found, "select"):
+        return list(found.select(group=ENTRY_POINT_GROUP))
+    return list(found.get(ENTRY_POINT_GROUP, []))
+
+
+def load_plugins() -> None:
+    """Register the dialects of the installed packages, only done once, a broken plugin is skipped with a warning"""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+
+    for entry_point in _entry_points():
+        try:
+            register_dialect(entry_point.load())
+        except Exception as e:
+            warnings.warn(f"Could not load the sqlify dialect {entry_point.name}: {e}", RuntimeWarning)
+
+
+def dialects() -> List[Dialect]:
+    """Registered dialects, in registration order"""
+    load_plugins()
+    return list(_dialects.values())
+
+
+def get_dialect(name: Union[str, DatabaseType]) -> Dialect:
+    """Dialect by name, DatabaseType members are looked up by their lowercase value"""
+    load_plugins()
+    key = name.value.lower() if isinstance(name, DatabaseType) else name.lower()
+    try:
+        return _dialects[key]
+    except KeyError:
+        raise DialectNotFound(f"No dialect named {key}, the registered ones are: {', '.join(_dialects)}") from None
+
+
+def detect_dialect(connection: Any, asynchronous: bool = False) -> Dialect:
+    """Dialect of a connection, the last registered dialects are tried first so plugins can take over a driver"""
+    for dialect in reversed(dialects()):
+        if dialect.asynchronous == asynchronous and dialect.detect(connection):
+            return dialect
+
+    raise RuntimeError("Could not detect the correct database type, please supply the 'database_type' parameter")
+
+
+for _builtin in (Psycopg2Dialect, Psycopg3Dialect, Sqlite3Dialect, DuckdbDialect, AsyncpgDialect, AiosqliteDialect):
+    register_dialect(_builtin)
@@ -6,3 +6,30 @@ class MigrationAlreadyAppliedException(Exception):
 
 class TyperNotFound(Exception):
     pass
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class DialectNotFound(Exception):
+    pass
+
+
+class MigrationDependencyException(Exception):
+    pass
+
+
+class MigrationTargetsFailed(Exception):
+    """Raised by Migrations.migrate_many once every target finished, when some of them failed"""
+
+    def __init__(self, failures, applied, completed=None, backfills=None) -> None:
+        super().__init__(f"Migrations failed on {', '.join(failures)}")
+        # target name -> exception raised while migrating it
+        self.failures = failures
+        # target name -> filenames applied, for the targets that succeeded
+        self.applied = applied
+        # target name -> filenames committed before the failure, for the targets that failed
+        self.completed = completed or {}
+        # target name -> (filename, state) of the backfill that failed after committing some of its batches
+        self.backfills = backfills or {}
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import re
+import weakref
+from collections import OrderedDict
+from logging import Logger
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Union
+
+from .instrumentation import QueryEvent, QueryHook
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .builder import BaseSqlify
+
+# Full scans of tables with at least this many rows are listed in QueryPlan.seq_scans
+LARGE_TABLE_ROWS = 10_000
+
+# Table reads in sqlite plans, like "SCAN books" or "SEARCH books USING INDEX books_genre (genre=?)"
+# sqlite before 3.36 writes "SCAN TABLE books"
+_SQLITE_READ = re.compile(
+    r"(SCAN|SEARCH) (?:TABLE )?(?!CONSTANT ROW)(\S+)(?: AS \S+)?"
+    r"(?: USING (?:(?:COVERING )?INDEX (\S+)|(INTEGER PRIMARY KEY)))?"
+)
+
+# Tables of FROM and JOIN clauses with their alias, sqlite plans name aliased tables by their alias
+_ALIASED = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)\s+(?:AS\s+)?(\w+)", re.IGNORECASE)
+_NOT_ALIASES = {
+    "WHERE", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "NATURAL", "OUTER", "ON", "USING", "GROUP", "ORDER",
+    "LIMIT", "HAVING", "UNION", "EXCEPT", "INTERSECT", "WINDOW", "RETURNING",
+}
+
+# Statements that can be explained, transaction control and DDL can't
+_EXPLAINABLE = re.compile(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE|VALUES)\b", re.IGNORECASE)
+
+
+class PlanNode(object):
+    """A step of a query plan
+    operation = node type, like "Seq Scan" or "Index Scan" on postgres and "SCAN" or "SEARCH" on sqlite
+    table, index = table read by the step and the index it uses, None when the step reads none
+    full_scan = True when the step reads the whole table without an index
+    rows = rows the planner expects the step to return, None when unknown
+    actual_rows = rows the step returned, over every loop, only known for analyzed plans
+    cost = planner total cost, duration = milliseconds spent in the step, only known for analyzed plans
+    detail = the step as returned by the database
+    """
+    __slots__ = ("operation", "table", "index", "full_scan", "rows", "actual_rows", "cost", "duration", "detail",
+                 "children")
+
+    def __init__(
+            self,
+            operation: str,
+            table: Optional[str] = None,
+            index: Optional[str] = None,
+            full_scan: bool = False,
+            rows: Optional[float] = None,
+            actual_rows: Optional[float] = None,
+            cost: Optional[float] = None,
+            duration: Optional[float] = None,
+            detail: Any = None,
+            children: Optional[List["PlanNode"]] = None,
+    ) -> None:
+        self.operation = operation
+        self.table = table
+        self.index = index
+        self.full_scan = full_scan
+        self.rows = rows
+        self.actual_rows = actual_rows
+        self.cost = cost
+        self.duration = duration
+        self.detail = detail
+        self.children: List[PlanNode] = children or []
+
+    def __str__(self) -> str:
+        if isinstance(self.detail, str):
+            return self.detail
+
+        parts = [self.operation]
+        if self.table:
+            parts.append(f"on {self.table}")
+        if self.index:
+            parts.append(f"using {self.index}")
+        if self.rows is not None:
+            parts.append(f"(rows={self.rows})" if self.actual_rows is None else
+                         f"(rows={self.rows} actual={self.actual_rows})")
+        return " ".join(parts)
+
+    def __repr__(self) -> str:
+        return f"<PlanNode {self}>"
+
+
+class QueryPlan(object):
+    """Parsed plan of a query, see BaseSqlify.explain
+    nodes = top level steps of the plan, each one with its children
+    table_rows = rows, or the planner estimate, of each table the plan reads
+    planning_time, execution_time = milliseconds, only known for analyzed postgres plans
+    raw = the plan as returned by the database
+    """
+
+    def __init__(
+            self,
+            sql: str,
+            params: Optional[Union[List, Dict]],
+            nodes: List[PlanNode],
+            raw: Any,
+            table_rows: Optional[Dict[str, float]] = None,
+            planning_time: Optional[float] = None,
+            execution_time: Optional[float] = None,
+            large_table_rows: int = LARGE_TABLE_ROWS,
+    ) -> None:
+        self.sql = sql
+        self.params = params
+        self.nodes = nodes
+        self.raw = raw
+        self.table_rows = table_rows or {}
+        self.planning_time = planning_time
+        self.execution_time = execution_time
+        self.large_table_rows = large_table_rows
+
+    def walk(self) -> Iterator[PlanNode]:
+        """Every step of the plan, parents before their children"""
+        pending = list(reversed(self.nodes))
+        while pending:
+            node = pending.pop()
+            yield node
+            pending.extend(reversed(node.children))
+
+    def tables(self) -> List[str]:
+        """Tables read by the plan, in plan order"""
+        return list(OrderedDict.fromkeys(node.table for node in self.walk() if node.table))
+
+    @property
+    def seq_scans(self) -> List[PlanNode]:
+        """Full scans of tables with at least large_table_rows rows, usually a missing index"""
+        return [
+            node for node in self.walk()
+            if node.full_scan and self.table_rows.get(node.table, 0) >= self.large_table_rows
+        ]
+
+    def __str__(self) -> str:
+        lines = []
+        flagged = set(map(id, self.seq_scans))
+        pending = [(node, 0) for node in reversed(self.nodes)]
+        while pending:
+            node, depth = pending.pop()
+            warning = f"  <- full scan of {self.table_rows[node.table]:.0f} rows" if id(node) in flagged else ""
+            lines.append(f"{'  ' * depth}{node}{warning}")
+            pending.extend((child, depth + 1) for child in reversed(node.children))
+        return "\n".join(lines)
+
+    def __repr__(self) -> str:
+        return f"<QueryPlan {self.sql!r} seq_scans={len(self.seq_scans)}>"
+
+
+def postgres_nodes(raw: Any) -> List[PlanNode]:
+    """Nodes of an EXPLAIN (FORMAT JSON) result, raw is the list in its single value, parsed or not"""
+    if isinstance(raw, (str, bytes)):
+        raw = json.loads(raw)
+    return [_postgres_node(statement["Plan"]) for statement in raw]
+
+
+def _postgres_node(node: Dict[str, Any]) -> PlanNode:
+    loops = node.get("Actual Loops") or 1
+    actual_rows = node.get("Actual Rows")
+    duration = node.get("Actual Total Time")
+    return PlanNode(
+        operation=node["Node Type"],
+        table=node.get("Relation Name"),
+        index=node.get("Index Name"),
+        full_scan=node["Node Type"] == "Seq Scan",
+        rows=node.get("Plan Rows"),
+        actual_rows=None if actual_rows is None else actual_rows * loops,
+        cost=node.get("Total Cost"),
+        duration=None if duration is None else duration * loops,
+        detail=node,
+        children=[_postgres_node(child) for child in node.get("Plans", ())],
+    )
+
+
+def scanned_rows(node: PlanNode) -> float:
+    """Rows an analyzed postgres full scan read, the rows it returned plus the ones its filter removed"""
+    loops = node.detail.get("Actual Loops") or 1
+    return (node.actual_rows or 0) + node.detail.get("Rows Removed by Filter", 0) * loops
+
+
+def table_aliases(sql: str) -> Dict[str, str]:
+    """Alias -> table of the aliased tables in the FROM and JOIN clauses of sql"""
+    return {alias: table for table, alias in _ALIASED.findall(sql) if alias.upper() not in _NOT_ALIASES}
+
+
+def sqlite_nodes(rows: Sequence[Sequence[Any]], aliases: Optional[Dict[str, str]] = None) -> List[PlanNode]:
+    """Nodes of an EXPLAIN QUERY PLAN result, rows of id, parent, notused and detail
+    aliases = alias -> table, see table_aliases
+    """
+    aliases = aliases or {}
+    nodes: Dict[int, PlanNode] = {}
+    roots: List[PlanNode] = []
+    for id_, parent, _, detail in rows:
+        match = _SQLITE_READ.match(detail)
+        if match is None:
+            node = PlanNode(operation=detail, detail=detail)
+        else:
+            operation, table, index, primary_key = match.groups()
+            node = PlanNode(
+                operation=operation,
+                table=aliases.get(table, table),
+                index=index or primary_key,
+                full_scan=operation == "SCAN" and index is None,
+                detail=detail,
+            )
+
+        nodes[id_] = node
+        (nodes[parent].children if parent in nodes else roots).append(node)
+
+    return roots
+
+
+def explainable(sql: str) -> bool:
+    return _EXPLAINABLE.match(sql) is not None
+
+
+class PlanSampler(QueryHook):
+    """Captures the plan of the queries slower than threshold seconds, once for each query shape
+
+    Plans are captured with EXPLAIN, without ANALYZE so the slow query isn't run again, on a cursor of its own so the
+    results of the sampled query are left untouched. Created by BaseSqlify.sample_plans
+    plans = rendered sql -> QueryPlan, for the last maxlen captured shapes
+    """
+
+    def __init__(
+            self,
+            sqlify: "BaseSqlify",
+            threshold: float = 0.5,
+            large_table_rows: int = LARGE_TABLE_ROWS,
+            maxlen: int = 100,
+            logger: Optional[Logger] = None,
+    ) -> None:
+        self.threshold = threshold
+        self.large_table_rows = large_table_rows
+        self.maxlen = maxlen
+        self.plans: "OrderedDict[str, QueryPlan]" = OrderedDict()
+        self._sqlify = weakref.ref(sqlify)
+        self._logger = logger or logging.getLogger("sqlify")
+        self._lock = Lock()
+
+    def after(self, event: QueryEvent) -> None:
+        if event.duration < self.threshold or event.exception is not None or event.sql in self.plans:
+            return
+
+        sqlify = self._sqlify()
+        if sqlify is None or not explainable(event.sql):
+            return
+
+        try:
+            plan = sqlify._explain(event.sql, event.params, False, self.large_table_rows)
+        except Exception as e:
+            self._logger.warning("could not capture the plan of %s: %s", event.sql, e)
+            return
+
+        with self._lock:
+            self.plans[event.sql] = plan
+            while len(self.plans) > self.maxlen:
+                self.plans.popitem(last=False)
+
+        if plan.seq_scans:
+            self._logger.warning(
+                "slow query took %.3fms with full scans of %s: %s",
+                event.duration * 1000, ", ".join(OrderedDict.fromkeys(node.table for node in plan.seq_scans)),
+                event.sql,
+            )
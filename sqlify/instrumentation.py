@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+import logging
+import math
+import random
+from collections import OrderedDict, deque
+from logging import Logger
+from threading import Lock
+from typing import Any, Deque, Dict, List, Optional, Union
+
+
+class QueryEvent(object):
+    """Everything known about an executed query
+    duration = wall time in seconds
+    rowcount = cursor row count, -1 when unknown or when the query failed
+    exception = the exception raised by the driver, if any
+    """
+    __slots__ = ("sql", "params", "duration", "rowcount", "exception")
+
+    def __init__(
+            self,
+            sql: str,
+            params: Optional[Union[List, Dict]],
+            duration: float,
+            rowcount: int,
+            exception: Optional[BaseException] = None,
+    ) -> None:
+        self.sql = sql
+        self.params = params
+        self.duration = duration
+        self.rowcount = rowcount
+        self.exception = exception
+
+    def __repr__(self) -> str:
+        return f"<QueryEvent {self.sql!r} duration={self.duration:.6f} rowcount={self.rowcount}>"
+
+
+class QueryHook(object):
+    """Base class for instrumentation hooks, override before and/or after
+
+    sqlify = Sqlite3Sqlify(cursor, hooks=[MyHook()])
+    """
+
+    def before(self, sql: str, params: Optional[Union[List, Dict]]) -> None:
+        """Called right before the query is sent to the driver"""
+
+    def after(self, event: QueryEvent) -> None:
+        """Called after the query, even when the driver raised an exception"""
+
+
+class LoggingHook(QueryHook):
+    """Debug log of every query, used for the logger passed to BaseSqlify"""
+
+    def __init__(self, logger: Logger) -> None:
+        self._logger = logger
+
+    def after(self, event: QueryEvent) -> None:
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug("query %s params %s took %.3fms", event.sql, event.params, event.duration * 1000)
+
+
+class SlowQueryLog(QueryHook):
+    """Keeps and logs the queries slower than threshold seconds"""
+
+    def __init__(self, threshold: float = 0.5, logger: Optional[Logger] = None, maxlen: int = 100) -> None:
+        self.threshold = threshold
+        self.entries: Deque[QueryEvent] = deque(maxlen=maxlen)
+        self._logger = logger or logging.getLogger("sqlify")
+
+    def after(self, event: QueryEvent) -> None:
+        if event.duration < self.threshold:
+            return
+
+        self.entries.append(event)
+        self._logger.warning("slow query took %.3fms: %s", event.duration * 1000, event.sql)
+
+
+class LatencyHistogram(QueryHook):
+    """Call counts and latency percentiles for each query shape, the rendered sql without parameters
+
+    Each shape keeps up to max_samples durations, with reservoir sampling once it is full. Only the max_shapes most
+    recently run shapes are kept, raw queries with inlined values are a new shape for every value
+    """
+
+    def __init__(self, max_samples: int = 1000, max_shapes: int = 512) -> None:
+        self._max_samples = max_samples
+        self.max_shapes = max_shapes
+        self.evictions = 0
+        self._shapes: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = Lock()
+
+    def after(self, event: QueryEvent) -> None:
+        with self._lock:
+            shape = self._shapes.get(event.sql)
+            if shape is None:
+                shape = self._shapes[event.sql] = dict(count=0, errors=0, total=0.0, max=0.0, samples=[])
+                while len(self._shapes) > self.max_shapes:
+                    self._shapes.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._shapes.move_to_end(event.sql)
+
+            shape["count"] += 1
+            shape["total"] += event.duration
+            shape["max"] = max(shape["max"], event.duration)
+            if event.exception is not None:
+                shape["errors"] += 1
+
+            samples = shape["samples"]
+            if len(samples) < self._max_samples:
+                samples.append(event.duration)
+            else:
+                index = random.randrange(shape["count"])
+                if index < self._max_samples:
+                    samples[index] = event.duration
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Statistics per query shape, durations in seconds, sorted by total time spent"""
+        with self._lock:
+            shapes = {sql: dict(shape, samples=sorted(shape["samples"])) for sql, shape in self._shapes.items()}
+
+        result = {}
+        for sql, shape in sorted(shapes.items(), key=lambda item: item[1]["total"], reverse=True):
+            samples = shape["samples"]
+            result[sql] = dict(
+                count=shape["count"],
+                errors=shape["errors"],
+                total=shape["total"],
+                mean=shape["total"] / shape["count"],
+                max=shape["max"],
+                p50=_percentile(samples, 50),
+                p95=_percentile(samples, 95),
+                p99=_percentile(samples, 99),
+            )
+
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._shapes.clear()
+            self.evictions = 0
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    """Nearest rank percentile of already sorted samples"""
+    if not samples:
+        return 0.0
+
+    rank = max(0, math.ceil(percent / 100 * len(samples)) - 1)
+    return samples[rank]
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+MANIFEST_VERSION = 1
+
+# Files modified this recently aren't indexed, an edit in the same mtime tick that keeps the size would go unnoticed
+_RACY_NANOSECONDS = 2_000_000_000
+
+
+def checksum(sql: str) -> str:
+    """sha256 of a migration, hashed from its text so line ending conversions by git don't count as changes"""
+    return hashlib.sha256(sql.encode()).hexdigest()
+
+
+class MigrationDrift(namedtuple("MigrationDrift", "name status recorded current")):
+    """An applied migration that no longer matches its file
+    status = "changed" when the file was edited after being applied, "missing" when it was removed
+    recorded = checksum stored when the migration was applied
+    current = checksum of the file now, None when missing
+    """
+    __slots__ = ()
+
+    CHANGED = "changed"
+    MISSING = "missing"
+
+
+class MigrationManifest(object):
+    """Index of the migration files mtime, size and checksum, kept in a json file
+
+    Checksums are only computed again for the files whose mtime or size changed, so checking a folder with hundreds of
+    migrations only costs a stat per file. The file is optional, when it can't be written, like on a read only
+    container image, the index is kept in memory only
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path
+        self._entries: Optional[Dict[str, List]] = None
+
+    def _load(self) -> Dict[str, List]:
+        if self._entries is not None:
+            return self._entries
+
+        self._entries = {}
+        if self.path is not None:
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    self._entries = data["files"]
+            except (OSError, ValueError, KeyError, AttributeError):
+                pass
+        return self._entries
+
+    def save(self) -> None:
+        """Write the index, replacing the file atomically so concurrent readers never see a partial one"""
+        if self.path is None or self._entries is None:
+            return
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, temporary = tempfile.mkstemp(dir=directory, prefix=".sqlify-manifest-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(dict(version=MANIFEST_VERSION, files=self._entries), f, separators=(",", ":"))
+            os.replace(temporary, self.path)
+        except OSError:
+            pass
+
+    def checksums(self, directory: str, filenames: List[str]) -> Dict[str, Optional[str]]:
+        """Checksum of each file in directory, None for the files that don't exist"""
+        entries = self._load()
+        now = time.time_ns()
+        changed = False
+
+        result: Dict[str, Optional[str]] = {}
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                result[filename] = None
+                if entries.pop(filename, None) is not None:
+                    changed = True
+                continue
+
+            entry = entries.get(filename)
+            if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                result[filename] = entry[2]
+                continue
+
+            with open(path, "r") as f:
+                result[filename] = checksum(f.read())
+
+            if now - stat.st_mtime_ns > _RACY_NANOSECONDS:
+                entries[filename] = [stat.st_mtime_ns, stat.st_size, result[filename]]
+                changed = True
+            elif entries.pop(filename, None) is not None:
+                changed = True
+
+        if changed:
+            self.save()
+        return result
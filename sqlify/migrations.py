@@ -1,11 +1,25 @@
-import itertools
+import json
 import os
+import re
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List
+from functools import partial
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Set, Tuple
 
-from .exceptions import MigrationAlreadyAppliedException
+from .backfill import Backfill, BackfillState
+from .exceptions import MigrationAlreadyAppliedException, MigrationDependencyException, MigrationTargetsFailed
 
-from .builder import BaseSqlify, Sqlite3Sqlify, Psycopg2Sqlify
+from .backends import Sqlite3Sqlify, Psycopg2Sqlify
+from .builder import BaseSqlify
+from .manifest import MigrationDrift, MigrationManifest, checksum
+
+# Migrations created by make_migration wrap their sql in BEGIN; ... COMMIT;, which is dropped when they run in the
+# transaction of migrate
+_WRAPPED = re.compile(r"\A((?:\s*--[^\n]*\n)*)\s*BEGIN(?:\s+TRANSACTION)?\s*;(.*)\bCOMMIT\s*;\s*\Z", re.S | re.I)
+# -- depends: 0003_20220118_1148, 0005_20220120_0930, or with # in python migrations
+_DEPENDS = re.compile(r"^\s*(?:--|#)\s*depends:(.*)$", re.M | re.I)
+_COMMENT = re.compile(r"--[^\n]*")
 
 
 class Migrations():
@@ -14,13 +28,22 @@ class Migrations():
             migrations_path: str,
             sqlify: BaseSqlify,
             migration_name_template: str = "{migration_number}_{date}_{hour}.sql",
-            migration_table_name: str = "db_migrations"
+            migration_table_name: str = "db_migrations",
+            manifest_path: Optional[str] = None,
     ) -> None:
+        """
+        manifest_path = file indexing the migration checksums, relative to migrations_path, like
+                        ".sqlify-manifest.json", by default the index is only kept in memory
+        """
         self._migrations_path = migrations_path
         self._sqlify = sqlify
 
         self._migration_name_template = migration_name_template
         self._migration_table_name = migration_table_name
+        self._manifest_path = manifest_path
+        self._manifest = MigrationManifest(
+            os.path.join(migrations_path, manifest_path) if manifest_path is not None else None
+        )
 
         self._init_migrations_table()
 
@@ -31,7 +54,9 @@ class Migrations():
                 (
                     id integer constraint table_name_pk primary key autoincrement,
                     name text,
-                    applied_at timestamp default CURRENT_TIMESTAMP not null
+                    applied_at timestamp default CURRENT_TIMESTAMP not null,
+                    checksum text,
+                    progress text
                 );
             """
 
@@ -41,29 +66,57 @@ class Migrations():
                 (
                     id serial constraint {self._migration_table_name}_pk primary key,
                     name varchar(32) not null,
-                    applied_at timestamp default timezone('utc'::text, now()) not null
+                    applied_at timestamp default timezone('utc'::text, now()) not null,
+                    checksum varchar(64),
+                    progress text
                 );
                 
                 CREATE UNIQUE INDEX IF NOT EXISTS {self._migration_table_name}_name_uindex
                     ON {self._migration_table_name} (name);
+
+                ALTER TABLE {self._migration_table_name} ADD COLUMN IF NOT EXISTS checksum varchar(64);
+                ALTER TABLE {self._migration_table_name} ADD COLUMN IF NOT EXISTS progress text;
             """
 
         else:
             raise NotImplementedError()
 
         self._sqlify.execute(initial_migration)
+
+        if isinstance(self._sqlify, Sqlite3Sqlify):
+            # Tables created by older versions, sqlite has no ADD COLUMN IF NOT EXISTS
+            columns = [column[1] for column in
+                       self._sqlify.execute(f"PRAGMA table_info({self._migration_table_name})").fetchall()]
+            for column in ("checksum", "progress"):
+                if column not in columns:
+                    self._sqlify.execute(f"ALTER TABLE {self._migration_table_name} ADD COLUMN {column} text")
+
         self._sqlify.commit()
 
+    def _migration_files(self) -> List[str]:
+        """Filenames in the migrations folder, sorted by number"""
+        try:
+            with os.scandir(self._migrations_path) as entries:
+                # Hidden files, like the manifest or .gitkeep, aren't migrations
+                files = [entry.name for entry in entries if entry.is_file() and not entry.name.startswith(".")]
+        except FileNotFoundError:
+            return []
+
+        files.sort(key=lambda x: x.split(".")[0])
+        return files
+
     def _get_next_migration_number(self) -> int:
         next_migration_number = 0
-        for (dirpath, dirnames, filenames) in os.walk(self._migrations_path):
-            for filename in filenames:
-                _number = filename.split("_")[0]
-                next_migration_number = max(next_migration_number, int(_number))
+        for filename in self._migration_files():
+            _number = filename.split("_")[0]
+            next_migration_number = max(next_migration_number, int(_number))
 
         return next_migration_number +1
 
-    def make_migration(self) -> str:
+    def make_migration(self, backfill: bool = False, sql: Optional[str] = None) -> str:
+        """Create the next migration file, with backfill a python migration updating a table in batches
+        sql = initial statements of a sql migration, like the ones of IndexReport.write_migration
+        """
         now = datetime.now()
         migration_number = self._get_next_migration_number()
 
@@ -72,50 +125,93 @@ class Migrations():
             date=now.strftime("%Y%m%d"),
             hour=now.strftime("%H%M"),
         )
+        if backfill:
+            filename = os.path.splitext(filename)[0] + ".py"
 
         os.makedirs(self._migrations_path, exist_ok=True)
         with open(os.path.join(self._migrations_path, filename), "a") as f:
-            f.write(f"-- Migration number: {migration_number} \t {now.strftime('%Y-%m-%d %H:%M')}\n")
-            f.write("BEGIN;\n\n\n\nCOMMIT;\n")
+            if backfill:
+                f.write(f"# Migration number: {migration_number} \t {now.strftime('%Y-%m-%d %H:%M')}\n")
+                f.write("from sqlify import Backfill\n\nmigration = Backfill(\n    table=\"\",\n    set=\"\",\n)\n")
+            else:
+                f.write(f"-- Migration number: {migration_number} \t {now.strftime('%Y-%m-%d %H:%M')}\n")
+                f.write(f"BEGIN;\n\n{sql or ''}\n\nCOMMIT;\n")
 
         return str(os.path.join(self._migrations_path, filename))
 
-    def discover_migrations(
-            self, unapplied_only: bool = True
-    ) -> List[str]:
-        exclude = []
-        if unapplied_only:
-            exclude = self._sqlify.fetchall(
-                table=self._migration_table_name,
-                fields="name",
-            )
+    def applied_migrations(self) -> Set[str]:
+        """Names of the applied migrations, loaded with a single query, backfills still running aren't applied"""
+        return {name for name, (_, progress) in self._migration_rows().items() if progress is None}
 
-            if len(exclude) > 0 and isinstance(exclude[0], dict):
-                exclude = [
-                    item.values()
-                    for item in exclude
-                ]
+    def _migration_rows(self) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """Checksum and backfill progress of each migration in the table
+        The checksum is None for migrations applied before checksums were stored, the progress for finished ones
+        """
+        rows = self._sqlify.fetchall(
+            table=self._migration_table_name,
+            fields=["name", "checksum", "progress"],
+            order="id",
+        )
 
-            exclude = list(itertools.chain.from_iterable(exclude))
+        if len(rows) > 0 and isinstance(rows[0], dict):
+            rows = [
+                item.values()
+                for item in rows
+            ]
 
-        files = []
-        for (dirpath, dirnames, filenames) in os.walk(self._migrations_path):
-            for filename in filenames:
+        return {name: (value, progress) for name, value, progress in rows}
 
-                if self.get_migration_name(filename) not in exclude:
-                    files.append(filename)
+    def checksums(self, filenames: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
+        """Checksum of each migration file, only the files changed since the last call are read again"""
+        if filenames is None:
+            filenames = self._migration_files()
+        return self._manifest.checksums(self._migrations_path, filenames)
 
-        files.sort(key=lambda x: x.split(".")[0])
-        return files
+    def verify(self) -> List[MigrationDrift]:
+        """Applied migrations whose file was edited or removed since, in the order they were applied
+
+        Migrations applied before checksums were stored can't be verified and are skipped
+        """
+        recorded = {name: value for name, (value, _) in self._migration_rows().items() if value is not None}
+        files = {self.get_migration_name(filename): filename for filename in self._migration_files()}
+        current = self.checksums([files[name] for name in recorded if name in files])
+
+        drift = []
+        for name, value in recorded.items():
+            if name not in files:
+                drift.append(MigrationDrift(name, MigrationDrift.MISSING, value, None))
+            elif current[files[name]] != value:
+                drift.append(MigrationDrift(name, MigrationDrift.CHANGED, value, current[files[name]]))
+        return drift
+
+    def discover_migrations(
+            self, unapplied_only: bool = True
+    ) -> List[str]:
+        files = self._migration_files()
+        if not unapplied_only:
+            return files
+
+        applied = self.applied_migrations()
+        return [filename for filename in files if self.get_migration_name(filename) not in applied]
 
     def _get_migration_content(self, filename: str) -> str:
         with open(os.path.join(self._migrations_path, filename), "r") as f:
             return f.read()
 
+    @staticmethod
+    def get_dependencies(sql: str) -> List[str]:
+        """Names of the migrations listed in the -- depends: comments of a migration"""
+        names = []
+        for match in _DEPENDS.finditer(sql):
+            names.extend(
+                Migrations.get_migration_name(name.strip()) for name in match.group(1).split(",") if name.strip()
+            )
+        return names
+
     @staticmethod
     def get_migration_name(filename: str) -> str:
         filename = filename.lower()
-        if filename.endswith(".sql") is False:
+        if filename.endswith((".sql", ".py")) is False:
             return filename
 
         _contents = filename.split(".")
@@ -124,29 +220,297 @@ class Migrations():
     def apply_migration(
             self, filename: str, fake: bool = False
     ) -> None:
-        condition = "name = %(name)s"
-        if isinstance(self._sqlify, Sqlite3Sqlify):
-            condition = "name = :name"
-
-        _already_applied = self._sqlify.fetchone(
-            table=self._migration_table_name,
-            fields="1",
-            where=(
-                condition,
-                dict(name=self.get_migration_name(filename)),
-            ),
-        )
+        row = self._migration_rows().get(self.get_migration_name(filename))
 
-        if _already_applied is not None:
+        if row is not None and row[1] is None:
             raise MigrationAlreadyAppliedException(f"Migration {filename} is already applied!")
 
+        sql = self._get_migration_content(filename)
+        if self.is_python_migration(filename):
+            self._backfill(filename, sql, None if row is None else row[1], fake)
+            return
+
         if fake is False:
             # This can trow an exception, but it shouldn't be caught
-            self._sqlify.execute(
-                self._get_migration_content(filename)
-            )
+            self._execute_script(sql)
 
         self._sqlify.insert(
-            "db_migrations", data=dict(name=self.get_migration_name(filename))
+            self._migration_table_name, data=dict(name=self.get_migration_name(filename), checksum=checksum(sql))
         )
         self._sqlify.commit()
+
+    @staticmethod
+    def is_python_migration(filename: str) -> bool:
+        return filename.lower().endswith(".py")
+
+    def _load_python_migration(self, filename: str, source: str) -> Backfill:
+        """Run a python migration file and return the Backfill it defines as migration"""
+        path = os.path.join(self._migrations_path, filename)
+        namespace: Dict[str, Any] = dict(__name__=f"sqlify_migration_{self.get_migration_name(filename)}",
+                                         __file__=path)
+        exec(compile(source, path, "exec"), namespace)
+
+        migration = namespace.get("migration")
+        if not isinstance(migration, Backfill):
+            raise TypeError(f"Migration {filename} must define a Backfill named migration")
+        return migration
+
+    def _backfill(
+            self,
+            filename: str,
+            source: str,
+            progress: Optional[str],
+            fake: bool,
+            committed: Optional[Callable[[str, BackfillState], None]] = None,
+    ) -> None:
+        """Run a python migration, each batch is committed with its progress, a started one resumes from progress
+        committed = called with the filename and state after each committed batch
+        """
+        name = self.get_migration_name(filename)
+
+        if fake is True:
+            with self._sqlify.transaction():
+                if progress is None:
+                    self._sqlify.insert(self._migration_table_name, data=dict(name=name, checksum=checksum(source)))
+                else:
+                    self._save_backfill(name, dict(done=True))
+            return
+
+        # Loaded first, a broken file leaves no row behind
+        migration = self._load_python_migration(filename, source)
+
+        if progress is not None:
+            state = json.loads(progress)
+        else:
+            state = dict(after=None, rows=0, done=False)
+            with self._sqlify.transaction():
+                self._sqlify.insert(
+                    self._migration_table_name,
+                    data=dict(name=name, checksum=checksum(source), progress=json.dumps(state)),
+                )
+
+        batch = None if committed is None else partial(committed, filename)
+        migration.run(self._sqlify, state, partial(self._save_backfill, name), batch)
+
+    def _save_backfill(self, name: str, state: BackfillState) -> None:
+        self._sqlify.update(
+            self._migration_table_name,
+            data=dict(progress=None if state["done"] else json.dumps(state, default=str)),
+            where=(f"name = {self._sqlify._format_parameter('name')}", dict(name=name)),
+        )
+
+    def _execute_script(self, sql: str) -> None:
+        """Run every statement of a migration, the sqlite3 module only runs one statement per call"""
+        if not isinstance(self._sqlify, Sqlite3Sqlify):
+            if _COMMENT.sub("", sql).strip():
+                self._sqlify.execute(sql)
+            return
+
+        import sqlite3
+
+        statement = ""
+        for part in sql.split(";"):
+            statement += part + ";"
+            # A ; inside a string, comment or trigger body doesn't end the statement
+            if sqlite3.complete_statement(statement):
+                self._sqlify.execute(statement)
+                statement = ""
+
+    def _plan(self, pending: List[str], applied: Set[str], contents: Dict[str, str]) -> List[str]:
+        """Order the pending migrations by number, moving each one after the pending migrations it depends on"""
+        by_name = {self.get_migration_name(filename): filename for filename in pending}
+        # visit refers to itself, it mustn't also hold self and with it the cursor of a migrate_many worker thread
+        dependencies = {name: self.get_dependencies(contents[filename]) for name, filename in by_name.items()}
+        ordered: List[str] = []
+        done: Set[str] = set()
+        visiting: List[str] = []
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                cycle = visiting[visiting.index(name):] + [name]
+                raise MigrationDependencyException(f"Circular dependency between migrations {' -> '.join(cycle)}")
+
+            visiting.append(name)
+            for dependency in dependencies[name]:
+                if dependency in applied:
+                    continue
+                if dependency not in by_name:
+                    raise MigrationDependencyException(
+                        f"Migration {name} depends on {dependency}, which isn't applied nor being applied")
+                visit(dependency)
+            visiting.pop()
+
+            done.add(name)
+            ordered.append(by_name[name])
+
+        for name in by_name:
+            visit(name)
+        return ordered
+
+    def migrate(
+            self,
+            filenames: Optional[List[str]] = None,
+            fake: bool = False,
+            atomic: bool = True,
+            progress: Optional[Callable[[str, int, int], None]] = None,
+    ) -> List[str]:
+        """Apply the pending migrations, or only filenames, returns the applied filenames in the order they ran
+        fake = only mark the migrations as applied, without running their sql
+        atomic = apply every migration in a single transaction, when False each one is committed on its own
+                 python migrations commit each of their batches, the sql migrations before and after them are
+                 applied in separate transactions
+        progress = called with the filename, number of migrations applied and total after each migration is committed,
+                   with atomic the sql migrations are reported together once their transaction commits
+        """
+        return self._migrate(self._migration_files(), filenames, fake, atomic, progress, {})
+
+    def _migrate(
+            self,
+            files: List[str],
+            filenames: Optional[List[str]],
+            fake: bool,
+            atomic: bool,
+            progress: Optional[Callable[[str, int, int], None]],
+            contents: Dict[str, str],
+            committed: Optional[Callable[[str, BackfillState], None]] = None,
+    ) -> List[str]:
+        rows = self._migration_rows()
+        applied = {name for name, (_, progress) in rows.items() if progress is None}
+
+        if filenames is None:
+            pending = [filename for filename in files if self.get_migration_name(filename) not in applied]
+        else:
+            for filename in filenames:
+                if self.get_migration_name(filename) in applied:
+                    raise MigrationAlreadyAppliedException(f"Migration {filename} is already applied!")
+            pending = list(filenames)
+
+        # contents is shared by the targets of migrate_many, each file is only read once
+        for filename in pending:
+            if filename not in contents:
+                contents[filename] = self._get_migration_content(filename)
+
+        plan = self._plan(pending, applied, contents)
+        if not plan:
+            return []
+
+        # Backfills commit every batch, they split the sql migrations around them into separate transactions
+        steps: List[List[str]] = []
+        for filename in plan:
+            if atomic and steps and not self.is_python_migration(filename) \
+                    and not self.is_python_migration(steps[-1][0]):
+                steps[-1].append(filename)
+            else:
+                steps.append([filename])
+
+        position = 0
+        for step in steps:
+            if self.is_python_migration(step[0]):
+                name = self.get_migration_name(step[0])
+                self._backfill(step[0], contents[step[0]], rows[name][1] if name in rows else None, fake, committed)
+                position += 1
+                if progress is not None:
+                    progress(step[0], position, len(plan))
+                continue
+
+            with self._sqlify.transaction():
+                for filename in step:
+                    self._apply(filename, contents[filename], fake)
+
+            # Only reported once committed, a later failure in the same transaction would roll them back
+            for filename in step:
+                position += 1
+                if progress is not None:
+                    progress(filename, position, len(plan))
+
+        return plan
+
+    def _apply(self, filename: str, sql: str, fake: bool) -> None:
+        """Run a migration in the current transaction and mark it as applied"""
+        data = dict(name=self.get_migration_name(filename), checksum=checksum(sql))
+        if fake is False:
+            wrapped = _WRAPPED.match(sql)
+            if wrapped:
+                sql = wrapped.group(1) + wrapped.group(2)
+            self._execute_script(sql)
+
+        self._sqlify.insert(self._migration_table_name, data=data)
+
+    def migrate_many(
+            self,
+            targets: Dict[str, Callable[[], ContextManager[BaseSqlify]]],
+            workers: Optional[int] = None,
+            fake: bool = False,
+            atomic: bool = True,
+            progress: Optional[Callable[[str, str, int, int], None]] = None,
+    ) -> Dict[str, List[str]]:
+        """Apply the pending migrations of many databases or schemas concurrently, returns the applied filenames of
+        each target
+        targets = target name -> callable opening a session on it, called in the worker thread, like a Session factory
+                  or SessionPool.session
+        workers = number of threads, by default one per target up to 8
+        progress = called with the target name and the same arguments as the migrate progress, from the worker threads
+        Every target runs even when others fail, the failures are raised together with MigrationTargetsFailed
+
+        migrations.migrate_many({
+            tenant: functools.partial(Session, psycopg2.connect(dsn))
+            for tenant, dsn in tenants.items()
+        })
+        """
+        if not targets:
+            return {}
+        if workers is None:
+            workers = min(len(targets), 8)
+
+        files = self._migration_files()
+        contents: Dict[str, str] = {}
+        # How far each target got, only kept for the ones that fail
+        completed: Dict[str, List[str]] = {target: [] for target in targets}
+        backfills: Dict[str, Tuple[str, BackfillState]] = {}
+
+        def run(target: str, open_session: Callable[[], ContextManager[BaseSqlify]]) -> List[str]:
+            def report(filename: str, position: int, total: int) -> None:
+                completed[target].append(filename)
+                backfills.pop(target, None)
+                if progress is not None:
+                    progress(target, filename, position, total)
+
+            def batch(filename: str, state: BackfillState) -> None:
+                backfills[target] = (filename, state)
+
+            with open_session() as sqlify:
+                migrations = Migrations(
+                    self._migrations_path, sqlify, self._migration_name_template, self._migration_table_name, None
+                )
+                return migrations._migrate(files, None, fake, atomic, report, contents, batch)
+
+        def task(target: str, open_session: Callable[[], ContextManager[BaseSqlify]]) -> List[str]:
+            try:
+                return run(target, open_session)
+            except BaseException as e:
+                # The traceback frames hold the cursor, which sqlite3 only lets the worker thread close
+                traceback.clear_frames(e.__traceback__)
+                raise
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sqlify-migrate") as executor:
+            futures = {target: executor.submit(task, target, open_session) for target, open_session in targets.items()}
+
+        applied: Dict[str, List[str]] = {}
+        failures: Dict[str, BaseException] = {}
+        for target, future in futures.items():
+            error = future.exception()
+            if error is None:
+                applied[target] = future.result()
+            else:
+                failures[target] = error
+
+        if failures:
+            raise MigrationTargetsFailed(
+                failures,
+                applied,
+                {target: completed[target] for target in failures},
+                {target: backfills[target] for target in failures if target in backfills},
+            )
+        return applied
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import base64
+import json
+from typing import Any, List, Optional, Sequence, Union, Dict
+
+
+class Page(object):
+    """A page of results from keyset pagination
+    rows = the rows of this page, in the row format of the sqlify object, a dict of column to values when columnar
+    cursor = opaque token to request the next page, None when this is the last page
+    """
+    __slots__ = ("rows", "cursor")
+
+    def __init__(self, rows: Union[List[Any], Dict[str, List[Any]]], cursor: Optional[str]) -> None:
+        self.rows = rows
+        self.cursor = cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.cursor is not None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self) -> int:
+        if isinstance(self.rows, dict):
+            return len(next(iter(self.rows.values()), ()))
+        return len(self.rows)
+
+    def __repr__(self) -> str:
+        return f"<Page rows={len(self)} cursor={self.cursor!r}>"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the last row key values into an url safe token"""
+    payload = json.dumps(list(values), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    padding = "=" * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except ValueError as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+    if not isinstance(values, list):
+        raise ValueError("Invalid pagination cursor")
+
+    return values
+
+
+def column_name(key: str) -> str:
+    """Name of the column in the results, without the table qualifier"""
+    return key.rsplit(".", 1)[-1]
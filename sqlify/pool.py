@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+import time
+from collections import deque
+from threading import Condition
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Union
+
+from .concurrency import Query, parallel_fetch
+from .exceptions import PoolTimeout
+from .result_cache import ResultCache
+from .dialects import Dialect
+from .session import Session
+from .value_objects import DatabaseType, RowFormat
+
+
+class _PooledConnection(object):
+    __slots__ = ("connection", "created_at", "released_at")
+
+    def __init__(self, connection: Any) -> None:
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+
+
+class PooledSession(Session):
+    """Session that hands its connection back to the pool on close, instead of closing it"""
+
+    def __init__(self, pool: "SessionPool", pooled: _PooledConnection, **kwargs: Any) -> None:
+        self._pool = pool
+        self._pooled: Optional[_PooledConnection] = pooled
+        super().__init__(pooled.connection, **kwargs)
+
+    def close(self) -> None:
+        if self._pooled is None:
+            return
+
+        pooled, self._pooled = self._pooled, None
+        self._pool._release(pooled, self.dialect)
+
+    def __exit__(self, type_, value, traceback):
+        try:
+            super().__exit__(type_, value, traceback)
+        finally:
+            # Session only closes open connections, broken ones must also leave the pool
+            self.close()
+
+
+class SessionPool(object):
+    """Thread-safe pool of database connections that hands out Session objects
+
+    pool = SessionPool(lambda: psycopg2.connect(dsn), min_size=2, max_size=10)
+    with pool.session() as sqlify:
+        sqlify.fetchone(...)
+    """
+
+    def __init__(
+            self,
+            connect: Callable[[], Any],
+            min_size: int = 1,
+            max_size: int = 10,
+            idle_timeout: Optional[float] = 300.0,
+            max_lifetime: Optional[float] = 3600.0,
+            timeout: Optional[float] = 30.0,
+            database_type: Optional[Union[DatabaseType, str]] = None,
+            autocommit: Optional[bool] = True,
+            row_format: Optional[Union[RowFormat, str]] = None,
+            result_cache: Optional[ResultCache] = None,
+    ) -> None:
+        """
+        connect = callable that opens a new database connection
+        min_size = connections kept open even when idle
+        max_size = maximum number of open connections, checkouts wait for a free one when reached
+        idle_timeout = seconds an idle connection above min_size is kept before being closed
+        max_lifetime = seconds after which a connection is closed, instead of returning to the pool
+        timeout = seconds to wait for a free connection before raising PoolTimeout, None waits forever
+        row_format = format of the rows returned by the sessions, see Session
+        result_cache = result cache shared by every session, writes in one session invalidate the others results
+        """
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must respect 0 <= min_size <= max_size and max_size >= 1")
+
+        self._connect = connect
+        self._min_size = min_size
+        self._max_size = max_size
+        self._idle_timeout = idle_timeout
+        self._max_lifetime = max_lifetime
+        self._timeout = timeout
+        self._session_kwargs: Dict[str, Any] = dict(
+            database_type=database_type, autocommit=autocommit, row_format=row_format, result_cache=result_cache
+        )
+
+        self._idle: Deque[_PooledConnection] = deque()
+        self._size = 0
+        self._closed = False
+        self._condition = Condition()
+
+        for _ in range(min_size):
+            self._size += 1
+            self._idle.append(self._open())
+
+    @property
+    def size(self) -> int:
+        """Number of open connections, both idle and in use"""
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    def session(self) -> PooledSession:
+        """Checkout a connection and wrap it in a session, closing the session returns the connection to the pool"""
+        deadline = None if self._timeout is None else time.monotonic() + self._timeout
+
+        while True:
+            pooled = self._acquire(deadline)
+            try:
+                session = PooledSession(self, pooled, **self._session_kwargs)
+            except Exception:
+                # Broken connection that can't even create a cursor
+                self._discard(pooled)
+                continue
+
+            if session.is_open:
+                return session
+
+            session._pooled = None
+            self._discard(pooled)
+
+    def parallel_fetch(self, queries: Sequence[Query], workers: Optional[int] = None) -> List[Any]:
+        """Run independent reads concurrently on pooled connections, see concurrency.parallel_fetch"""
+        return parallel_fetch(self, queries, workers)
+
+    def close(self) -> None:
+        """Close every idle connection, connections in use are closed when returned"""
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                self._close_connection(self._idle.pop())
+            self._condition.notify_all()
+
+    def _acquire(self, deadline: Optional[float]) -> _PooledConnection:
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("The pool is closed")
+
+                self._prune_idle()
+                if self._idle:
+                    # Most recently used first, keeps the least used connections idle so they can time out
+                    return self._idle.pop()
+
+                if self._size < self._max_size:
+                    self._size += 1
+                    break
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise PoolTimeout(f"No connection available after {self._timeout} seconds")
+                self._condition.wait(remaining)
+
+        try:
+            return self._open()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, pooled: _PooledConnection, dialect: Dialect) -> None:
+        try:
+            # Resets any transaction left open by the session
+            dialect.rollback(pooled.connection)
+        except Exception:
+            self._discard(pooled)
+            return
+
+        with self._condition:
+            if self._closed or self._expired(pooled, time.monotonic()):
+                self._size -= 1
+                self._close_connection(pooled)
+            else:
+                pooled.released_at = time.monotonic()
+                self._idle.append(pooled)
+            self._condition.notify()
+
+    def _discard(self, pooled: _PooledConnection) -> None:
+        with self._condition:
+            self._size -= 1
+            self._close_connection(pooled)
+            self._condition.notify()
+
+    def _prune_idle(self) -> None:
+        """Close expired idle connections, the oldest ones are at the left of the deque"""
+        now = time.monotonic()
+        for pooled in list(self._idle):
+            idle_expired = (
+                self._idle_timeout is not None
+                and self._size > self._min_size
+                and now - pooled.released_at > self._idle_timeout
+            )
+            if idle_expired or self._expired(pooled, now):
+                self._idle.remove(pooled)
+                self._size -= 1
+                self._close_connection(pooled)
+
+    def _expired(self, pooled: _PooledConnection, now: float) -> bool:
+        return self._max_lifetime is not None and now - pooled.created_at > self._max_lifetime
+
+    def _open(self) -> _PooledConnection:
+        return _PooledConnection(self._connect())
+
+    @staticmethod
+    def _close_connection(pooled: _PooledConnection) -> None:
+        try:
+            pooled.connection.close()
+        except Exception:  # The connection is being dropped anyway
+            pass
+
+    def __enter__(self) -> "SessionPool":
+        return self
+
+    def __exit__(self, type_, value, traceback) -> None:
+        self.close()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import re
+import weakref
+from threading import Lock
+from typing import Any, Dict, List, Match, Optional, Set, Tuple, Union, TYPE_CHECKING
+
+from .value_objects import Fetch
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .builder import BaseSqlify
+
+_PYFORMAT_PARAMETER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+# Names of the statements prepared on each connection. Statement names come from the sql, so they are shared by every
+# prepared query and sqlify object using the connection, like the sessions of a pool reusing it
+_prepared_statements: "weakref.WeakKeyDictionary[Any, Set[str]]" = weakref.WeakKeyDictionary()
+_prepared_lock = Lock()
+
+
+def is_prepared(connection: Any, name: str) -> bool:
+    """Whether the statement name was already prepared on connection"""
+    with _prepared_lock:
+        return name in _prepared_statements.get(connection, ())
+
+
+def mark_prepared(connection: Any, name: str) -> None:
+    with _prepared_lock:
+        _prepared_statements.setdefault(connection, set()).add(name)
+
+
+def pyformat_to_numeric(sql: str) -> Tuple[str, Optional[List[str]]]:
+    """Convert %s/%(name)s parameters into the $1, $2 ... style used by PREPARE statements
+    Returns the converted sql and the parameter names in positional order, or None when the parameters are unnamed
+    """
+    names: List[str] = []
+    unnamed = 0
+
+    def replace(match: Match) -> str:
+        nonlocal unnamed
+        token = match.group(0)
+        if token == "%%":
+            return token
+
+        name = match.group(1)
+        if name is None:
+            unnamed += 1
+            return f"${unnamed}"
+
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    converted = _PYFORMAT_PARAMETER.sub(replace, sql)
+    if names and unnamed:
+        raise ValueError("Named and unnamed parameters can't be mixed in the same query")
+
+    return converted, names if names else None
+
+
+class PreparedQuery(object):
+    """A query rendered once by the builder, calling it only binds the parameters and runs it
+
+    book = prepared(dict(id=1))
+    rowcount = prepared_update(dict(id=1), data=dict(name="New name"))
+    """
+
+    def __init__(
+            self,
+            sqlify: "BaseSqlify",
+            sql: str,
+            fetch: Optional[Fetch],
+            parameters: Optional[Union[List, Dict]] = None,
+            data: Optional[Dict[str, Any]] = None,
+            server_side: bool = False,
+            writes: Optional[str] = None,
+    ) -> None:
+        self.sql = sql
+        self.fetch = fetch
+        self.server_side = server_side
+        # Table written by the query, its cached results are invalidated on each call
+        self.writes = writes
+        self.name = "sqlify_" + hashlib.sha1(sql.encode()).hexdigest()[:16]
+
+        # Backend state, filled on the first server side execution
+        self.numeric: Optional[Tuple[str, Optional[List[str]]]] = None
+
+        self._sqlify = sqlify
+        self._parameters = parameters
+        self._data = data
+
+    def __call__(
+            self,
+            parameters: Optional[Union[List, Dict]] = None,
+            data: Optional[Dict[str, Any]] = None,
+    ) -> Any:
+        if parameters is None:
+            parameters = self._parameters
+        elif isinstance(parameters, dict) and isinstance(self._parameters, dict):
+            parameters = {**self._parameters, **parameters}
+
+        if self._data is not None:
+            if data is not None:
+                unknown = set(data).difference(self._data)
+                if unknown:
+                    raise ValueError(f"Fields not included in the prepared update: {', '.join(sorted(unknown))}")
+                data = {**self._data, **data}
+            else:
+                data = self._data
+            parameters = self._sqlify._update_arguments(data, parameters)
+
+        cur = self._sqlify._execute_prepared(self, parameters)
+        if self.writes is not None:
+            self._sqlify._invalidate(self.writes)
+
+        if self.fetch is Fetch.ONE:
+            return self._sqlify._fetchone(cur)
+        if self.fetch is Fetch.ALL:
+            return self._sqlify._fetchall(cur)
+        return cur.rowcount
+
+    def __repr__(self) -> str:
+        return f"<PreparedQuery {self.sql!r}>"
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Immutable query nodes the builder arguments are lowered into before rendering
+
+Nodes are tuples with __slots__ = (), so they are hashable and the sql cache is keyed on them. Lowering runs on every
+call, even when the sql is cached, so it only converts what isn't hashable already: lists become tuples and the with
+dict a tuple of (name, query) pairs. Strings and (expression, direction) order tuples are kept as they are and
+normalized when rendering, which only happens once per cached statement.
+
+Each clause holds a single expression as a string or a tuple of expressions, the renderer joins them.
+"""
+from collections import namedtuple
+from typing import Any, Dict, Tuple, Union
+
+from .operators import DecreaseSQL, IncreaseSQL, RawSQL, SqlOperator
+
+
+class Select(namedtuple("Select", "table fields where group having order limit offset with_")):
+    """fields, where and group = an expression or a tuple of them, where conditions are joined with AND
+    order = an expression or an (expression, direction) tuple
+    with_ = tuple of (name, query) pairs
+    """
+    __slots__ = ()
+
+
+class Assignment(namedtuple("Assignment", "column operation expression")):
+    """A SET column of an update using an operator, expression is the raw sql of RAW assignments"""
+    __slots__ = ()
+
+    INCREASE = "+"
+    DECREASE = "-"
+    RAW = "RAW"
+
+
+class Update(namedtuple("Update", "table assignments where returning")):
+    """assignments = tuple of column names, bound to their _datainput parameter, or Assignment nodes"""
+    __slots__ = ()
+
+
+class Delete(namedtuple("Delete", "table where returning")):
+    __slots__ = ()
+
+
+Node = Union[Select, Update, Delete]
+
+
+def _assignment(column: str, value: Any) -> Union[str, Assignment]:
+    if isinstance(value, RawSQL):
+        return Assignment(column, Assignment.RAW, str(value))
+    if isinstance(value, IncreaseSQL):
+        return Assignment(column, Assignment.INCREASE, None)
+    if isinstance(value, DecreaseSQL):
+        return Assignment(column, Assignment.DECREASE, None)
+    return column
+
+
+def assignments(data: Dict[str, Any]) -> Tuple[Union[str, Assignment], ...]:
+    """SET columns of an update, only the shape of data is kept, its values are bound as parameters
+    Plain values are assigned by column name, only the operators get an Assignment node
+    """
+    for value in data.values():
+        if isinstance(value, SqlOperator):
+            return tuple([_assignment(column, item) for column, item in data.items()])
+
+    return tuple(data)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+import copy
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from .cache import freeze
+from .value_objects import RowFormat
+
+# Returned by the backends when a key isn't cached, None is a valid cached result
+MISSING = object()
+
+_TABLE_NAME = re.compile(r'\s*([\w."]+)')
+_REFERENCED_TABLE = re.compile(r'\b(?:from|join)\s+([\w."]+)', re.IGNORECASE)
+
+
+def normalize_table(table: str) -> str:
+    return table.replace('"', "").lower()
+
+
+def tables_of(table: str, with_sq: Optional[Dict[str, str]] = None) -> Tuple[str, ...]:
+    """Tables read by a query, the table argument itself plus any table joined or selected from in it or in the
+    with queries
+    """
+    names = []
+    match = _TABLE_NAME.match(table)
+    if match:
+        names.append(match.group(1))
+    names.extend(_REFERENCED_TABLE.findall(table))
+    for query in (with_sq or {}).values():
+        names.extend(_REFERENCED_TABLE.findall(query))
+
+    return tuple(sorted({normalize_table(name) for name in names}))
+
+
+class CacheBackend(object):
+    """Storage behind ResultCache, subclass it to share the cached results between processes, eg in redis
+    Keys are tuples, stores that only take strings can use a digest of repr(key). Each table also has a version number,
+    incremented when the table is written to, the versions are part of the keys so old results are never read again
+    """
+
+    def get(self, key: Hashable) -> Any:
+        """The cached value, or MISSING when it isn't cached or already expired"""
+        raise NotImplementedError()
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        raise NotImplementedError()
+
+    def version(self, table: str) -> int:
+        raise NotImplementedError()
+
+    def bump(self, table: str) -> None:
+        """Increment the table version"""
+        raise NotImplementedError()
+
+    def clear(self) -> None:
+        raise NotImplementedError()
+
+
+class MemoryBackend(CacheBackend):
+    """In process LRU store, bounded to maxsize results"""
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self.evictions = 0
+
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Any:
+        try:
+            expires_at, value = self._data[key]
+            self._data.move_to_end(key)
+        except KeyError:
+            return MISSING
+
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return MISSING
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def version(self, table: str) -> int:
+        return self._versions.get(table, 0)
+
+    def bump(self, table: str) -> None:
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ResultCache(object):
+    """Read-through cache of fetchone and fetchall results, keyed on the rendered sql and its parameters
+
+    Only reads with a ttl are cached, from the call cache_ttl, the tables ttl or the default ttl, in that order.
+    Writes made through sqlify (insert, update, delete, truncate...) invalidate the results of the table
+
+    cache = ResultCache(tables=dict(countries=3600))
+    sqlify = Sqlite3Sqlify(cursor, result_cache=cache)
+    """
+
+    def __init__(
+            self,
+            backend: Optional[CacheBackend] = None,
+            ttl: Optional[float] = None,
+            tables: Optional[Dict[str, float]] = None,
+    ) -> None:
+        """
+        backend = where the results are stored, an in process MemoryBackend by default
+        ttl = default seconds a result is cached, None only caches the calls and tables with their own ttl
+        tables = table name to seconds its results are cached
+        """
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.tables = {normalize_table(table): table_ttl for table, table_ttl in (tables or {}).items()}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def ttl_for(self, tables: Iterable[str], ttl: Optional[float] = None) -> Optional[float]:
+        """Seconds to cache a read of tables, None or 0 means it isn't cached"""
+        if ttl is not None:
+            return ttl
+        table_ttls = [self.tables[table] for table in tables if table in self.tables]
+        if table_ttls:
+            return min(table_ttls)
+        return self.ttl
+
+    def key(
+            self, tables: Tuple[str, ...], sql: str, parameters: Any, row_format: Optional[RowFormat] = None
+    ) -> Hashable:
+        """row_format = format of the cached rows, sqlify objects with different formats can share a cache"""
+        versions = tuple([self.backend.version(table) for table in tables])
+        return sql, freeze(parameters), versions, None if row_format is None else row_format.value
+
+    def get(self, key: Hashable) -> Any:
+        value = self.backend.get(key)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        self.backend.set(key, value, ttl)
+
+    def invalidate(self, *tables: str) -> None:
+        """Drop the cached results of tables, for writes made outside of sqlify, eg with execute"""
+        for table in tables:
+            self.backend.bump(normalize_table(table.strip()))
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Remove every cached result and reset the counters"""
+        self.backend.clear()
+        self.hits = self.misses = self.invalidations = 0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = dict(
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=self.hits / lookups if lookups else 0.0,
+            invalidations=self.invalidations,
+        )
+        if isinstance(self.backend, MemoryBackend):
+            stats.update(size=len(self.backend), maxsize=self.backend.maxsize, evictions=self.backend.evictions)
+        return stats
+
+
+def _copy_row(row: Any) -> Any:
+    if row is None or isinstance(row, tuple):
+        return row
+    return copy.copy(row)
+
+
+def copy_result(value: Any) -> Any:
+    """Copy the mutable parts of a cached result so callers can't change it, the list, each row that isn't a tuple
+    and the column lists of columnar results
+    """
+    if isinstance(value, list):
+        return [_copy_row(row) for row in value]
+    if isinstance(value, dict):
+        copied = copy.copy(value)
+        for column, values in value.items():
+            if isinstance(values, list):
+                copied[column] = list(values)
+        return copied
+    return _copy_row(value)
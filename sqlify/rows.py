@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import dataclasses
+import keyword
+from collections import namedtuple
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+
+from .value_objects import RowFormat
+
+
+def row_format(value: Union[RowFormat, str]) -> RowFormat:
+    if isinstance(value, RowFormat):
+        return value
+    return RowFormat(value.upper())
+
+
+def field_names(columns: Sequence[str]) -> Tuple[str, ...]:
+    """Column names usable as attributes, invalid or repeated names are replaced by _<position>
+    the same way namedtuple(rename=True) does
+    """
+    names: List[str] = []
+    seen = set()
+    for index, name in enumerate(columns):
+        if not name.isidentifier() or keyword.iskeyword(name) or name.startswith("_") or name in seen:
+            name = f"_{index}"
+        seen.add(name)
+        names.append(name)
+    return tuple(names)
+
+
+def slots_dataclass(fields: Tuple[str, ...]) -> type:
+    """Dataclass with __slots__, rebuilt by hand the same way dataclass(slots=True) does it on newer pythons"""
+    cls = dataclasses.make_dataclass("Row", fields)
+    namespace = {key: value for key, value in cls.__dict__.items() if key not in ("__dict__", "__weakref__")}
+    namespace["__slots__"] = fields
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+@lru_cache(maxsize=1024)
+def row_factory(format_: RowFormat, columns: Tuple[str, ...]) -> Callable[[Sequence[Any]], Any]:
+    """Build the function that creates a row from its values, once per format and query shape"""
+    if format_ is RowFormat.TUPLE:
+        return tuple
+    if format_ is RowFormat.NAMEDTUPLE:
+        return namedtuple("Row", columns, rename=True)._make
+    if format_ is RowFormat.SLOTS:
+        cls = slots_dataclass(field_names(columns))
+        return lambda values: cls(*values)
+    if format_ is RowFormat.COLUMNAR:
+        return lambda values: dict(zip(columns, values))
+    raise ValueError(f"Unknown row format {format_}")
+
+
+def row_values(row: Any) -> Sequence[Any]:
+    """Row values in column order, for tuple and dict like rows"""
+    if isinstance(row, dict):
+        return list(row.values())
+    return row
+
+
+def _columns(description: Sequence[Sequence[Any]]) -> Tuple[str, ...]:
+    return tuple([column[0] for column in description])
+
+
+def convert_row(format_: RowFormat, description: Sequence[Sequence[Any]], row: Any) -> Any:
+    """Convert a single driver row, columnar rows are a dict of column to value"""
+    if row is None:
+        return None
+    return row_factory(format_, _columns(description))(row_values(row))
+
+
+def convert_rows(format_: RowFormat, description: Sequence[Sequence[Any]], rows: List[Any]) \
+        -> Union[List[Any], Dict[str, List[Any]]]:
+    """Convert a list of driver rows, columnar results are a dict of column to list of values"""
+    columns = _columns(description)
+
+    if format_ is RowFormat.COLUMNAR:
+        values = [row_values(row) for row in rows] if rows and isinstance(rows[0], dict) else rows
+        if not values:
+            return {column: [] for column in columns}
+        return {column: list(column_values) for column, column_values in zip(columns, zip(*values))}
+
+    if format_ is RowFormat.TUPLE and rows and type(rows[0]) is tuple:
+        return rows
+
+    make = row_factory(format_, columns)
+    return [make(row_values(row)) for row in rows]
+
+
+def convert_each(format_: RowFormat, description: Sequence[Sequence[Any]], rows: List[Any]) -> List[Any]:
+    """Convert a list of driver rows that are handed out one by one, columnar rows are a dict of column to value"""
+    if format_ is not RowFormat.COLUMNAR:
+        return convert_rows(format_, description, rows)  # type: ignore
+
+    make = row_factory(format_, _columns(description))
+    return [make(row_values(row)) for row in rows]
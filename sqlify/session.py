@@ -1,66 +1,64 @@
 # -*- coding: utf-8 -*-
 from typing import Optional, Union, Any, Type
 
-from .builder import BaseSqlify, Psycopg2Sqlify, Sqlite3Sqlify
-from .value_objects import DatabaseType
-
-try:
-    from psycopg2._psycopg import connection as psycopg2_connection
-except ModuleNotFoundError:
-    psycopg2_connection = None
-
-try:
-    from sqlite3 import Connection as sqlite3_connection, ProgrammingError
-except ModuleNotFoundError:
-    sqlite3_connection = None
+from .builder import BaseSqlify
+from .concurrency import ThreadLocalSqlify
+from .dialects import Dialect, detect_dialect, get_dialect
+from .result_cache import ResultCache
+from .value_objects import DatabaseType, RowFormat
 
 
 class Session(object):
-    _database_type: DatabaseType
+    """Runs a sqlify object over a connection, the driver is detected from the registered dialects
+
+    database_type = DatabaseType member or name of a registered dialect, only needed when detection fails
+    """
+    dialect: Dialect
     _manager: Type[BaseSqlify]
 
-    def __init__(self, connection: Union[psycopg2_connection, sqlite3_connection],
-                 database_type: Optional[DatabaseType] = None, autocommit: Optional[bool] = True):
+    def __init__(self, connection: Any, database_type: Optional[Union[DatabaseType, str]] = None,
+                 autocommit: Optional[bool] = True, row_format: Optional[Union[RowFormat, str]] = None,
+                 result_cache: Optional[ResultCache] = None, thread_local: bool = False):
         self._connection = connection
         self._autocommit = autocommit
 
         if database_type is not None:
-            self._database_type = database_type
-        elif psycopg2_connection and isinstance(self._connection, psycopg2_connection):
-            self._database_type = DatabaseType.PSYCOPG2
-            self._manager = Psycopg2Sqlify
-        elif sqlite3_connection and isinstance(self._connection, sqlite3_connection):
-            self._database_type = DatabaseType.SQLITE3
-            self._manager = Sqlite3Sqlify
+            self.dialect = get_dialect(database_type)
         else:
-            raise RuntimeError(
-                "Could not detect the correct database type, please supply the 'database_type' parameter")
+            self.dialect = detect_dialect(connection)
 
-        self.session = self._manager(self.get_cursor())
+        if self.dialect.asynchronous:
+            raise ValueError(f"The {self.dialect.name} dialect is asynchronous, use AsyncSession instead")
+        self._manager = self.dialect.sqlify
+
+        def make_sqlify() -> BaseSqlify:
+            return self._manager(self.get_cursor(), row_format=row_format, result_cache=result_cache)
+
+        self.session: Union[BaseSqlify, ThreadLocalSqlify] = (
+            ThreadLocalSqlify(make_sqlify) if thread_local else make_sqlify()
+        )
 
     @property
     def is_open(self) -> bool:
-        if self._database_type == DatabaseType.PSYCOPG2:
-            return not self._connection.closed
-        elif self._database_type == DatabaseType.SQLITE3:
-            return True
-        raise NotImplementedError("Database type not implemented")
+        return self.dialect.is_open(self._connection)
 
     def close(self) -> None:
         self._connection.close()
 
     def get_cursor(self) -> Any:
-        return self._connection.cursor()
+        return self.dialect.cursor(self._connection)
 
     def __enter__(self):
+        if self._autocommit:
+            self.dialect.begin(self._connection)
         return self.session
 
     def __exit__(self, type_, value, traceback):
         if self._autocommit:
-            if isinstance(type_, Exception):
-                self._connection.rollback()
+            if type_ is not None:
+                self.dialect.rollback(self._connection)
             else:
-                self._connection.commit()
+                self.dialect.commit(self._connection)
 
         if self.is_open:
             self.close()
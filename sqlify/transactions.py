@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from .builder import BaseSqlify
+
+
+class CommitBatcher(object):
+    """Commits every n steps, for long ingestion loops that shouldn't commit per row nor only at the end
+
+    with sqlify.commit_every(1000) as batch:
+        for row in rows:
+            sqlify.insert("books", row)
+            batch.step()
+    """
+
+    def __init__(self, sqlify: "BaseSqlify", n: int) -> None:
+        if n < 1:
+            raise ValueError("commit_every requires a positive number of steps")
+
+        self.n = n
+        self.pending = 0
+        self.commits = 0
+
+        self._sqlify = sqlify
+        self._explicit: Optional[bool] = None
+
+    def step(self, count: int = 1) -> None:
+        """Count count units of work, committing once n of them are pending"""
+        self.pending += count
+        if self.pending >= self.n:
+            self.commit()
+
+    def commit(self) -> None:
+        """Commit the pending work now and start a new transaction"""
+        if self._explicit is None:
+            raise RuntimeError("commit_every must be used as a context manager")
+
+        self._sqlify._end_transaction(self._explicit, commit=True)
+        self.commits += 1
+        self.pending = 0
+        self._explicit = self._sqlify._begin_transaction()
+
+    def __enter__(self) -> "CommitBatcher":
+        if self._sqlify._transaction_depth:
+            raise RuntimeError("commit_every can't run inside a transaction, its commits would break it apart")
+
+        self._explicit = self._sqlify._begin_transaction()
+        return self
+
+    def __exit__(self, type_, value, traceback) -> None:
+        explicit, self._explicit = self._explicit, None
+        if type_ is not None:
+            # Only the work since the last commit is lost
+            self._sqlify._end_transaction(explicit, commit=False)
+            return
+
+        self._sqlify._end_transaction(explicit, commit=True)
+        if self.pending:
+            self.commits += 1
+            self.pending = 0
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import json
+import queue
+import re
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .value_objects import DataFormat
+
+
+# A csv field, quoted or not, and the comma that ends it
+_CSV_FIELD = re.compile(r'("(?:[^"]|"")*"|[^,]*)(,|$)', re.DOTALL)
+
+
+def data_format(value: Union[DataFormat, str]) -> DataFormat:
+    if isinstance(value, DataFormat):
+        return value
+    return DataFormat(value.upper())
+
+
+def _values(row: Any) -> Sequence[Any]:
+    """Row values in column order, for tuple and dict like rows"""
+    if isinstance(row, dict):
+        return list(row.values())
+    return row
+
+
+def _csv_field(value: Any) -> str:
+    """A csv field with the NULL convention of postgres COPY, None is an empty field and empty strings are quoted"""
+    if value is None:
+        return ""
+    text = value if isinstance(value, str) else str(value)
+    if text == "" or any(character in text for character in ',"\r\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def csv_chunks(columns: List[str], batches: Iterable[List[Any]], header: bool = True) -> Iterator[str]:
+    """Render batches of rows as csv text, one chunk per batch
+    None is written as an empty field and empty strings as "", the way postgres COPY tells them apart
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+
+    if header:
+        writer.writerow(columns)
+
+    def values(rows: List[Any]) -> Iterator[Sequence[Any]]:
+        # The csv module writes both None and "" as an empty field, rows with empty strings are written here instead.
+        # writerows writes each row as soon as it gets it, so the lines stay in order
+        for row in rows:
+            row = _values(row)
+            if "" in row or (len(row) == 1 and row[0] is None):
+                buffer.write(",".join([_csv_field(value) for value in row]) + "\n")
+            else:
+                yield row
+
+    for rows in batches:
+        writer.writerows(values(rows))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(columns: List[str], batches: Iterable[List[Any]]) -> Iterator[str]:
+    """Render batches of rows as newline delimited json objects, one chunk per batch"""
+    dumps = json.JSONEncoder(default=str, separators=(",", ":")).encode
+    for rows in batches:
+        yield "".join(dumps(dict(zip(columns, _values(row)))) + "\n" for row in rows)
+
+
+def _csv_nulls(row: List[str], record: str) -> Tuple:
+    """Values of a csv row, with its unquoted empty fields as None, record is the csv text the row was read from"""
+    fields = []
+    record = record.rstrip("\r\n")
+    position = 0
+    while True:
+        match = _CSV_FIELD.match(record, position)
+        fields.append(match.group(1))
+        if not match.group(2):
+            break
+        position = match.end()
+
+    if len(fields) != len(row):
+        return tuple(row)
+    return tuple([None if value == "" and field == "" else value for value, field in zip(row, fields)])
+
+
+def read_csv(file: Iterable[str], columns: Optional[List[str]] = None, header: bool = True) \
+        -> Tuple[List[str], Iterator[Tuple]]:
+    """Read csv rows lazily, empty fields are read as None and quoted empty fields as empty strings, the same way they
+    are written
+    """
+    # The csv module reads both kinds of empty fields as "", the lines of each record are kept to tell them apart
+    record: List[str] = []
+
+    def source() -> Iterator[str]:
+        for line in file:
+            record.append(line)
+            yield line
+
+    reader = csv.reader(source())
+    if header:
+        first = next(reader, None)
+        if columns is None:
+            columns = first or []
+
+    if not columns:
+        raise ValueError("The csv columns must be given when the file has no header")
+
+    def rows() -> Iterator[Tuple]:
+        for row in reader:
+            text = "".join(record)
+            record.clear()
+            if not row and len(columns) == 1:
+                # A single NULL field is written as an empty line
+                yield (None,)
+            else:
+                yield _csv_nulls(row, text) if "" in row else tuple(row)
+
+    record.clear()
+    return columns, rows()
+
+
+def read_ndjson(file: Iterable[str], columns: Optional[List[str]] = None) -> Tuple[List[str], Iterator[Tuple]]:
+    """Read newline delimited json objects lazily, columns default to the keys of the first object"""
+    objects = (json.loads(line) for line in file if line.strip())
+    first = next(objects, None)
+    if first is None:
+        return columns or [], iter(())
+
+    if columns is None:
+        columns = list(first.keys())
+
+    def rows() -> Iterator[Tuple]:
+        yield tuple([first.get(column) for column in columns])
+        for item in objects:
+            yield tuple([item.get(column) for column in columns])
+
+    return columns, rows()
+
+
+def lines(chunks: Iterable[Union[str, bytes]]) -> Iterator[str]:
+    """Split an iterable of text chunks into lines, files are returned as they are"""
+    if hasattr(chunks, "readline"):
+        return iter(chunks)  # type: ignore
+
+    def split() -> Iterator[str]:
+        pending = ""
+        for chunk in chunks:
+            if isinstance(chunk, bytes):
+                chunk = chunk.decode()
+            pending += chunk
+            *complete, pending = pending.split("\n")
+            for line in complete:
+                yield line + "\n"
+        if pending:
+            yield pending
+
+    return split()
+
+
+def csv_header(file: Iterable[Union[str, bytes]], columns: Optional[List[str]] = None) \
+        -> Tuple[Optional[List[str]], Iterator[str]]:
+    """Consume the csv header line, for COPY statements where the header defines the target columns
+    Returns the columns, the header ones unless columns is given, and the remaining lines
+    """
+    source = lines(file)
+    first = next(source, "")
+    if columns is None:
+        columns = next(csv.reader([first]), None)
+    return columns, source
+
+
+def blocks(file: Union[Any, Iterable[Union[str, bytes]]], size: int = 65536) -> Iterator[Union[str, bytes]]:
+    """Read a file-like object in blocks of size, iterables of chunks are returned as they are"""
+    if not hasattr(file, "read"):
+        return iter(file)
+
+    def read() -> Iterator[Union[str, bytes]]:
+        while True:
+            block = file.read(size)
+            if not block:
+                return
+            yield block
+
+    return read()
+
+
+class IterableReader(io.RawIOBase):
+    """Read-only file object over an iterable of chunks, for drivers that expect a file"""
+
+    def __init__(self, chunks: Iterable[Union[str, bytes]]) -> None:
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = chunk.encode() if isinstance(chunk, str) else chunk
+
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class QueueWriter(object):
+    """File object whose writes are handed to a consumer through a bounded queue"""
+    _done = object()
+
+    def __init__(self, maxsize: int = 8) -> None:
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._cancelled = threading.Event()
+
+    def write(self, data: Union[str, bytes]) -> int:
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(data, timeout=0.1)
+                return len(data)
+            except queue.Full:
+                continue
+        raise _Cancelled("The consumer stopped reading")
+
+    def stream(self, produce: Callable[["QueueWriter"], Any]) -> Iterator[Union[str, bytes]]:
+        """Run produce in a thread and yield what it writes, memory is bounded by the queue size"""
+        errors: List[BaseException] = []
+
+        def run() -> None:
+            try:
+                produce(self)
+            except _Cancelled:
+                pass
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                self._put_done()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            while True:
+                data = self._queue.get()
+                if data is self._done:
+                    break
+                yield data
+        finally:
+            self._cancelled.set()
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+    def _put_done(self) -> None:
+        while True:
+            try:
+                self._queue.put(self._done, timeout=0.1)
+                return
+            except queue.Full:
+                if self._cancelled.is_set():
+                    return
@@ -9,8 +9,25 @@ class Order(Enum):
 class DatabaseType(Enum):
     PSYCOPG2 = "PSYCOPG2"
     SQLITE3 = "SQLITE3"
+    ASYNCPG = "ASYNCPG"
+    AIOSQLITE = "AIOSQLITE"
+    PSYCOPG3 = "PSYCOPG3"
+    DUCKDB = "DUCKDB"
 
 
 class Fetch(Enum):
     ONE = "ONE"
     ALL = "ALL"
+
+
+class DataFormat(Enum):
+    CSV = "CSV"
+    NDJSON = "NDJSON"
+    BINARY = "BINARY"
+
+
+class RowFormat(Enum):
+    TUPLE = "TUPLE"
+    NAMEDTUPLE = "NAMEDTUPLE"
+    SLOTS = "SLOTS"
+    COLUMNAR = "COLUMNAR"
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+import re
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+from .explain import table_aliases
+from .instrumentation import QueryEvent, QueryHook
+from .query import Node, Select
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .migrations import Migrations
+
+# Postgres truncates identifiers to 63 bytes
+_MAX_NAME = 63
+
+# A column compared to something, like "price > ?", "b.genre IN (...)" or "name LIKE %(name)s"
+_PREDICATE = re.compile(
+    r"(?<![\w.:%$@'\"])(?:(\w+)\.)?([A-Za-z_]\w*)\s*"
+    r"(==|=|<>|!=|<=|>=|<|>|\s(?:NOT\s+)?IN\b|\s(?:NOT\s+)?LIKE\b|\sIS\b|\sBETWEEN\b)",
+    re.IGNORECASE,
+)
+_OR = re.compile(r"\bOR\b", re.IGNORECASE)
+_COLUMN = re.compile(r"^(?:(\w+)\.)?([A-Za-z_]\w*)(?:\s+(?:ASC|DESC))?(?:\s+NULLS\s+(?:FIRST|LAST))?$", re.IGNORECASE)
+_TABLE = re.compile(r"^\s*(\w+(?:\.\w+)?)\s*$")
+_JOINED = re.compile(r"(?:^|\bJOIN)\s+(\w+)", re.IGNORECASE)
+# "CREATE UNIQUE INDEX books_pkey ON public.books USING btree (id)", items are columns, possibly quoted and followed by
+# an operator class or direction, or expressions
+_BTREE = re.compile(r"\bUSING btree \(")
+_INDEX_COLUMN = re.compile(r'^"?(\w+)"?(?:\s|$)')
+
+_EQUALITY = {"=", "==", "IN", "IS"}
+_RANGE = {"<", ">", "<=", ">=", "BETWEEN", "LIKE"}
+
+
+class QueryShape(namedtuple("QueryShape", "table equality range order group")):
+    """Columns of a table a query filters, sorts and groups on, each a tuple of column names
+    equality = compared with =, IN or IS
+    range = compared with <, >, <=, >=, BETWEEN or LIKE
+    """
+    __slots__ = ()
+
+    def __str__(self) -> str:
+        parts = [self.table]
+        if self.equality:
+            parts.append(f"where {', '.join(self.equality)} =")
+        if self.range:
+            parts.append(f"where {', '.join(self.range)} in range")
+        if self.order:
+            parts.append(f"order by {', '.join(self.order)}")
+        if self.group:
+            parts.append(f"group by {', '.join(self.group)}")
+        return " ".join(parts)
+
+
+def _expressions(clause: Optional[Union[str, Tuple[str, ...]]]) -> Tuple[str, ...]:
+    if not clause:
+        return ()
+    return (clause,) if isinstance(clause, str) else clause
+
+
+def _tables(table: str) -> Dict[Optional[str], str]:
+    """Qualifier -> table of the FROM clause, None -> the table of unqualified columns, only set for single tables"""
+    match = _TABLE.match(table)
+    if match is not None:
+        name = match.group(1)
+        return {None: name, name: name, name.rsplit(".", 1)[-1]: name}
+
+    tables: Dict[Optional[str], str] = {name: name for name in _JOINED.findall(table)}
+    tables.update(table_aliases(f"FROM {table}"))
+    return tables
+
+
+def _resolve(
+        tables: Dict[Optional[str], str], qualifier: Optional[str], column: str
+) -> Optional[Tuple[str, str]]:
+    table = tables.get(qualifier)
+    return None if table is None else (table, column)
+
+
+def _sort_columns(
+        tables: Dict[Optional[str], str], expressions: Tuple[str, ...]
+) -> Tuple[Optional[str], Tuple[str, ...]]:
+    """Table and columns of an ORDER BY or GROUP BY, only when every expression is a column of the same table"""
+    table = None
+    columns: List[str] = []
+    for expression in expressions:
+        for item in expression.split(","):
+            match = _COLUMN.match(item.strip())
+            resolved = match and _resolve(tables, match.group(1), match.group(2))
+            if not resolved or (table is not None and resolved[0] != table):
+                return None, ()
+            table = resolved[0]
+            columns.append(resolved[1])
+
+    return table, tuple(OrderedDict.fromkeys(columns))
+
+
+def shapes_of(node: Node) -> List[QueryShape]:
+    """Shapes of a select, update or delete node, one for each table its conditions, order or group use
+    Conditions with OR, expressions and unqualified columns of joins are skipped, they can't tell which index helps
+    """
+    tables = _tables(node.table)
+    equality: Dict[str, List[str]] = OrderedDict()
+    ranges: Dict[str, List[str]] = OrderedDict()
+
+    for condition in _expressions(node.where):
+        if _OR.search(condition):
+            continue
+
+        for qualifier, column, operator in _PREDICATE.findall(condition):
+            resolved = _resolve(tables, qualifier or None, column)
+            operator = " ".join(operator.split()).upper()
+            if resolved is None or column.upper() in ("AND", "NOT"):
+                continue
+            if operator in _EQUALITY:
+                equality.setdefault(resolved[0], []).append(resolved[1])
+            elif operator in _RANGE:
+                ranges.setdefault(resolved[0], []).append(resolved[1])
+
+    order_table, order = None, ()
+    group_table, group = None, ()
+    if node.__class__ is Select:
+        if node.order is not None and not isinstance(node.order, str):
+            order_table, order = _sort_columns(tables, (node.order[0],))
+        else:
+            order_table, order = _sort_columns(tables, _expressions(node.order))
+        group_table, group = _sort_columns(tables, _expressions(node.group))
+
+    shapes = []
+    for table in OrderedDict.fromkeys([*equality, *ranges, order_table, group_table]):
+        if table is None:
+            continue
+        shapes.append(QueryShape(
+            table=table,
+            equality=tuple(OrderedDict.fromkeys(equality.get(table, ()))),
+            range=tuple(OrderedDict.fromkeys(ranges.get(table, ()))),
+            order=order if order_table == table else (),
+            group=group if group_table == table else (),
+        ))
+
+    return shapes
+
+
+class WorkloadRecorder(QueryHook):
+    """Calls and time spent for each query shape, the columns each table is filtered, sorted and grouped on
+
+    Shapes come from the arguments of the builder, so only the selects, updates and deletes rendered by it are
+    recorded, raw queries sent to execute aren't. A recorder can be shared by many sqlify objects, like every session
+    of a pool, see BaseSqlify.record_workload and BaseSqlify.advise_indexes
+    maxlen = statements whose shapes are kept, the least recently used are dropped and no longer recorded until they are
+             rendered again
+    """
+
+    def __init__(self, maxlen: int = 1000) -> None:
+        self.maxlen = maxlen
+        self._statements: "OrderedDict[str, List[QueryShape]]" = OrderedDict()
+        self._shapes: Dict[QueryShape, Dict[str, Any]] = {}
+        self._lock = Lock()
+
+    def describe(self, sql: str, node_class: type, fields: Tuple) -> None:
+        """Called by the builder for every rendered statement, its shapes are only parsed the first time"""
+        with self._lock:
+            if sql in self._statements:
+                self._statements.move_to_end(sql)
+                return
+
+        # Parsed outside the lock, another thread may parse the same statement meanwhile, with the same result
+        shapes = shapes_of(node_class._make(fields))
+        with self._lock:
+            self._statements[sql] = shapes
+            while len(self._statements) > self.maxlen:
+                self._statements.popitem(last=False)
+
+    def after(self, event: QueryEvent) -> None:
+        with self._lock:
+            shapes = self._statements.get(event.sql)
+            if not shapes:
+                return
+
+            self._statements.move_to_end(event.sql)
+            for shape in shapes:
+                stats = self._shapes.get(shape)
+                if stats is None:
+                    stats = self._shapes[shape] = dict(count=0, total=0.0, max=0.0)
+                stats["count"] += 1
+                stats["total"] += event.duration
+                stats["max"] = max(stats["max"], event.duration)
+
+    def shapes(self) -> Dict[QueryShape, Dict[str, Any]]:
+        """Statistics per shape, durations in seconds, sorted by total time spent"""
+        with self._lock:
+            shapes = {shape: dict(stats) for shape, stats in self._shapes.items()}
+
+        result = OrderedDict()
+        for shape, stats in sorted(shapes.items(), key=lambda item: item[1]["total"], reverse=True):
+            result[shape] = dict(stats, mean=stats["total"] / stats["count"])
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._shapes.clear()
+
+
+class IndexAdvice(object):
+    """An index that would serve recorded shapes no existing index serves
+    columns = equality columns first, then the sorted ones, then a range column
+    shapes = the recorded shapes it serves, with their statistics
+    extends = existing index on a prefix of the columns, which may become redundant
+    """
+
+    def __init__(self, table: str, columns: Tuple[str, ...], extends: Optional[str] = None) -> None:
+        self.table = table
+        self.columns = columns
+        self.extends = extends
+        self.shapes: Dict[QueryShape, Dict[str, Any]] = OrderedDict()
+
+    @property
+    def calls(self) -> int:
+        return sum(stats["count"] for stats in self.shapes.values())
+
+    @property
+    def total(self) -> float:
+        return sum(stats["total"] for stats in self.shapes.values())
+
+    @property
+    def name(self) -> str:
+        name = f"{self.table.rsplit('.', 1)[-1]}_{'_'.join(self.columns)}_idx"
+        return name if len(name) <= _MAX_NAME else name[:_MAX_NAME - 4] + "_idx"
+
+    @property
+    def sql(self) -> str:
+        return f"CREATE INDEX {self.name} ON {self.table} ({', '.join(self.columns)});"
+
+    def __repr__(self) -> str:
+        return f"<IndexAdvice {self.table} ({', '.join(self.columns)}) calls={self.calls} total={self.total:.3f}>"
+
+
+class IndexReport(object):
+    """Result of BaseSqlify.advise_indexes
+    advice = indexes to create, sorted by the time spent in the shapes they serve
+    covered = recorded shapes already served by an existing index, with its name
+    """
+
+    def __init__(self, advice: List[IndexAdvice], covered: Dict[QueryShape, str]) -> None:
+        self.advice = advice
+        self.covered = covered
+
+    def sql(self) -> str:
+        """CREATE INDEX statements, each with a comment of the shapes it serves"""
+        statements = []
+        for advice in self.advice:
+            lines = [f"-- {stats['count']} calls, {stats['total'] * 1000:.1f}ms: {shape}"
+                     for shape, stats in advice.shapes.items()]
+            if advice.extends:
+                lines.append(f"-- extends the existing index {advice.extends}")
+            lines.append(advice.sql)
+            statements.append("\n".join(lines))
+        return "\n\n".join(statements)
+
+    def write_migration(self, migrations: "Migrations") -> Optional[str]:
+        """Create a migration with the advised indexes, to review before applying it, None when there's no advice"""
+        if not self.advice:
+            return None
+        return migrations.make_migration(sql=self.sql())
+
+    def __str__(self) -> str:
+        return self.sql() or "-- every recorded shape is served by an index"
+
+
+def index_definition_columns(definition: str) -> Optional[Tuple[Optional[str], ...]]:
+    """Columns of a postgres CREATE INDEX definition, None for the partial indexes and the ones that aren't btree"""
+    match = _BTREE.search(definition)
+    if match is None:
+        return None
+
+    items, depth, start = [], 0, match.end()
+    for position in range(match.end(), len(definition)):
+        character = definition[position]
+        if character == "(":
+            depth += 1
+        elif character == ")" and depth:
+            depth -= 1
+        elif character in ",)" and not depth:
+            items.append(definition[start:position].strip())
+            start = position + 1
+            if character == ")":
+                break
+
+    if " WHERE " in definition[start:]:
+        return None
+
+    columns = []
+    for item in items:
+        column = _INDEX_COLUMN.match(item)
+        columns.append(column.group(1) if column else None)
+    return tuple(columns)
+
+
+def index_columns(shape: QueryShape) -> Tuple[str, ...]:
+    """Columns of the index serving a shape, equality, sort and then range columns"""
+    columns = list(shape.equality)
+    for column in shape.order or shape.group:
+        if column not in columns:
+            columns.append(column)
+    for column in shape.range[:1]:
+        if column not in columns:
+            columns.append(column)
+    return tuple(columns)
+
+
+def serves(index: Tuple[Optional[str], ...], columns: Tuple[str, ...], equality: int) -> bool:
+    """Whether an index on index serves a shape needing columns, whose first equality columns can be in any order"""
+    if set(index[:equality]) != set(columns[:equality]):
+        return False
+    return tuple(index[equality:len(columns)]) == columns[equality:]
+
+
+def advise(
+        shapes: Dict[QueryShape, Dict[str, Any]],
+        indexes: Dict[str, List[Tuple[str, Tuple[Optional[str], ...]]]],
+        min_calls: int = 1,
+) -> IndexReport:
+    """Cross-check recorded shapes against the existing indexes of each table, table -> [(name, columns)]
+    Shapes of tables missing from indexes, like subqueries and with queries, are skipped
+    """
+    candidates = []
+    for shape, stats in shapes.items():
+        columns = index_columns(shape)
+        if shape.table in indexes and columns and stats["count"] >= min_calls:
+            equality = len(set(shape.equality))
+            candidates.append((shape, stats, columns, min(equality, len(columns))))
+
+    advice: Dict[Tuple[str, Tuple[str, ...]], IndexAdvice] = OrderedDict()
+    covered: Dict[QueryShape, str] = OrderedDict()
+
+    # The widest candidates first, so the narrower ones they serve are merged into them
+    for shape, stats, columns, equality in sorted(candidates, key=lambda candidate: -len(candidate[2])):
+        existing = [name for name, index in indexes[shape.table] if serves(index, columns, equality)]
+        if existing:
+            covered[shape] = existing[0]
+            continue
+
+        merged = [item for item in advice.values()
+                  if item.table == shape.table and serves(item.columns, columns, equality)]
+        if merged:
+            merged[0].shapes[shape] = stats
+            continue
+
+        extends = [name for name, index in indexes[shape.table] if index and columns[:len(index)] == tuple(index)]
+        item = advice[(shape.table, columns)] = IndexAdvice(shape.table, columns, extends[0] if extends else None)
+        item.shapes[shape] = stats
+
+    return IndexReport(sorted(advice.values(), key=lambda item: item.total, reverse=True), covered)
@@ -0,0 +1,153 @@
+from unittest import SkipTest, mock
+
+try:
+    from unittest import IsolatedAsyncioTestCase
+except ImportError:  # Python 3.7
+    raise SkipTest("IsolatedAsyncioTestCase requires python 3.8")
+
+from sqlify import (
+    AsyncBaseSqlify, AsyncpgSqlify, AiosqliteSqlify, AsyncSession, DatabaseType, Dialect, IncreaseSQL, register_dialect,
+)
+from sqlify import dialects
+
+
+class AsyncCursor(object):
+    def __init__(self, batches):
+        self.rowcount = 3
+        self._batches = list(batches)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def fetchone(self):
+        return self._batches[0][0]
+
+    async def fetchmany(self, size):
+        return self._batches.pop(0) if self._batches else []
+
+
+class TestAsyncpg(IsolatedAsyncioTestCase):
+    table_name = "test_table"
+
+    def setUp(self):
+        self.connection = mock.MagicMock()
+        self.connection.fetchrow = mock.AsyncMock(return_value=dict(id=1))
+        self.connection.fetch = mock.AsyncMock(return_value=[])
+        self.connection.execute = mock.AsyncMock(return_value="UPDATE 4")
+        self.sqlify = AsyncpgSqlify(self.connection)
+
+    async def test_fetchone_named_parameters(self):
+        row = await self.sqlify.fetchone(
+            self.table_name,
+            where=(["id = %(id)s", "name = %(name)s", "bonus > %(id)s"], dict(name="test", id=5)),
+        )
+
+        self.assertEqual(row, dict(id=1))
+        self.connection.fetchrow.assert_awaited_once_with(
+            "SELECT * FROM test_table WHERE id = $1 AND name = $2 AND bonus > $1 LIMIT 1", 5, "test",
+        )
+
+    async def test_update_rowcount(self):
+        rowcount = await self.sqlify.update(
+            self.table_name, data=dict(earned=IncreaseSQL(10)), where=("id = %(id)s", dict(id=1)),
+        )
+
+        self.assertEqual(rowcount, 4)
+        self.connection.execute.assert_awaited_once_with(
+            "UPDATE test_table SET earned = earned + $1 WHERE id = $2", 10, 1,
+        )
+
+    async def test_insert_returning(self):
+        await self.sqlify.insert(self.table_name, data=dict(name="test", price=10), returning="id")
+
+        self.connection.fetchrow.assert_awaited_once_with(
+            "INSERT INTO test_table (name, price) VALUES($1, $2) RETURNING id", "test", 10,
+        )
+
+
+class TracedSqlify(AsyncBaseSqlify):
+    _unnamed_parameter = "?"
+    ended = None
+
+    async def _end(self, commit):
+        self.ended = commit
+
+
+class TracedDialect(Dialect):
+    name = "traced_async"
+    sqlify = TracedSqlify
+    asynchronous = True
+
+
+class TestAsyncSession(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._registered = dict(dialects._dialects)
+        self.connection = mock.MagicMock()
+        self.connection.close = mock.AsyncMock()
+
+    def tearDown(self):
+        dialects._dialects.clear()
+        dialects._dialects.update(self._registered)
+
+    async def test_sessions_end_through_the_sqlify_class(self):
+        register_dialect(TracedDialect)
+
+        async with AsyncSession(self.connection, database_type="traced_async") as sqlify:
+            pass
+        self.assertIs(sqlify.ended, True)
+
+        with self.assertRaises(ValueError):
+            async with AsyncSession(self.connection, database_type="traced_async") as sqlify:
+                raise ValueError()
+        self.assertIs(sqlify.ended, False)
+
+    async def test_asyncpg_session_ends_its_transaction(self):
+        transaction = self.connection.transaction.return_value
+        transaction.start = mock.AsyncMock()
+        transaction.commit = mock.AsyncMock()
+        self.connection.is_closed.return_value = False
+
+        async with AsyncSession(self.connection, database_type=DatabaseType.ASYNCPG):
+            transaction.start.assert_awaited_once()
+
+        transaction.commit.assert_awaited_once()
+        self.connection.close.assert_awaited_once()
+
+
+class TestAiosqlite(IsolatedAsyncioTestCase):
+    table_name = "test_table"
+
+    def setUp(self):
+        self.connection = mock.MagicMock()
+        self.connection.commit = mock.AsyncMock()
+        self.connection.rollback = mock.AsyncMock()
+        self.connection.close = mock.AsyncMock()
+
+    async def test_iterate_in_batches(self):
+        self.connection.execute.return_value = AsyncCursor([[(1,), (2,)], [(3,)]])
+        sqlify = AiosqliteSqlify(self.connection)
+
+        rows = [row async for row in sqlify.iterate(self.table_name, fields="id", where=("id > ?", [0]))]
+
+        self.assertEqual(rows, [(1,), (2,), (3,)])
+        self.connection.execute.assert_called_once_with("SELECT id FROM test_table WHERE id > ?", [0])
+
+    async def test_session_commits_and_closes(self):
+        self.connection.execute.return_value = AsyncCursor([[(1,)]])
+
+        async with AsyncSession(self.connection, database_type=DatabaseType.AIOSQLITE) as sqlify:
+            self.assertEqual(await sqlify.delete(self.table_name, where=("id = :id", dict(id=1))), 3)
+
+        self.connection.commit.assert_awaited_once()
+        self.connection.close.assert_awaited_once()
+
+    async def test_session_rolls_back_on_exception(self):
+        with self.assertRaises(ValueError):
+            async with AsyncSession(self.connection, database_type=DatabaseType.AIOSQLITE):
+                raise ValueError()
+
+        self.connection.rollback.assert_awaited_once()
+        self.connection.commit.assert_not_awaited()
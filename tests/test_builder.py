@@ -1,6 +1,9 @@
+import datetime
+from decimal import Decimal
 from unittest import TestCase, mock
 
 from sqlify import Psycopg2Sqlify, RawSQL, IncreaseSQL, DecreaseSQL, Order
+from sqlify.pagination import encode_cursor
 
 
 class TestBuilder(TestCase):
@@ -283,3 +286,247 @@ class TestBuilder(TestCase):
             "delete from test_table where bonus_key = %(bonus_key)s "
             "and ts = %(ts)s returning *"
         )
+
+    def test_format_bulk_insert(self):
+        sql = self.sqlify._format_bulk_insert(self.table_name, ["asd", "ts"], 2, returning="*")
+
+        self.assertEqual(
+            sql.lower(),
+            "insert into test_table (asd, ts) values (%s, %s), (%s, %s) returning *",
+        )
+
+    def test_bulk_update(self):
+        self.sqlify.bulk_update(
+            self.table_name,
+            [dict(id=1, name="a", price=1), dict(id=2, name="b", price=2)],
+            key="id",
+        )
+
+        self.assertQuery(
+            "update {table} set name = v.name, price = v.price from (values (%s, %s, %s), (%s, %s, %s)) "
+            "as v (id, name, price) where {table}.id = v.id"
+        )
+        self.assertEqual(self.cursor.execute.call_args[0][1], [1, "a", 1, 2, "b", 2])
+
+    def test_bulk_update_requires_key(self):
+        with self.assertRaises(ValueError):
+            self.sqlify.bulk_update(self.table_name, [dict(name="a")], key="id")
+
+        with self.assertRaises(ValueError):
+            self.sqlify.bulk_update(self.table_name, [dict(id=1)], key="id")
+
+    def test_batch_single_round_trip(self):
+        self.cursor.mogrify.side_effect = lambda sql, params: sql.replace("%s", repr(params[0]) if params else "%s")
+        self.cursor.fetchone.return_value = (dict(id=1), [dict(name="a%")])
+
+        with self.sqlify.batch() as batch:
+            book = batch.fetchone(self.table_name, where=("id = %s", [1]), json=True)
+            authors = batch.fetchall("authors", where="name like 'a%'", json=True)
+            self.assertFalse(book.done())
+
+        self.assertQuery(
+            "select (select row_to_json(q) from (select * from {table} where id = 1 limit 1) q), "
+            "(select coalesce(json_agg(q), '[]'::json) from (select * from authors where name like 'a%%') q)"
+        )
+        self.assertEqual(book.result(), dict(id=1))
+        self.assertEqual(authors.result(), [dict(name="a%")])
+
+    def test_batch_failure_fails_every_result(self):
+        self.cursor.mogrify.side_effect = lambda sql, params: sql
+        self.cursor.execute.side_effect = RuntimeError("connection lost")
+
+        with self.assertRaises(RuntimeError):
+            with self.sqlify.batch() as batch:
+                first = batch.fetchone(self.table_name, json=True)
+                second = batch.fetchall(self.table_name, json=True)
+                third = batch.fetchall(self.table_name)
+
+        for handle in (first, second, third):
+            with self.assertRaises(RuntimeError):
+                handle.result()
+
+    def test_batch_keeps_the_column_types(self):
+        row = (1, Decimal("10.50"), datetime.date(2024, 1, 2))
+        self.cursor.fetchone.return_value = row
+        self.cursor.fetchall.return_value = [row]
+
+        with self.sqlify.batch() as batch:
+            book = batch.fetchone(self.table_name, fields=["id", "price", "published"], where=("id = %s", [1]))
+            books = batch.fetchall(self.table_name, fields=["id", "price", "published"])
+
+        self.assertEqual(
+            [call[0] for call in self.cursor.execute.call_args_list],
+            [("SELECT id, price, published FROM test_table WHERE id = %s LIMIT 1", [1]),
+             ("SELECT id, price, published FROM test_table", ())],
+        )
+        self.cursor.mogrify.assert_not_called()
+        self.assertEqual(book.result(), self.sqlify.fetchone(self.table_name, where=("id = %s", [1])))
+        self.assertEqual(books.result(), self.sqlify.fetchall(self.table_name))
+        self.assertIsInstance(book.result()[1], Decimal)
+        self.assertIsInstance(books.result()[0][2], datetime.date)
+
+    def test_batch_mixes_json_and_exact_queries(self):
+        self.cursor.mogrify.side_effect = lambda sql, params: sql
+        self.cursor.fetchone.side_effect = [(dict(id=1), dict(id=2)), (Decimal("1.5"),)]
+
+        with self.sqlify.batch() as batch:
+            first = batch.fetchone(self.table_name, json=True)
+            price = batch.fetchone(self.table_name, fields="price")
+            second = batch.fetchone("authors", json=True)
+
+        self.assertEqual(self.cursor.execute.call_count, 2)
+        self.assertEqual((first.result(), second.result(), price.result()), (dict(id=1), dict(id=2), (Decimal("1.5"),)))
+
+    def test_prepare_fetchone(self):
+        query = self.sqlify.prepare("fetchone", self.table_name, fields="bonus", where="id = %(id)s")
+        query(dict(id=1))
+        query(dict(id=2))
+
+        self.assertEqual(self.cursor.execute.call_count, 2)
+        self.assertEqual(self.cursor.execute.call_args[0],
+                         ("SELECT bonus FROM test_table WHERE id = %(id)s LIMIT 1", dict(id=2)))
+
+    def test_prepare_update(self):
+        query = self.sqlify.prepare(
+            "update", self.table_name, data=dict(name=None, earned=IncreaseSQL(0)), where="id = %(id)s"
+        )
+        query(dict(id=1), data=dict(name="test", earned=IncreaseSQL(5)))
+
+        self.assertQuery(
+            "update test_table set name = %(name_datainput)s, earned = earned + %(earned_datainput)s "
+            "where id = %(id)s"
+        )
+        self.assertEqual(
+            self.cursor.execute.call_args[0][1],
+            dict(name_datainput="test", earned_datainput=5, id=1),
+        )
+
+    def test_prepare_server_side(self):
+        connection = mock.MagicMock()
+        self.cursor.connection = connection
+
+        query = self.sqlify.prepare(
+            "fetchall", self.table_name, where=["id = %(id)s", "name = %(name)s", "bonus > %(id)s"], server_side=True,
+        )
+        query(dict(id=1, name="a"))
+        query(dict(id=2, name="b"))
+
+        statements = [call[0] for call in self.cursor.execute.call_args_list]
+        self.assertEqual(
+            statements,
+            [
+                (f"PREPARE {query.name} AS SELECT * FROM test_table WHERE id = $1 AND name = $2 AND bonus > $1", ()),
+                (f"EXECUTE {query.name}(%s, %s)", [1, "a"]),
+                (f"EXECUTE {query.name}(%s, %s)", [2, "b"]),
+            ],
+        )
+
+    def test_prepare_server_side_once_per_connection(self):
+        connection = mock.MagicMock()
+        self.cursor.connection = connection
+        other = Psycopg2Sqlify(mock.MagicMock(connection=connection))
+
+        first = self.sqlify.prepare("fetchone", self.table_name, where="id = %(id)s", server_side=True)
+        second = other.prepare("fetchone", self.table_name, where="id = %(id)s", server_side=True)
+        first(dict(id=1))
+        second(dict(id=2))
+
+        self.assertEqual(first.name, second.name)
+        statements = [call[0][0] for call in self.cursor.execute.call_args_list + other._cursor.execute.call_args_list]
+        self.assertEqual(statements, [
+            f"PREPARE {first.name} AS SELECT * FROM test_table WHERE id = $1 LIMIT 1",
+            f"EXECUTE {first.name}(%s)",
+            f"EXECUTE {first.name}(%s)",
+        ])
+
+    def test_iterate_named_cursor(self):
+        stream = self.cursor.connection.cursor.return_value
+        stream.fetchmany.side_effect = [[(1,), (2,)], [(3,)], []]
+
+        rows = list(self.sqlify.iterate(self.table_name, fields="id", batch_size=2))
+
+        self.assertEqual(rows, [(1,), (2,), (3,)])
+        self.assertTrue(self.cursor.connection.cursor.call_args[1]["name"].startswith("sqlify_"))
+        stream.execute.assert_called_once_with("SELECT id FROM test_table", ())
+        stream.close.assert_called_once()
+
+    def test_paginate_with_cursor(self):
+        self.cursor.fetchmany.return_value = []
+        self.sqlify.paginate(
+            self.table_name,
+            key=["published", "id"],
+            where=("genre = %(genre)s", dict(genre="fiction")),
+            direction=Order.DESC,
+            page_size=10,
+            cursor=encode_cursor(["2020-01-01", 5]),
+        )
+
+        self.assertQuery(
+            "select * from {table} where genre = %(genre)s and (published, id) < (%(keyset_0)s, %(keyset_1)s) "
+            "order by published desc, id desc limit 11"
+        )
+        self.assertEqual(
+            self.cursor.execute.call_args[0][1],
+            dict(genre="fiction", keyset_0="2020-01-01", keyset_1=5),
+        )
+
+    def test_copy_expert(self):
+        self.cursor.mogrify.side_effect = lambda sql, parameters: sql.replace("%s", str(parameters[0])).encode()
+        file = mock.MagicMock()
+
+        self.sqlify.copy_expert(file, self.table_name, fields="bonus", where=("id > %s", [5]), order="id", limit=10)
+
+        self.cursor.copy_expert.assert_called_once_with(
+            "COPY (SELECT bonus FROM test_table WHERE id > 5 ORDER BY id LIMIT 10) TO STDOUT WITH (FORMAT csv, HEADER true)",
+            file,
+        )
+
+    def test_load_csv_header_columns(self):
+        self.sqlify.load(self.table_name, ["id,name\n", "1,test\n"])
+
+        query, file = self.cursor.copy_expert.call_args[0]
+        self.assertEqual(query, "COPY test_table (id, name) FROM STDIN WITH (FORMAT csv)")
+        self.assertEqual(file.read(), b"1,test\n")
+
+    def test_export_chunks_generator(self):
+        self.cursor.mogrify.side_effect = lambda sql, parameters: sql.encode()
+        stream = self.cursor.connection.cursor.return_value
+        stream.copy_expert.side_effect = lambda sql, file: [file.write(b"id\n"), file.write(b"1\n")]
+
+        chunks = self.sqlify.export(self.table_name, fields="id")
+
+        self.assertEqual(list(chunks), ["id\n", "1\n"])
+        stream.close.assert_called_once()
+
+    def test_upsert_default_update_fields(self):
+        self.sqlify.upsert(
+            self.table_name,
+            [dict(id=1, name="a", price=1), dict(id=2, name="b", price=2)],
+            conflict_target="id",
+            returning="id",
+        )
+
+        self.assertQuery(
+            "insert into {table} (id, name, price) values (%s, %s, %s), (%s, %s, %s) "
+            "on conflict (id) do update set name = excluded.name, price = excluded.price returning id"
+        )
+        self.assertEqual(self.cursor.execute.call_args[0][1], [1, "a", 1, 2, "b", 2])
+
+    def test_upsert_with_operators(self):
+        self.sqlify.upsert(
+            self.table_name,
+            [dict(sku="a", quantity=5)],
+            conflict_target=["sku"],
+            update_fields=dict(quantity=IncreaseSQL(5), modified=RawSQL("now()"), source="feed"),
+        )
+
+        self.assertQuery(
+            "insert into {table} (sku, quantity) values (%s, %s) on conflict (sku) do update set "
+            "quantity = test_table.quantity + %s, modified = now(), source = %s"
+        )
+        self.assertEqual(self.cursor.execute.call_args[0][1], ["a", 5, 5, "feed"])
+
+    def test_upsert_do_nothing(self):
+        self.sqlify.upsert(self.table_name, [dict(id=1)], conflict_target="id", update_fields=[])
+
+        self.assertQuery("insert into {table} (id) values (%s) on conflict (id) do nothing")
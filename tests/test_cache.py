@@ -0,0 +1,47 @@
+from unittest import TestCase, mock
+
+from sqlify import Psycopg2Sqlify, SqlCache
+
+
+class TestSqlCache(TestCase):
+    table_name = "test_table"
+
+    def setUp(self):
+        self.cache = SqlCache(maxsize=2)
+        self.sqlify = Psycopg2Sqlify(mock.MagicMock(), sql_cache=self.cache)
+
+    def test_repeated_shape_is_a_hit(self):
+        first = self.sqlify._select(self.table_name, fields=["id", "name"], where=["id = %s"], limit=1)
+        second = self.sqlify._select(self.table_name, fields=["id", "name"], where=["id = %s"], limit=1)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.stats["hits"], 1)
+        self.assertEqual(self.cache.stats["misses"], 1)
+
+    def test_least_recently_used_is_evicted(self):
+        self.sqlify._select(self.table_name, fields="a")
+        self.sqlify._select(self.table_name, fields="b")
+        self.sqlify._select(self.table_name, fields="a")
+        self.sqlify._select(self.table_name, fields="c")
+
+        self.assertEqual(self.cache.stats["evictions"], 1)
+        self.assertEqual(len(self.cache), 2)
+
+        self.sqlify._select(self.table_name, fields="a")
+        self.assertEqual(self.cache.stats["hits"], 2)
+
+    def test_unhashable_arguments(self):
+        sql = self.sqlify._select(self.table_name, fields="*", order=["id", "DESC"])
+
+        self.assertEqual(sql, "SELECT * FROM test_table ORDER BY id DESC")
+        self.assertEqual(self.sqlify._select(self.table_name, fields="*", order=["id", "DESC"]), sql)
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_disabled_cache(self):
+        self.cache.enabled = False
+        self.sqlify._select(self.table_name, fields="*")
+
+        self.assertEqual(len(self.cache), 0)
+
+        sqlify = Psycopg2Sqlify(mock.MagicMock(), sql_cache=None)
+        self.assertEqual(sqlify._select(self.table_name, fields="*"), "SELECT * FROM test_table")
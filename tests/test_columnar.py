@@ -0,0 +1,92 @@
+from array import array
+from unittest import TestCase, skipUnless
+
+from sqlify.columnar import fetch_arrays, numpy
+
+
+def batches(*batches):
+    pending = list(batches)
+    return lambda: pending.pop(0) if pending else []
+
+
+DESCRIPTION = (("id", None), ("name", None), ("price", None))
+
+
+class TestFetchArrays(TestCase):
+    def test_array_fallback(self):
+        result = fetch_arrays(
+            batches([(1, "a", 1.5), (2, "b", None)], [(3, "c", 2.5)]), lambda: DESCRIPTION, use_numpy=False
+        )
+
+        self.assertEqual(result["id"], array("q", [1, 2, 3]))
+        self.assertEqual(result["name"], ["a", "b", "c"])
+        self.assertEqual(result["price"][0], 1.5)
+        self.assertNotEqual(result["price"][1], result["price"][1])  # nan
+
+    def test_array_widens_integers_with_nulls(self):
+        result = fetch_arrays(batches([(1, "a", 1)], [(None, "b", "x")]), lambda: DESCRIPTION, use_numpy=False)
+
+        self.assertEqual(result["id"].typecode, "d")
+        self.assertEqual(result["price"], [1, "x"])
+
+    def test_dtype_overrides_and_dict_rows(self):
+        result = fetch_arrays(
+            batches([dict(id=1, name="a", price=1)], [dict(id=2, name="b", price=2)]),
+            lambda: DESCRIPTION,
+            dtypes=dict(id="int32", price="float32"),
+            use_numpy=False,
+        )
+
+        self.assertEqual(result["id"], array("i", [1, 2]))
+        self.assertEqual(result["price"], array("f", [1.0, 2.0]))
+
+    def test_given_dtypes_are_never_widened(self):
+        with self.assertRaises(ValueError):
+            fetch_arrays(batches([(1, "a", 1)], [(None, "b", 2)]), lambda: DESCRIPTION, dtypes=dict(id="int32"),
+                         use_numpy=False)
+
+        result = fetch_arrays(batches([(1, "a", None)]), lambda: DESCRIPTION, dtypes=dict(price="float32"),
+                              use_numpy=False)
+        self.assertEqual(result["price"].typecode, "f")
+
+    def test_empty_result(self):
+        result = fetch_arrays(batches(), lambda: DESCRIPTION, use_numpy=False)
+
+        self.assertEqual(result, dict(id=[], name=[], price=[]))
+
+    @skipUnless(numpy, "numpy is not installed")
+    def test_numpy_arrays(self):
+        result = fetch_arrays(
+            batches([(1, "a", 1.5), (2, "b", None)], [(3, "c", 2.5), (None, "d", 1.0)]),
+            lambda: DESCRIPTION,
+            dtypes=dict(price="float32"),
+            size=2,
+        )
+
+        self.assertEqual(result["id"].dtype, numpy.float64)
+        self.assertEqual(result["name"].tolist(), ["a", "b", "c", "d"])
+        self.assertEqual(result["price"].dtype, numpy.float32)
+        self.assertEqual(len(result["price"]), 4)
+
+    @skipUnless(numpy, "numpy is not installed")
+    def test_numpy_given_dtypes_are_never_widened(self):
+        for dtype in ("int32", "bool"):
+            with self.assertRaises(ValueError):
+                fetch_arrays(batches([(1, "a", True)], [(2, "b", None)]), lambda: DESCRIPTION,
+                             dtypes=dict(id="int32", price=dtype))
+
+    @skipUnless(numpy, "numpy is not installed")
+    def test_numpy_later_batches_widen_the_inferred_dtype(self):
+        description = lambda: (("value", None),)  # noqa: E731
+
+        floats = fetch_arrays(batches([(1,), (2,)], [(1.5,), (2.7,)]), description)["value"]
+        self.assertEqual(floats.dtype, numpy.float64)
+        self.assertEqual(floats.tolist(), [1.0, 2.0, 1.5, 2.7])
+
+        numbers = fetch_arrays(batches([(True,), (False,)], [(5,)]), description)["value"]
+        self.assertEqual(numbers.dtype, object)
+        self.assertEqual(numbers.tolist(), [True, False, 5])
+
+        large = fetch_arrays(batches([(1,)], [(2 ** 70,)]), description)["value"]
+        self.assertEqual(large.dtype, object)
+        self.assertEqual(large.tolist(), [1, 2 ** 70])
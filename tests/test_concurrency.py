@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from unittest import TestCase
+
+from sqlify import Session, SessionPool, Sqlite3Sqlify, ThreadLocalSqlify, parallel_fetch
+
+
+class TestConcurrency(TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        with Session(sqlite3.connect(self.path)) as sqlify:
+            sqlify.create("books", "id INTEGER PRIMARY KEY, price REAL")
+            sqlify.bulk_insert("books", (dict(id=i, price=i) for i in range(1, 11)))
+
+        self.pool = SessionPool(lambda: sqlite3.connect(self.path, check_same_thread=False), min_size=0, max_size=3)
+
+    def tearDown(self):
+        self.pool.close()
+        os.remove(self.path)
+
+    def test_parallel_fetch_keeps_the_order(self):
+        results = parallel_fetch(self.pool, [
+            ("fetchone", dict(table="books", fields="sum(price)")),
+            lambda sqlify: sqlify.fetchall("books", fields="id", where="id > 8", order="id"),
+            ("fetchone", dict(table="books", fields="count(*)")),
+        ])
+
+        self.assertEqual(results, [(55.0,), [(9,), (10,)], (10,)])
+        self.assertLessEqual(self.pool.size, 3)
+
+    def test_parallel_fetch_raises_the_first_failure(self):
+        with self.assertRaises(sqlite3.OperationalError):
+            self.pool.parallel_fetch([("fetchone", dict(table="books")), ("fetchone", dict(table="missing"))])
+
+        self.assertEqual(self.pool.parallel_fetch([]), [])
+
+    def test_thread_local_sqlify(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        sqlify = ThreadLocalSqlify(lambda: Sqlite3Sqlify(connection.cursor()))
+        cursors = {}
+
+        def read(name):
+            self.assertEqual(sqlify.fetchone("books", fields="count(*)"), (10,))
+            cursors[name] = sqlify.sqlify._cursor
+
+        threads = [threading.Thread(target=read, args=(name,)) for name in "ab"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        read("main")
+
+        self.assertEqual(len({id(cursor) for cursor in cursors.values()}), 3)
+        sqlify.close()
+        connection.close()
+
+    def test_session_thread_local(self):
+        with Session(sqlite3.connect(self.path, check_same_thread=False), thread_local=True) as sqlify:
+            self.assertIsInstance(sqlify, ThreadLocalSqlify)
+            self.assertEqual(sqlify.fetchone("books", fields="max(id)"), (10,))
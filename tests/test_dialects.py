@@ -0,0 +1,273 @@
+import io
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase, mock, skipUnless
+
+from sqlify import (
+    AsyncSession, DatabaseType, Dialect, DialectNotFound, DuckdbSqlify, Psycopg2Sqlify, Psycopg3Sqlify, Session,
+    Sqlite3Sqlify, detect_dialect, get_dialect, register_dialect,
+)
+from sqlify import dialects
+from sqlify.backends.duckdb import DuckdbCursor
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+class FakeConnection(object):
+    def cursor(self):
+        return mock.MagicMock()
+
+    def close(self):
+        pass
+
+
+class FakeDialect(Dialect):
+    name = "fake"
+    sqlify = Psycopg2Sqlify
+
+    def detect(self, connection):
+        return isinstance(connection, FakeConnection)
+
+
+class TestRegistry(TestCase):
+    def setUp(self):
+        self._registered = dict(dialects._dialects)
+
+    def tearDown(self):
+        dialects._dialects.clear()
+        dialects._dialects.update(self._registered)
+
+    def test_builtin_dialects(self):
+        self.assertIs(get_dialect(DatabaseType.SQLITE3).sqlify, Sqlite3Sqlify)
+        self.assertIs(get_dialect("psycopg3").sqlify, Psycopg3Sqlify)
+        self.assertIs(get_dialect("DUCKDB").sqlify, DuckdbSqlify)
+        self.assertIs(detect_dialect(sqlite3.connect(":memory:")), get_dialect("sqlite3"))
+
+    def test_unknown_dialect(self):
+        with self.assertRaises(DialectNotFound):
+            get_dialect("oracle")
+
+        with self.assertRaises(RuntimeError):
+            detect_dialect(FakeConnection())
+
+    def test_register_custom_dialect(self):
+        self.assertIs(register_dialect(FakeDialect), FakeDialect)
+
+        self.assertIsInstance(detect_dialect(FakeConnection()), FakeDialect)
+        self.assertIsInstance(Session(FakeConnection()).session, Psycopg2Sqlify)
+
+        with self.assertRaises(ValueError):
+            register_dialect(Dialect())
+
+    def test_later_dialects_take_over_a_driver(self):
+        class TracedSqlite(Dialect):
+            name = "traced_sqlite"
+            sqlify = Sqlite3Sqlify
+            connection_class = ("sqlite3", "Connection")
+
+        register_dialect(TracedSqlite)
+
+        self.assertIsInstance(detect_dialect(sqlite3.connect(":memory:")), TracedSqlite)
+
+    def test_entry_point_plugins(self):
+        good = mock.MagicMock()
+        good.load.return_value = FakeDialect
+        broken = mock.MagicMock()
+        broken.name = "broken"
+        broken.load.side_effect = ImportError("No module named sqlify_broken")
+
+        with mock.patch.object(dialects, "_plugins_loaded", False), \
+                mock.patch.object(dialects, "_entry_points", return_value=[broken, good]):
+            with self.assertWarns(RuntimeWarning):
+                dialects.load_plugins()
+            dialects.load_plugins()
+
+        good.load.assert_called_once()
+        self.assertIsInstance(get_dialect("fake"), FakeDialect)
+
+
+class TestSession(TestCase):
+    def test_explicit_database_type(self):
+        with Session(sqlite3.connect(":memory:"), database_type="sqlite3") as sqlify:
+            self.assertIsInstance(sqlify, Sqlite3Sqlify)
+
+        with self.assertRaises(DialectNotFound):
+            Session(sqlite3.connect(":memory:"), database_type="oracle")
+
+    def test_async_dialect_needs_async_session(self):
+        with self.assertRaises(ValueError):
+            Session(sqlite3.connect(":memory:"), database_type=DatabaseType.AIOSQLITE)
+
+        with self.assertRaises(ValueError):
+            AsyncSession(sqlite3.connect(":memory:"), database_type=DatabaseType.SQLITE3)
+
+
+class TestPsycopg3(TestCase):
+    def setUp(self):
+        self.cursor = mock.MagicMock()
+        self.sqlify = Psycopg3Sqlify(self.cursor)
+
+    def test_batch_runs_in_a_pipeline(self):
+        connection = self.cursor.connection
+        cursors = [mock.MagicMock(), mock.MagicMock()]
+        cursors[0].fetchone.return_value = (1, "a")
+        cursors[1].fetchall.return_value = [(1, "a"), (2, "b")]
+        connection.cursor.side_effect = cursors
+
+        with self.sqlify.batch() as batch:
+            book = batch.fetchone("books", where=("id = %s", [1]))
+            books = batch.fetchall("books")
+
+        connection.pipeline.assert_called_once()
+        cursors[0].execute.assert_called_once_with("SELECT * FROM books WHERE id = %s LIMIT 1", [1])
+        cursors[1].execute.assert_called_once_with("SELECT * FROM books", None)
+        self.assertEqual(book.result(), (1, "a"))
+        self.assertEqual(books.result(), [(1, "a"), (2, "b")])
+        for cur in cursors:
+            cur.close.assert_called_once()
+
+    def test_bulk_insert_executemany(self):
+        self.cursor.rowcount = 2
+
+        count = self.sqlify.bulk_insert("books", [dict(name="a"), dict(name="b")])
+
+        sql, values = self.cursor.executemany.call_args[0]
+        self.assertEqual(sql, "INSERT INTO books (name) VALUES (%s)")
+        self.assertEqual(list(values), [("a",), ("b",)])
+        self.assertEqual(count, 2)
+
+    def test_prepared_server_side(self):
+        query = self.sqlify.prepare("fetchone", "books", where="id = %s", server_side=True)
+
+        query([1])
+
+        self.cursor.execute.assert_called_once_with("SELECT * FROM books WHERE id = %s LIMIT 1", [1], prepare=True)
+
+
+class TestDuckdb(TestCase):
+    def setUp(self):
+        self.connection = mock.MagicMock()
+        self.sqlify = DuckdbSqlify(self.connection)
+
+    def test_named_parameters(self):
+        self.sqlify.update("books", dict(name="a"), where=("id = $id", dict(id=1)))
+
+        self.connection.execute.assert_called_once_with(
+            "UPDATE books SET name = $name_datainput WHERE id = $id", dict(id=1, name_datainput="a")
+        )
+
+    def test_rowcount_is_read_from_the_count_result(self):
+        cursor = DuckdbCursor(self.connection)
+        self.connection.fetchone.return_value = (3,)
+
+        self.assertEqual(cursor.execute("DELETE FROM books").rowcount, 3)
+        self.assertEqual(cursor.rowcount, 3)
+        self.connection.fetchone.assert_called_once()
+
+        self.assertEqual(cursor.execute("SELECT * FROM books").rowcount, -1)
+        self.assertEqual(cursor.execute("DELETE FROM books RETURNING id").rowcount, -1)
+
+    def test_savepoints_are_not_supported(self):
+        with self.assertRaises(NotImplementedError):
+            self.sqlify.savepoint()
+
+
+@skipUnless(duckdb, "duckdb is not installed")
+class TestDuckdbConnection(TestCase):
+    def setUp(self):
+        # Sessions close their connection, the rows are counted on a new one
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "books.duckdb")
+        self.connection = duckdb.connect(self.path)
+        self.connection.execute("CREATE TABLE books (id INTEGER, name VARCHAR)")
+
+    def tearDown(self):
+        self.connection.close()
+        self.directory.cleanup()
+
+    def count(self):
+        self.connection.close()
+        self.connection = duckdb.connect(self.path)
+        return self.connection.execute("SELECT count(*) FROM books").fetchone()[0]
+
+    def test_transaction_inside_a_session(self):
+        with Session(self.connection) as sqlify:
+            with sqlify.transaction():
+                sqlify.insert("books", dict(id=1, name="a"))
+            with self.assertRaises(KeyError):
+                with sqlify.transaction():
+                    sqlify.insert("books", dict(id=2, name="b"))
+                    raise KeyError
+            sqlify.insert("books", dict(id=3, name="c"))
+
+        self.assertEqual(self.count(), 2)
+
+    def test_session_rollback_after_transaction_blocks(self):
+        with self.assertRaises(KeyError):
+            with Session(self.connection) as sqlify:
+                with sqlify.transaction():
+                    sqlify.insert("books", dict(id=1, name="a"))
+                sqlify.insert("books", dict(id=2, name="b"))
+                raise KeyError
+
+        self.assertEqual(self.count(), 1)
+
+    def test_commit_every_inside_a_session(self):
+        with Session(self.connection) as sqlify:
+            with sqlify.commit_every(2) as batch:
+                for i in range(3):
+                    sqlify.insert("books", dict(id=i, name="a"))
+                    batch.step()
+
+        self.assertEqual(batch.commits, 2)
+        self.assertEqual(self.count(), 3)
+
+    def test_transaction_without_a_session(self):
+        sqlify = DuckdbSqlify(self.connection)
+
+        with self.assertRaises(KeyError):
+            with sqlify.transaction():
+                sqlify.insert("books", dict(id=1, name="a"))
+                raise KeyError
+        with sqlify.transaction():
+            sqlify.insert("books", dict(id=2, name="b"))
+
+        self.assertEqual(self.count(), 1)
+        self.assertFalse(DuckdbCursor(self.connection).in_transaction)
+
+    def test_streams_see_the_session_transaction(self):
+        with Session(self.connection) as sqlify:
+            sqlify.create("authors", "id INTEGER, name VARCHAR")
+            sqlify.bulk_insert("authors", [dict(id=1, name="a"), dict(id=2, name="b")])
+
+            self.assertEqual(list(sqlify.iterate("authors", order="id")), [(1, "a"), (2, "b")])
+            self.assertEqual(sqlify.export("authors", fields="name", order="id", file=io.StringIO()), 2)
+            self.assertEqual(list(sqlify.fetch_arrays("authors", order="id")["id"]), [1, 2])
+
+            rows = sqlify.iterate("authors", order="id", batch_size=1)
+            next(rows)
+            with self.assertRaises(RuntimeError):
+                sqlify.fetchone("authors")
+            rows.close()
+            self.assertEqual(sqlify.fetchone("authors", fields="count(*)"), (2,))
+
+    def test_streams_outside_transactions_use_a_cursor(self):
+        sqlify = DuckdbSqlify(self.connection)
+        sqlify.insert("books", dict(id=1, name="a"))
+
+        rows = sqlify.iterate("books")
+        self.assertEqual(sqlify.fetchone("books", fields="count(*)"), (1,))
+        self.assertEqual(list(rows), [(1, "a")])
+
+    def test_transaction_statements_are_tracked(self):
+        cursor = DuckdbCursor(self.connection)
+
+        cursor.execute("BEGIN TRANSACTION")
+        self.assertTrue(cursor.in_transaction)
+        cursor.execute("ROLLBACK")
+        self.assertFalse(cursor.in_transaction)
+        cursor.rollback()
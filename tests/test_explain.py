@@ -0,0 +1,169 @@
+import sqlite3
+from unittest import TestCase, mock
+
+from sqlify import Psycopg2Sqlify, Sqlite3Sqlify, QueryPlan
+
+POSTGRES_PLAN = [{
+    "Plan": {
+        "Node Type": "Hash Join", "Total Cost": 420.5, "Plan Rows": 10, "Actual Rows": 10, "Actual Loops": 1,
+        "Actual Total Time": 12.5,
+        "Plans": [
+            {"Node Type": "Seq Scan", "Relation Name": "books", "Total Cost": 400.0, "Plan Rows": 10,
+             "Actual Rows": 10, "Actual Loops": 1, "Rows Removed by Filter": 49990, "Actual Total Time": 11.0},
+            {"Node Type": "Index Scan", "Relation Name": "authors", "Index Name": "authors_pkey", "Total Cost": 8.3,
+             "Plan Rows": 1, "Actual Rows": 1, "Actual Loops": 10, "Actual Total Time": 0.01},
+        ],
+    },
+    "Planning Time": 0.2,
+    "Execution Time": 12.9,
+}]
+
+
+class TestSqliteExplain(TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:")
+        self.sqlify = Sqlite3Sqlify(self.connection.cursor())
+        self.sqlify.create("books", "id INTEGER PRIMARY KEY, name TEXT, genre TEXT, author_id INTEGER")
+        self.sqlify.create("authors", "id INTEGER PRIMARY KEY, name TEXT")
+        self.sqlify.execute("CREATE INDEX books_genre ON books (genre)")
+        self.sqlify.bulk_insert(
+            "books", (dict(id=i, name=f"Book {i}", genre="fiction", author_id=i % 10) for i in range(100))
+        )
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_full_scans_of_large_tables_are_flagged(self):
+        plan = self.sqlify.explain("fetchall", "books", where=("name = :name", dict(name="Book 1")),
+                                   large_table_rows=100)
+
+        self.assertIsInstance(plan, QueryPlan)
+        self.assertEqual(plan.sql, "SELECT * FROM books WHERE name = :name")
+        self.assertEqual(plan.params, dict(name="Book 1"))
+        self.assertEqual([(node.operation, node.table) for node in plan.seq_scans], [("SCAN", "books")])
+        self.assertEqual(plan.table_rows, dict(books=100))
+        self.assertIn("full scan of 100 rows", str(plan))
+
+        plan = self.sqlify.explain("fetchall", "books", where=("name = :name", dict(name="Book 1")))
+        self.assertEqual(plan.seq_scans, [])
+
+    def test_table_rows_are_bounded_or_read_from_the_statistics(self):
+        plan = self.sqlify.explain("fetchall", "books", where=("name = :name", dict(name="Book 1")),
+                                   large_table_rows=10)
+        self.assertEqual(plan.table_rows, dict(books=11))
+        self.assertEqual(len(plan.seq_scans), 1)
+
+        self.sqlify.execute("ANALYZE")
+        self.sqlify.bulk_insert("books", (dict(id=i, name=f"Book {i}") for i in range(100, 150)))
+        plan = self.sqlify.explain("fetchall", "books", where=("name = :name", dict(name="Book 1")),
+                                   large_table_rows=10)
+        # The statistics of the last ANALYZE, before the new rows
+        self.assertEqual(plan.table_rows, dict(books=100))
+
+    def test_index_reads(self):
+        plan = self.sqlify.explain("fetchone", "books", where=("genre = :genre", dict(genre="fiction")),
+                                   large_table_rows=1)
+
+        node = plan.nodes[0]
+        self.assertEqual((node.operation, node.table, node.index, node.full_scan),
+                         ("SEARCH", "books", "books_genre", False))
+        self.assertEqual(plan.seq_scans, [])
+
+    def test_aliased_joins(self):
+        plan = self.sqlify.explain(
+            "fetchall", "books b JOIN authors a ON a.id = b.author_id", fields=["a.name", "count(*)"],
+            group="a.name", large_table_rows=1,
+        )
+
+        self.assertEqual(plan.tables(), ["books", "authors"])
+        self.assertEqual([node.table for node in plan.seq_scans], ["books"])
+
+    def test_writes_are_planned_without_running_them(self):
+        plan = self.sqlify.explain("update", "books", data=dict(name="New"),
+                                   where=("genre = :genre", dict(genre="fiction")), large_table_rows=1)
+        self.assertEqual(plan.params, dict(name_datainput="New", genre="fiction"))
+        self.assertEqual(plan.seq_scans, [])
+
+        self.sqlify.explain("delete", "books", where=("id > :id", dict(id=0)))
+        self.assertEqual(self.sqlify.fetchone("books", fields="count(*) AS total", where="name = 'Book 1'"), (1,))
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            self.sqlify.explain("insert", "books")
+
+    def test_sampler_captures_slow_queries_once(self):
+        sampler = self.sqlify.sample_plans(threshold=0, large_table_rows=100)
+
+        with self.assertLogs("sqlify", level="WARNING") as logs:
+            first = self.sqlify.fetchall("books", where=("name = :name", dict(name="Book 1")))
+            self.sqlify.fetchall("books", where=("name = :name", dict(name="Book 2")))
+        self.sqlify.commit()
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(list(sampler.plans), ["SELECT * FROM books WHERE name = :name"])
+        self.assertEqual(len(sampler.plans["SELECT * FROM books WHERE name = :name"].seq_scans), 1)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("full scans of books", logs.output[0])
+
+    def test_sampler_skips_fast_queries(self):
+        sampler = self.sqlify.sample_plans(threshold=60)
+        self.sqlify.fetchall("books")
+        self.assertEqual(sampler.plans, {})
+
+
+class TestPostgresExplain(TestCase):
+    def setUp(self):
+        self.connection = mock.MagicMock()
+        self.connection.autocommit = False
+        self.explain_cursor = self.connection.cursor.return_value
+        self.explain_cursor.fetchone.return_value = (POSTGRES_PLAN,)
+        self.explain_cursor.fetchall.return_value = [("books", 50000.0), ("authors", -1.0)]
+
+        self.cursor = mock.MagicMock()
+        self.cursor.connection = self.connection
+        self.sqlify = Psycopg2Sqlify(self.cursor)
+
+    def test_analyzed_plan(self):
+        plan = self.sqlify.explain("fetchall", "books", where=("name = %(name)s", dict(name="Book 1")))
+
+        self.assertEqual(
+            self.explain_cursor.execute.call_args_list[0],
+            mock.call("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) SELECT * FROM books WHERE name = %(name)s",
+                      dict(name="Book 1")),
+        )
+        self.assertEqual(self.explain_cursor.execute.call_args_list[1][0][1], [["books", "authors"]])
+        self.cursor.execute.assert_not_called()
+
+        self.assertEqual((plan.planning_time, plan.execution_time), (0.2, 12.9))
+        self.assertEqual(plan.table_rows, dict(books=50000.0))
+        self.assertEqual([node.table for node in plan.seq_scans], ["books"])
+
+        join, scan, index = plan.walk()
+        self.assertEqual(join.operation, "Hash Join")
+        self.assertEqual((index.table, index.index, index.actual_rows, index.full_scan),
+                         ("authors", "authors_pkey", 10, False))
+        self.assertEqual(str(index), "Index Scan on authors using authors_pkey (rows=1 actual=10)")
+
+    def test_scanned_rows_when_the_table_was_never_analyzed(self):
+        self.explain_cursor.fetchall.return_value = [("books", -1.0), ("authors", -1.0)]
+
+        plan = self.sqlify.explain("fetchall", "books")
+        self.assertEqual(plan.table_rows, dict(books=50000))
+
+    def test_analyzed_writes_are_rolled_back(self):
+        self.sqlify.explain("delete", "books", where=("id = %(id)s", dict(id=1)))
+
+        self.assertEqual(self.explain_cursor.execute.call_args_list[0][0][0],
+                         "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) DELETE FROM books WHERE id = %(id)s")
+        self.assertEqual(
+            [call[0][0] for call in self.cursor.execute.call_args_list],
+            ["SAVEPOINT sqlify_savepoint_1", "ROLLBACK TO SAVEPOINT sqlify_savepoint_1",
+             "RELEASE SAVEPOINT sqlify_savepoint_1"],
+        )
+
+    def test_plans_without_analyze(self):
+        self.sqlify.explain("update", "books", data=dict(name="New"), analyze=False)
+
+        self.assertEqual(self.explain_cursor.execute.call_args_list[0][0][0],
+                         "EXPLAIN (FORMAT JSON) UPDATE books SET name = %(name_datainput)s")
+        self.cursor.execute.assert_not_called()
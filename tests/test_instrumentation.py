@@ -0,0 +1,96 @@
+import sqlite3
+from unittest import TestCase, mock
+
+from sqlify import Sqlite3Sqlify, QueryHook, SlowQueryLog, LatencyHistogram
+
+
+class RecordingHook(QueryHook):
+    def __init__(self):
+        self.before_calls = []
+        self.events = []
+
+    def before(self, sql, params):
+        self.before_calls.append((sql, params))
+
+    def after(self, event):
+        self.events.append(event)
+
+
+class TestInstrumentation(TestCase):
+    table_name = "books"
+
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:")
+        self.hook = RecordingHook()
+        self.sqlify = Sqlite3Sqlify(self.connection.cursor(), hooks=[self.hook])
+        self.sqlify.create(self.table_name, "id INTEGER PRIMARY KEY, name TEXT")
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_hooks_receive_query_details(self):
+        self.sqlify.bulk_insert(self.table_name, [dict(id=1, name="a"), dict(id=2, name="b")])
+        self.sqlify.update(self.table_name, data=dict(name="c"), where=("id > :id", dict(id=0)))
+
+        event = self.hook.events[-1]
+        self.assertEqual(event.sql, "UPDATE books SET name = :name_datainput WHERE id > :id")
+        self.assertEqual(event.params, dict(name_datainput="c", id=0))
+        self.assertEqual(event.rowcount, 2)
+        self.assertGreaterEqual(event.duration, 0)
+        self.assertIsNone(event.exception)
+        self.assertEqual(len(self.hook.before_calls), len(self.hook.events))
+
+    def test_hooks_receive_exceptions(self):
+        with self.assertRaises(sqlite3.OperationalError):
+            self.sqlify.fetchall("missing_table")
+
+        self.assertIsInstance(self.hook.events[-1].exception, sqlite3.OperationalError)
+        self.assertEqual(self.hook.events[-1].rowcount, -1)
+
+    def test_slow_query_log(self):
+        logger = mock.MagicMock()
+        slow = SlowQueryLog(threshold=0, logger=logger)
+        self.sqlify.add_hook(slow)
+
+        self.sqlify.fetchall(self.table_name)
+        self.sqlify.remove_hook(slow)
+        self.sqlify.fetchall(self.table_name)
+
+        self.assertEqual([event.sql for event in slow.entries], ["SELECT * FROM books"])
+        logger.warning.assert_called_once()
+
+    def test_latency_histogram(self):
+        histogram = LatencyHistogram(max_samples=5)
+        self.sqlify.add_hook(histogram)
+
+        for i in range(10):
+            self.sqlify.fetchone(self.table_name, where=("id = ?", [i]))
+        self.sqlify.fetchall(self.table_name)
+
+        stats = histogram.stats()
+        shape = stats["SELECT * FROM books WHERE id = ? LIMIT 1"]
+        self.assertEqual(shape["count"], 10)
+        self.assertLessEqual(shape["p50"], shape["p95"])
+        self.assertLessEqual(shape["p99"], shape["max"])
+        self.assertEqual(stats["SELECT * FROM books"]["count"], 1)
+
+    def test_latency_histogram_keeps_the_recent_shapes(self):
+        histogram = LatencyHistogram(max_shapes=2)
+        self.sqlify.add_hook(histogram)
+
+        for i in range(3):
+            self.sqlify.execute(f"SELECT * FROM books WHERE id = {i}")
+        self.sqlify.execute("SELECT * FROM books WHERE id = 1")
+        self.sqlify.execute("SELECT * FROM books WHERE id = 3")
+
+        self.assertEqual(sorted(histogram.stats()), ["SELECT * FROM books WHERE id = 1", "SELECT * FROM books WHERE id = 3"])
+        self.assertEqual(histogram.stats()["SELECT * FROM books WHERE id = 1"]["count"], 2)
+        self.assertEqual(histogram.evictions, 2)
+
+    def test_logger_is_used(self):
+        logger = mock.MagicMock()
+        sqlify = Sqlite3Sqlify(self.connection.cursor(), logger)
+
+        sqlify.fetchall(self.table_name)
+
+        logger.debug.assert_called_once()
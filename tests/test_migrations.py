@@ -0,0 +1,317 @@
+import os
+import sqlite3
+import tempfile
+from functools import partial
+from unittest import TestCase, mock
+
+from sqlify import Migrations, Session, Sqlite3Sqlify
+from sqlify.exceptions import MigrationDependencyException, MigrationTargetsFailed
+from sqlify.manifest import MigrationDrift, MigrationManifest, checksum
+
+
+class TestMigrations(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+        self.connection = sqlite3.connect(os.path.join(self.path, "main.db"))
+        self.migrations_path = os.path.join(self.path, "migrations")
+        self.migrations = Migrations(self.migrations_path, Sqlite3Sqlify(self.connection.cursor()))
+
+    def tearDown(self):
+        self.connection.close()
+        self.directory.cleanup()
+
+    def write(self, filename: str, sql: str, age: int = 0) -> None:
+        os.makedirs(self.migrations_path, exist_ok=True)
+        path = os.path.join(self.migrations_path, filename)
+        with open(path, "w") as f:
+            f.write(sql)
+        if age:
+            modified = os.stat(path).st_mtime - age
+            os.utime(path, (modified, modified))
+
+    def tables(self, connection: sqlite3.Connection):
+        rows = connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name != 'db_migrations' "
+                                  "AND name NOT LIKE 'sqlite_%'")
+        return sorted(name for (name,) in rows)
+
+    def test_migrate_in_a_single_transaction(self):
+        self.write("0001_20220118_1148.sql", "-- Migration number: 1\nBEGIN;\n\nCREATE TABLE books (id integer);\n"
+                                             "CREATE TABLE authors (name text default 'a;b');\n\nCOMMIT;\n")
+        self.write("0002_20220118_1149.sql", "BEGIN;\nINSERT INTO books (id) VALUES (1);\nCOMMIT;\n")
+        self.write("0003_20220118_1150.sql", "-- Migration number: 3\nBEGIN;\n\n\n\nCOMMIT;\n")
+        progress = []
+
+        applied = self.migrations.migrate(progress=lambda *args: progress.append(args))
+
+        self.assertEqual(applied, ["0001_20220118_1148.sql", "0002_20220118_1149.sql", "0003_20220118_1150.sql"])
+        self.assertEqual(progress[-1], ("0003_20220118_1150.sql", 3, 3))
+        self.assertEqual(self.tables(self.connection), ["authors", "books"])
+        self.assertEqual(self.migrations.applied_migrations(),
+                         {"0001_20220118_1148", "0002_20220118_1149", "0003_20220118_1150"})
+        self.assertEqual(self.migrations.discover_migrations(), [])
+        self.assertEqual(self.migrations.migrate(), [])
+
+    def test_failure_rolls_back_every_migration(self):
+        self.write("0001_20220118_1148.sql", "CREATE TABLE books (id integer);")
+        self.write("0002_20220118_1149.sql", "INSERT INTO missing (id) VALUES (1);")
+        progress = []
+
+        with self.assertRaises(sqlite3.OperationalError):
+            self.migrations.migrate(progress=lambda *args: progress.append(args))
+
+        self.assertEqual(progress, [])
+
+        self.assertEqual(self.tables(self.connection), [])
+        self.assertEqual(len(self.migrations.discover_migrations()), 2)
+
+    def test_dependencies_run_first(self):
+        self.write("0001_20220118_1148.sql", "-- depends: 0002_20220118_1149\nCREATE VIEW v AS SELECT id FROM books;")
+        self.write("0002_20220118_1149.sql", "CREATE TABLE books (id integer);")
+
+        self.assertEqual(self.migrations.migrate(), ["0002_20220118_1149.sql", "0001_20220118_1148.sql"])
+
+    def test_missing_and_circular_dependencies(self):
+        self.write("0001_20220118_1148.sql", "-- depends: 0009_20220118_1149.sql\nSELECT 1;")
+
+        with self.assertRaises(MigrationDependencyException):
+            self.migrations.migrate()
+
+        self.write("0001_20220118_1148.sql", "-- depends: 0002_20220118_1149\nSELECT 1;")
+        self.write("0002_20220118_1149.sql", "-- depends: 0001_20220118_1148\nSELECT 1;")
+
+        with self.assertRaises(MigrationDependencyException):
+            self.migrations.migrate()
+
+    def test_migrate_many(self):
+        self.write("0001_20220118_1148.sql", "CREATE TABLE books (id integer);")
+        self.write("0002_20220118_1149.sql", "CREATE TABLE authors (id integer);")
+        databases = {tenant: os.path.join(self.path, f"{tenant}.db") for tenant in ("a", "b", "c")}
+        progress = []
+
+        applied = self.migrations.migrate_many(
+            {tenant: lambda path=path: Session(sqlite3.connect(path)) for tenant, path in databases.items()},
+            workers=2,
+            progress=lambda *args: progress.append(args),
+        )
+
+        self.assertEqual(applied, {tenant: ["0001_20220118_1148.sql", "0002_20220118_1149.sql"]
+                                   for tenant in databases})
+        self.assertEqual(len(progress), 6)
+        for path in databases.values():
+            connection = sqlite3.connect(path)
+            self.assertEqual(self.tables(connection), ["authors", "books"])
+            connection.close()
+
+    def test_migrate_many_reports_failed_targets(self):
+        self.write("0001_20220118_1148.sql", "CREATE TABLE books (id integer);")
+        broken = os.path.join(self.path, "broken.db")
+        connection = sqlite3.connect(broken)
+        connection.execute("CREATE TABLE books (id integer)")
+        connection.commit()
+        connection.close()
+
+        with self.assertRaises(MigrationTargetsFailed) as raised:
+            self.migrations.migrate_many({
+                "ok": partial(lambda path: Session(sqlite3.connect(path)), os.path.join(self.path, "ok.db")),
+                "broken": partial(lambda path: Session(sqlite3.connect(path)), broken),
+            })
+
+        self.assertEqual(list(raised.exception.failures), ["broken"])
+        self.assertEqual(raised.exception.applied, {"ok": ["0001_20220118_1148.sql"]})
+
+    def test_migrate_many_reports_how_far_failed_targets_got(self):
+        rows = ", ".join(f"({i}, {i})" for i in range(1, 26))
+        self.write("0001_20220118_1148.sql", f"CREATE TABLE books (id integer primary key, price integer);\n"
+                                             f"INSERT INTO books (id, price) VALUES {rows};\n"
+                                             "CREATE TRIGGER interrupt BEFORE UPDATE ON books WHEN NEW.id = 15 "
+                                             "BEGIN SELECT RAISE(ABORT, 'stop'); END;")
+        self.write("0002_20220118_1149.py", "from sqlify import Backfill\n\n"
+                                            "migration = Backfill(table='books', set='price = price + 1', batch_size=10)\n")
+        path = os.path.join(self.path, "tenant.db")
+
+        with self.assertRaises(MigrationTargetsFailed) as raised:
+            self.migrations.migrate_many({"tenant": lambda: Session(sqlite3.connect(path))})
+
+        self.assertEqual(raised.exception.completed, {"tenant": ["0001_20220118_1148.sql"]})
+        self.assertEqual(raised.exception.backfills,
+                         {"tenant": ("0002_20220118_1149.py", dict(after=10, rows=10, done=False))})
+
+    def test_checksums_are_stored(self):
+        self.write("0001_20220118_1148.sql", "CREATE TABLE books (id integer);")
+        self.write("0002_20220118_1149.sql", "CREATE TABLE authors (id integer);")
+
+        self.migrations.migrate(["0001_20220118_1148.sql"])
+        self.migrations.apply_migration("0002_20220118_1149.sql", fake=True)
+
+        self.assertEqual(
+            self.connection.execute("SELECT name, checksum FROM db_migrations ORDER BY id").fetchall(),
+            [
+                ("0001_20220118_1148", checksum("CREATE TABLE books (id integer);")),
+                ("0002_20220118_1149", checksum("CREATE TABLE authors (id integer);")),
+            ],
+        )
+
+    def test_verify_reports_drift(self):
+        self.write("0001_20220118_1148.sql", "CREATE TABLE books (id integer);")
+        self.write("0002_20220118_1149.sql", "CREATE TABLE authors (id integer);")
+        self.write("0003_20220118_1150.sql", "CREATE TABLE genres (id integer);")
+        self.migrations.migrate()
+        self.assertEqual(self.migrations.verify(), [])
+
+        self.write("0001_20220118_1148.sql", "CREATE TABLE books (id integer, name text);")
+        os.remove(os.path.join(self.migrations_path, "0003_20220118_1150.sql"))
+
+        self.assertEqual(self.migrations.verify(), [
+            MigrationDrift("0001_20220118_1148", MigrationDrift.CHANGED, checksum("CREATE TABLE books (id integer);"),
+                           checksum("CREATE TABLE books (id integer, name text);")),
+            MigrationDrift("0003_20220118_1150", MigrationDrift.MISSING, checksum("CREATE TABLE genres (id integer);"),
+                           None),
+        ])
+
+    def test_manifest_only_reads_changed_files(self):
+        self.write("0001_20220118_1148.sql", "CREATE TABLE books (id integer);", age=60)
+        self.write("0002_20220118_1149.sql", "CREATE TABLE authors (id integer);", age=60)
+        self.write("0003_20220118_1150.sql", "CREATE TABLE genres (id integer);")
+
+        manifest = ".sqlify-manifest.json"
+        self.migrations.checksums()
+        # The manifest file is opt-in
+        self.assertFalse(os.path.exists(os.path.join(self.migrations_path, manifest)))
+
+        stored = Migrations(self.migrations_path, Sqlite3Sqlify(self.connection.cursor()), manifest_path=manifest)
+        first = stored.checksums()
+        self.assertTrue(os.path.exists(os.path.join(self.migrations_path, manifest)))
+
+        with mock.patch("sqlify.manifest.checksum", side_effect=checksum) as hashed:
+            # A new instance, the index is loaded from the manifest file
+            migrations = Migrations(self.migrations_path, Sqlite3Sqlify(self.connection.cursor()),
+                                    manifest_path=manifest)
+            self.assertEqual(migrations.checksums(), first)
+
+        # The recently modified file isn't trusted to the index yet
+        self.assertEqual(hashed.call_count, 1)
+        self.assertEqual(len(migrations.discover_migrations()), 3)
+
+    def test_corrupt_or_unwritable_manifest(self):
+        self.write("0001_20220118_1148.sql", "CREATE TABLE books (id integer);", age=60)
+        with open(os.path.join(self.migrations_path, ".sqlify-manifest.json"), "w") as f:
+            f.write("{not json")
+
+        migrations = Migrations(self.migrations_path, Sqlite3Sqlify(self.connection.cursor()),
+                                manifest_path=".sqlify-manifest.json")
+        self.assertEqual(migrations.checksums(), {
+            "0001_20220118_1148.sql": checksum("CREATE TABLE books (id integer);")
+        })
+
+        manifest = MigrationManifest(os.path.join(self.path, "missing", "manifest.json"))
+        self.assertEqual(manifest.checksums(self.migrations_path, ["0001_20220118_1148.sql"]), {
+            "0001_20220118_1148.sql": checksum("CREATE TABLE books (id integer);")
+        })
+
+    def test_checksum_column_is_added_to_existing_tables(self):
+        connection = sqlite3.connect(":memory:")
+        connection.execute("CREATE TABLE db_migrations (id integer primary key autoincrement, name text, "
+                           "applied_at timestamp default CURRENT_TIMESTAMP not null)")
+        connection.execute("INSERT INTO db_migrations (name) VALUES ('0001_20220118_1148')")
+        self.write("0001_20220118_1148.sql", "CREATE TABLE books (id integer);")
+
+        migrations = Migrations(self.migrations_path, Sqlite3Sqlify(connection.cursor()))
+
+        self.assertEqual(migrations.applied_migrations(), {"0001_20220118_1148"})
+        self.assertEqual(migrations.verify(), [])
+        connection.close()
+
+
+class TestBackfill(TestCase):
+    backfill = (
+        "from sqlify import Backfill\n\n"
+        "migration = Backfill(table='books', set='price = price + 1', batch_size=10, sleep=0.5)\n"
+    )
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.migrations_path = self.directory.name
+        self.connection = sqlite3.connect(":memory:")
+        self.connection.execute("CREATE TABLE books (id integer primary key, price integer)")
+        self.connection.executemany("INSERT INTO books (id, price) VALUES (?, ?)", [(i, i) for i in range(1, 26)])
+        self.connection.commit()
+        self.migrations = Migrations(self.migrations_path, Sqlite3Sqlify(self.connection.cursor()), manifest_path=None)
+
+    def tearDown(self):
+        self.connection.close()
+        self.directory.cleanup()
+
+    def write(self, filename: str, source: str) -> None:
+        with open(os.path.join(self.migrations_path, filename), "w") as f:
+            f.write(source)
+
+    def prices(self):
+        return [price for (price,) in self.connection.execute("SELECT price FROM books ORDER BY id")]
+
+    def test_backfill_in_batches(self):
+        self.write("0001_20220118_1148.sql", "ALTER TABLE books ADD COLUMN name text;")
+        self.write("0002_20220118_1149.py", self.backfill)
+        self.write("0003_20220118_1150.sql", "UPDATE books SET name = 'book';")
+
+        with mock.patch("sqlify.backfill.time.sleep") as sleep:
+            applied = self.migrations.migrate()
+
+        self.assertEqual(applied, ["0001_20220118_1148.sql", "0002_20220118_1149.py", "0003_20220118_1150.sql"])
+        self.assertEqual(self.prices(), list(range(2, 27)))
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(self.migrations.applied_migrations(),
+                         {"0001_20220118_1148", "0002_20220118_1149", "0003_20220118_1150"})
+        self.assertEqual(self.migrations.verify(), [])
+
+    def test_interrupted_backfill_resumes(self):
+        self.write("0001_20220118_1148.py", self.backfill)
+        self.connection.execute(
+            "CREATE TRIGGER interrupt BEFORE UPDATE ON books WHEN NEW.id = 15 BEGIN SELECT RAISE(ABORT, 'stop'); END"
+        )
+
+        with mock.patch("sqlify.backfill.time.sleep"):
+            with self.assertRaises(sqlite3.IntegrityError):
+                self.migrations.migrate()
+
+            self.assertEqual(self.prices(), list(range(2, 12)) + list(range(11, 26)))
+            self.assertEqual(self.migrations.applied_migrations(), set())
+            self.assertEqual(self.migrations.discover_migrations(), ["0001_20220118_1148.py"])
+
+            self.connection.execute("DROP TRIGGER interrupt")
+            self.migrations.migrate()
+
+        # Each row was updated once
+        self.assertEqual(self.prices(), list(range(2, 27)))
+        self.assertEqual(self.migrations.applied_migrations(), {"0001_20220118_1148"})
+
+    def test_backfill_key_range(self):
+        self.write("0001_20220118_1148.py", "from sqlify import Backfill\n\n"
+                                            "migration = Backfill('books', 'price = 0', start=5, end=20, batch_size=4)\n")
+
+        self.migrations.apply_migration("0001_20220118_1148.py")
+
+        self.assertEqual(self.prices(), list(range(1, 5)) + [0] * 16 + list(range(21, 26)))
+
+    def test_fake_backfill(self):
+        self.write("0001_20220118_1148.py", self.backfill)
+
+        self.migrations.migrate(fake=True)
+
+        self.assertEqual(self.prices(), list(range(1, 26)))
+        self.assertEqual(self.migrations.applied_migrations(), {"0001_20220118_1148"})
+
+    def test_python_migration_without_backfill(self):
+        self.write("0001_20220118_1148.py", "migration = None\n")
+
+        with self.assertRaises(TypeError):
+            self.migrations.migrate()
+
+        self.assertEqual(self.connection.execute("SELECT count(*) FROM db_migrations").fetchone(), (0,))
+
+    def test_make_backfill_migration(self):
+        path = self.migrations.make_migration(backfill=True)
+
+        self.assertTrue(path.endswith(".py"))
+        with open(path) as f:
+            self.assertIn("migration = Backfill(", f.read())
@@ -0,0 +1,94 @@
+import sqlite3
+import threading
+import time
+from unittest import TestCase
+
+from sqlify import SessionPool, PoolTimeout
+
+
+class TestSessionPool(TestCase):
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        connection = sqlite3.connect(":memory:", check_same_thread=False)
+        self.opened.append(connection)
+        return connection
+
+    def test_connection_is_reused(self):
+        pool = SessionPool(self.connect, min_size=0, max_size=2)
+
+        with pool.session() as sqlify:
+            sqlify.execute("CREATE TABLE books (id integer)")
+        with pool.session() as sqlify:
+            sqlify.insert("books", data=dict(id=1))
+            self.assertEqual(sqlify.fetchone("books", fields="count(*)"), (1,))
+
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(pool.idle, 1)
+
+    def test_transaction_is_reset_on_release(self):
+        pool = SessionPool(self.connect, min_size=1, max_size=1, autocommit=False)
+
+        with pool.session() as sqlify:
+            sqlify.execute("CREATE TABLE books (id integer)")
+            sqlify.commit()
+            sqlify.insert("books", data=dict(id=1))
+
+        with pool.session() as sqlify:
+            self.assertEqual(sqlify.fetchone("books", fields="count(*)"), (0,))
+
+    def test_closed_connection_is_replaced(self):
+        pool = SessionPool(self.connect, min_size=1, max_size=1)
+        self.opened[0].close()
+
+        with pool.session() as sqlify:
+            self.assertEqual(sqlify.fetchone("sqlite_master", fields="count(*)"), (0,))
+
+        self.assertEqual(len(self.opened), 2)
+        self.assertEqual(pool.size, 1)
+
+    def test_max_lifetime(self):
+        pool = SessionPool(self.connect, min_size=0, max_size=1, max_lifetime=0)
+
+        with pool.session():
+            pass
+
+        self.assertEqual(pool.size, 0)
+        self.assertEqual(pool.idle, 0)
+
+    def test_timeout_when_exhausted(self):
+        pool = SessionPool(self.connect, min_size=0, max_size=1, timeout=0.01)
+        session = pool.session()
+
+        with self.assertRaises(PoolTimeout):
+            pool.session()
+
+        session.close()
+        pool.session().close()
+
+    def test_concurrent_checkouts(self):
+        pool = SessionPool(self.connect, min_size=0, max_size=3)
+        in_use = []
+        peak = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(20):
+                with pool.session():
+                    with lock:
+                        in_use.append(1)
+                        peak.append(len(in_use))
+                    time.sleep(0.001)
+                    with lock:
+                        in_use.pop()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLessEqual(max(peak), 3)
+        self.assertLessEqual(len(self.opened), 3)
+        self.assertEqual(pool.size, pool.idle)
@@ -0,0 +1,100 @@
+from unittest import TestCase, mock
+
+from sqlify import Psycopg2Sqlify, SqlCache, Sqlite3Sqlify
+from sqlify.operators import DecreaseSQL, IncreaseSQL, RawSQL
+from sqlify.query import Assignment, Select, Update, assignments
+from sqlify.value_objects import Order
+
+
+class TestQueryNodes(TestCase):
+    table_name = "test_table"
+
+    def setUp(self):
+        self.cache = SqlCache()
+        self.sqlify = Psycopg2Sqlify(mock.MagicMock(), sql_cache=self.cache)
+
+    def test_nodes_are_immutable_and_hashable(self):
+        node = Select(self.table_name, ("id", "name"), "id = %s", None, None, ("id", Order.DESC), 1, None, None)
+
+        self.assertEqual(hash(node), hash(Select(*node)))
+        with self.assertRaises(AttributeError):
+            node.table = "other"
+        with self.assertRaises(AttributeError):
+            node.extra = True
+
+    def test_render_select(self):
+        node = Select(self.table_name, "*", ("a = %s", "b = %s"), "kind", "count(*) > 1", ("id", Order.DESC), 10, 20,
+                      (("recent", "SELECT * FROM events"),))
+
+        self.assertEqual(
+            self.sqlify._render(node),
+            "WITH recent as (SELECT * FROM events) SELECT * FROM test_table WHERE a = %s AND b = %s GROUP BY kind "
+            "HAVING count(*) > 1 ORDER BY id DESC LIMIT 10 OFFSET 20",
+        )
+
+    def test_group_by_string_has_no_trailing_space(self):
+        sql = self.sqlify._select(self.table_name, fields=["kind", "count(*)"], group="kind")
+
+        self.assertEqual(sql, "SELECT kind, count(*) FROM test_table GROUP BY kind")
+
+    def test_order_direction_forms_render_the_same(self):
+        enum = self.sqlify._select(self.table_name, order=("id", Order.DESC))
+        string = self.sqlify._select(self.table_name, order=("id", "DESC"))
+        expression = self.sqlify._select(self.table_name, order="id DESC")
+
+        self.assertEqual(enum, "SELECT * FROM test_table ORDER BY id DESC")
+        self.assertEqual(enum, string)
+        self.assertEqual(enum, expression)
+
+    def test_assignments(self):
+        self.assertEqual(assignments(dict(name="a", price=1)), ("name", "price"))
+        self.assertEqual(
+            assignments(dict(name="a", stock=IncreaseSQL(1), sold=DecreaseSQL(2), updated=RawSQL("now()"))),
+            (
+                "name",
+                Assignment("stock", Assignment.INCREASE, None),
+                Assignment("sold", Assignment.DECREASE, None),
+                Assignment("updated", Assignment.RAW, "now()"),
+            ),
+        )
+
+    def test_render_update(self):
+        node = Update(self.table_name, assignments(dict(name="a", stock=IncreaseSQL(1), updated=RawSQL("now()"))),
+                      ("id = %(id)s",), "id")
+
+        self.assertEqual(
+            self.sqlify._render(node),
+            "UPDATE test_table SET name = %(name_datainput)s, stock = stock + %(stock_datainput)s, updated = now() "
+            "WHERE id = %(id)s RETURNING id",
+        )
+
+    def test_update_and_delete_are_cached(self):
+        data = dict(name="a", stock=IncreaseSQL(1))
+        first = self.sqlify._render_update(self.table_name, data, ["id = %(id)s"])
+        second = self.sqlify._render_update(self.table_name, dict(name="b", stock=IncreaseSQL(5)), ["id = %(id)s"])
+        self.sqlify._render_delete(self.table_name, "id = %s", returning=["id"])
+        self.sqlify._render_delete(self.table_name, "id = %s", returning=["id"])
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.cache.stats["hits"], 2)
+        self.assertEqual(self.cache.stats["misses"], 2)
+
+    def test_raw_sql_is_part_of_the_plan(self):
+        now = self.sqlify._render_update(self.table_name, dict(updated=RawSQL("now()")))
+        today = self.sqlify._render_update(self.table_name, dict(updated=RawSQL("current_date")))
+
+        self.assertEqual(now, "UPDATE test_table SET updated = now()")
+        self.assertEqual(today, "UPDATE test_table SET updated = current_date")
+
+    def test_plans_are_cached_per_dialect(self):
+        sqlite = Sqlite3Sqlify(mock.MagicMock(), sql_cache=self.cache)
+
+        self.assertEqual(self.sqlify._render_delete(self.table_name, "id = %s"), "DELETE FROM test_table WHERE id = %s")
+        self.assertEqual(
+            sqlite._render_update(self.table_name, dict(name="a")), "UPDATE test_table SET name = :name_datainput"
+        )
+        self.assertEqual(
+            self.sqlify._render_update(self.table_name, dict(name="a")),
+            "UPDATE test_table SET name = %(name_datainput)s",
+        )
+        self.assertEqual(self.cache.stats["misses"], 3)
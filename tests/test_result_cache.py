@@ -0,0 +1,135 @@
+import sqlite3
+from unittest import TestCase, mock
+
+from sqlify import Sqlite3Sqlify, ResultCache, MemoryBackend, RowFormat
+from sqlify.result_cache import tables_of
+
+
+class TestResultCache(TestCase):
+    table_name = "countries"
+
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:")
+        self.cache = ResultCache(tables=dict(countries=60))
+        self.sqlify = Sqlite3Sqlify(self.connection.cursor(), result_cache=self.cache)
+        self.sqlify.create(self.table_name, "code TEXT PRIMARY KEY, name TEXT")
+        self.sqlify.bulk_insert(self.table_name, [dict(code="pt", name="Portugal"), dict(code="es", name="Spain")])
+        self.sqlify.create("cities", "name TEXT")
+        self.sqlify.commit()
+        self.cache.clear()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_repeated_read_is_a_hit(self):
+        with mock.patch.object(self.sqlify, "execute", wraps=self.sqlify.execute) as execute:
+            first = self.sqlify.fetchone(self.table_name, where=("code = ?", ["pt"]))
+            second = self.sqlify.fetchone(self.table_name, where=("code = ?", ["pt"]))
+            self.sqlify.fetchone(self.table_name, where=("code = ?", ["es"]))
+
+        self.assertEqual(first, ("pt", "Portugal"))
+        self.assertEqual(second, first)
+        self.assertEqual(execute.call_count, 2)
+        self.assertEqual(self.cache.stats["hits"], 1)
+        self.assertEqual(self.cache.stats["misses"], 2)
+
+    def test_tables_without_ttl_are_not_cached(self):
+        self.sqlify.fetchall("cities")
+        self.sqlify.fetchall("cities")
+
+        self.assertEqual(self.cache.stats["hits"] + self.cache.stats["misses"], 0)
+
+        self.sqlify.fetchall("cities", cache_ttl=10)
+        self.sqlify.fetchall("cities", cache_ttl=10)
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_writes_invalidate_the_table(self):
+        self.assertEqual(len(self.sqlify.fetchall(self.table_name)), 2)
+
+        self.sqlify.insert(self.table_name, dict(code="fr", name="France"))
+        self.assertEqual(len(self.sqlify.fetchall(self.table_name)), 3)
+
+        self.sqlify.update(self.table_name, dict(name="França"), where=("code = :code", dict(code="fr")))
+        self.assertIn(("fr", "França"), self.sqlify.fetchall(self.table_name))
+
+        self.sqlify.delete(self.table_name, where=("code = ?", ["fr"]))
+        self.assertEqual(len(self.sqlify.fetchall(self.table_name)), 2)
+
+        self.assertEqual(self.cache.stats["hits"], 0)
+        self.assertEqual(self.cache.stats["invalidations"], 3)
+
+    def test_joined_tables_are_invalidated(self):
+        table = "cities JOIN countries ON countries.name = cities.name"
+        self.assertEqual(self.sqlify.fetchall(table), [])
+
+        self.sqlify.insert("cities", dict(name="Spain"))
+        self.assertEqual(len(self.sqlify.fetchall(table)), 1)
+
+    def test_expired_results_are_refreshed(self):
+        with mock.patch("sqlify.result_cache.time.monotonic", return_value=0):
+            self.sqlify.fetchall(self.table_name)
+        self.sqlify.execute("DELETE FROM countries")
+
+        with mock.patch("sqlify.result_cache.time.monotonic", return_value=30):
+            self.assertEqual(len(self.sqlify.fetchall(self.table_name)), 2)
+        with mock.patch("sqlify.result_cache.time.monotonic", return_value=61):
+            self.assertEqual(self.sqlify.fetchall(self.table_name), [])
+
+    def test_uncommitted_writes_are_not_cached(self):
+        self.assertEqual(len(self.sqlify.fetchall(self.table_name)), 2)
+
+        self.sqlify.insert(self.table_name, dict(code="fr", name="France"))
+        self.assertEqual(len(self.sqlify.fetchall(self.table_name)), 3)
+        self.sqlify.rollback()
+
+        self.assertEqual(len(self.sqlify.fetchall(self.table_name)), 2)
+        self.assertEqual(len(self.sqlify.fetchall(self.table_name)), 2)
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+        with self.assertRaises(KeyError):
+            with self.sqlify.transaction():
+                self.sqlify.insert(self.table_name, dict(code="fr", name="France"))
+                self.sqlify.fetchall(self.table_name)
+                raise KeyError
+        self.assertEqual(len(self.sqlify.fetchall(self.table_name)), 2)
+
+    def test_cached_lists_are_copies(self):
+        self.sqlify.fetchall(self.table_name).clear()
+
+        self.assertEqual(len(self.sqlify.fetchall(self.table_name)), 2)
+
+    def test_cached_rows_and_columns_are_copies(self):
+        self.connection.row_factory = lambda cursor, row: dict(zip([c[0] for c in cursor.description], row))
+        sqlify = Sqlite3Sqlify(self.connection.cursor(), result_cache=self.cache)
+        sqlify.fetchall(self.table_name, order="code")[0]["name"] = "changed"
+        sqlify.fetchone(self.table_name, order="code")["name"] = "changed"
+        self.assertEqual(sqlify.fetchall(self.table_name, order="code")[0]["name"], "Spain")
+        self.assertEqual(sqlify.fetchone(self.table_name, order="code")["name"], "Spain")
+
+        columnar = Sqlite3Sqlify(self.connection.cursor(), result_cache=self.cache, row_format=RowFormat.COLUMNAR)
+        columnar.fetchall(self.table_name, order="code")["name"].append("changed")
+        self.assertEqual(columnar.fetchall(self.table_name, order="code")["name"], ["Spain", "Portugal"])
+
+    def test_row_formats_are_cached_apart(self):
+        columnar = Sqlite3Sqlify(self.connection.cursor(), result_cache=self.cache, row_format=RowFormat.COLUMNAR)
+
+        self.assertEqual(self.sqlify.fetchall(self.table_name, order="code"), [("es", "Spain"), ("pt", "Portugal")])
+        self.assertEqual(columnar.fetchall(self.table_name, order="code"),
+                         dict(code=["es", "pt"], name=["Spain", "Portugal"]))
+        self.assertEqual(self.cache.stats["misses"], 2)
+
+    def test_lru_bound(self):
+        cache = ResultCache(MemoryBackend(maxsize=1), ttl=60)
+        sqlify = Sqlite3Sqlify(self.connection.cursor(), result_cache=cache)
+
+        sqlify.fetchone(self.table_name, where=("code = ?", ["pt"]))
+        sqlify.fetchone(self.table_name, where=("code = ?", ["es"]))
+
+        self.assertEqual(cache.stats["size"], 1)
+        self.assertEqual(cache.stats["evictions"], 1)
+
+    def test_tables_of(self):
+        self.assertEqual(
+            tables_of('"Books" b JOIN authors a ON a.id = b.author_id', dict(recent="SELECT * FROM sales")),
+            ("authors", "books", "sales"),
+        )
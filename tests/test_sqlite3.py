@@ -0,0 +1,310 @@
+import io
+import sqlite3
+from unittest import TestCase
+
+import dataclasses
+
+from sqlify import Sqlite3Sqlify, DataFormat, RawSQL, IncreaseSQL, RowFormat, Session
+
+
+class TestSqlite3(TestCase):
+    table_name = "books"
+
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:")
+        self.sqlify = Sqlite3Sqlify(self.connection.cursor())
+        self.sqlify.create(self.table_name, "id INTEGER PRIMARY KEY, name TEXT, price REAL")
+
+    def tearDown(self):
+        self.connection.close()
+
+    def rows(self, size: int):
+        return (dict(id=i, name=f"Book {i}", price=i * 1.5) for i in range(1, size + 1))
+
+    def test_bulk_insert_generator(self):
+        inserted = self.sqlify.bulk_insert(self.table_name, self.rows(25), batch_size=10)
+
+        self.assertEqual(inserted, 25)
+        self.assertEqual(self.sqlify.fetchone(self.table_name, fields="count(*)"), (25,))
+
+    def test_bulk_insert_returning(self):
+        rows = self.sqlify.bulk_insert(self.table_name, self.rows(25), returning="id", batch_size=10)
+
+        self.assertEqual(rows, [(i,) for i in range(1, 26)])
+
+    def test_bulk_insert_empty(self):
+        self.assertEqual(self.sqlify.bulk_insert(self.table_name, []), 0)
+        self.assertEqual(self.sqlify.bulk_insert(self.table_name, [], returning="id"), [])
+
+    def test_bulk_insert_mismatched_rows(self):
+        with self.assertRaises(ValueError):
+            self.sqlify.bulk_insert(self.table_name, [dict(id=1, name="a"), dict(id=2)])
+
+    def test_prepare_fetchone(self):
+        self.sqlify.bulk_insert(self.table_name, self.rows(5))
+        query = self.sqlify.prepare("fetchone", self.table_name, fields=["id", "name"], where="id = :id")
+
+        self.assertEqual(query(dict(id=2)), (2, "Book 2"))
+        self.assertEqual(query(dict(id=4)), (4, "Book 4"))
+        self.assertIsNone(query(dict(id=10)))
+
+    def test_prepare_delete(self):
+        self.sqlify.bulk_insert(self.table_name, self.rows(5))
+        query = self.sqlify.prepare("delete", self.table_name, where="id > ?")
+
+        self.assertEqual(query([3]), 2)
+
+    def test_iterate_in_batches(self):
+        self.sqlify.bulk_insert(self.table_name, self.rows(25))
+        rows = self.sqlify.iterate(self.table_name, fields="id", where=("id > ?", [5]), order="id", batch_size=4)
+
+        self.assertEqual(next(rows), (6,))
+        # The main cursor stays usable while iterating
+        self.assertEqual(self.sqlify.fetchone(self.table_name, fields="count(*)"), (25,))
+        self.assertEqual(list(rows), [(i,) for i in range(7, 26)])
+
+    def test_paginate_composite_key(self):
+        self.sqlify.bulk_insert(self.table_name, (dict(id=i, name=f"Book {i % 3}", price=i) for i in range(1, 11)))
+
+        first = self.sqlify.paginate(self.table_name, key=["name", "id"], fields=["id", "name"], page_size=4)
+        second = self.sqlify.paginate(
+            self.table_name, key=["name", "id"], fields=["id", "name"], page_size=4, cursor=first.cursor
+        )
+
+        self.assertEqual([row[0] for row in first], [3, 6, 9, 1])
+        self.assertEqual([row[0] for row in second], [4, 7, 10, 2])
+        self.assertTrue(second.has_next)
+
+    def test_iterate_pages_descending_with_where(self):
+        self.sqlify.bulk_insert(self.table_name, self.rows(10))
+
+        pages = list(self.sqlify.iterate_pages(
+            self.table_name, key="id", where=("price > :price", dict(price=3)), direction="desc", page_size=3,
+        ))
+
+        self.assertEqual([[row[0] for row in page] for page in pages], [[10, 9, 8], [7, 6, 5], [4, 3]])
+        self.assertIsNone(pages[-1].cursor)
+
+    def test_paginate_key_not_selected(self):
+        self.sqlify.bulk_insert(self.table_name, self.rows(3))
+
+        with self.assertRaises(ValueError):
+            self.sqlify.paginate(self.table_name, key="id", fields="name", page_size=1)
+
+    def test_export_and_load_csv(self):
+        self.sqlify.bulk_insert(self.table_name, self.rows(5))
+        self.sqlify.update(self.table_name, data=dict(name=None), where=("id = :id", dict(id=3)))
+        file = io.StringIO()
+
+        exported = self.sqlify.export(self.table_name, file, where=("id > ?", [1]), order="id", batch_size=2)
+
+        self.assertEqual(exported, 4)
+        self.assertEqual(file.getvalue().splitlines()[:3], ["id,name,price", "2,Book 2,3.0", "3,,4.5"])
+
+        self.sqlify.delete(self.table_name)
+        file.seek(0)
+        self.assertEqual(self.sqlify.load(self.table_name, file, batch_size=3), 4)
+        self.assertEqual(
+            self.sqlify.fetchall(self.table_name, fields=["id", "name"], order="id"),
+            [(2, "Book 2"), (3, None), (4, "Book 4"), (5, "Book 5")],
+        )
+
+    def test_csv_keeps_empty_strings_apart_from_null(self):
+        self.sqlify.bulk_insert(self.table_name, [
+            dict(id=1, name="", price=None), dict(id=2, name=None, price=1.5), dict(id=3, name='a, "quoted"\nline', price=2.0),
+        ])
+        file = io.StringIO()
+        self.sqlify.export(self.table_name, file, order="id")
+
+        self.assertEqual(file.getvalue().splitlines()[1:3], ['1,"",', "2,,1.5"])
+
+        self.sqlify.delete(self.table_name)
+        file.seek(0)
+        self.assertEqual(self.sqlify.load(self.table_name, file), 3)
+        self.assertEqual(
+            self.sqlify.fetchall(self.table_name, fields=["id", "name", "price"], order="id"),
+            [(1, "", None), (2, None, 1.5), (3, 'a, "quoted"\nline', 2.0)],
+        )
+
+        chunks = list(self.sqlify.export(self.table_name, fields="name", order="id", header=False))
+        self.assertEqual("".join(chunks), '""\n\n"a, ""quoted""\nline"\n')
+        self.sqlify.delete(self.table_name)
+        self.assertEqual(self.sqlify.load(self.table_name, iter(chunks), columns=["name"], header=False), 3)
+        self.assertEqual(self.sqlify.fetchall(self.table_name, fields="name", order="id"),
+                         [("",), (None,), ('a, "quoted"\nline',)])
+
+    def test_bulk_update_in_batches(self):
+        self.sqlify.bulk_insert(self.table_name, self.rows(5))
+
+        updated = self.sqlify.bulk_update(
+            self.table_name,
+            (dict(id=i, price=i * 10.0) for i in range(2, 7)),
+            key="id",
+            batch_size=2,
+        )
+
+        self.assertEqual(updated, 4)
+        self.assertEqual(
+            self.sqlify.fetchall(self.table_name, fields="price", order="id"),
+            [(1.5,), (20.0,), (30.0,), (40.0,), (50.0,)],
+        )
+
+    def test_bulk_update_case_form(self):
+        self.sqlify._update_from = False
+        self.sqlify.bulk_insert(self.table_name, self.rows(3))
+
+        updated = self.sqlify.bulk_update(
+            self.table_name,
+            [dict(id=1, name="One", price=1.0), dict(id=3, name="Three", price=3.0)],
+            key="id",
+        )
+
+        self.assertEqual(updated, 2)
+        self.assertEqual(
+            self.sqlify.fetchall(self.table_name, order="id"),
+            [(1, "One", 1.0), (2, "Book 2", 3.0), (3, "Three", 3.0)],
+        )
+
+    def test_bulk_update_composite_key(self):
+        for update_from in (True, False):
+            self.sqlify._update_from = update_from
+            self.sqlify.delete(self.table_name)
+            self.sqlify.bulk_insert(self.table_name, self.rows(3))
+
+            updated = self.sqlify.bulk_update(
+                self.table_name, [dict(id=2, name="Book 2", price=0.0), dict(id=3, name="Other", price=0.0)],
+                key=["id", "name"],
+            )
+
+            self.assertEqual(updated, 1)
+            self.assertEqual(self.sqlify.fetchall(self.table_name, fields="price", order="id"),
+                             [(1.5,), (0.0,), (4.5,)])
+
+    def test_row_format_namedtuple(self):
+        sqlify = Sqlite3Sqlify(self.connection.cursor(), row_format="namedtuple")
+        sqlify.bulk_insert(self.table_name, self.rows(2))
+
+        book = sqlify.fetchone(self.table_name, where=("id = ?", [1]))
+        self.assertEqual((book.id, book.name, book.price), (1, "Book 1", 1.5))
+        self.assertIs(type(sqlify.fetchall(self.table_name)[0]), type(book))
+
+        inserted = sqlify.insert(self.table_name, dict(name="New"), returning="id, name")
+        self.assertEqual(inserted._asdict(), dict(id=3, name="New"))
+
+    def test_row_format_slots(self):
+        sqlify = Sqlite3Sqlify(self.connection.cursor(), row_format=RowFormat.SLOTS)
+        sqlify.bulk_insert(self.table_name, self.rows(2))
+
+        books = sqlify.update(self.table_name, dict(price=1.0), returning="id, price")
+        self.assertEqual([(book.id, book.price) for book in books], [(1, 1.0), (2, 1.0)])
+        self.assertTrue(dataclasses.is_dataclass(books[0]))
+        self.assertFalse(hasattr(books[0], "__dict__"))
+
+        count = sqlify.fetchone(self.table_name, fields="count(*)")
+        self.assertEqual(count._0, 2)
+
+    def test_row_format_columnar(self):
+        with Session(self.connection, row_format=RowFormat.COLUMNAR) as sqlify:
+            sqlify.bulk_insert(self.table_name, self.rows(3))
+
+            self.assertEqual(
+                sqlify.fetchall(self.table_name, fields=["id", "price"], order="id"),
+                dict(id=[1, 2, 3], price=[1.5, 3.0, 4.5]),
+            )
+            self.assertEqual(sqlify.fetchall(self.table_name, where="id > 3"), dict(id=[], name=[], price=[]))
+            self.assertEqual(sqlify.fetchone(self.table_name, where="id = 1"), dict(id=1, name="Book 1", price=1.5))
+            self.assertIsNone(sqlify.fetchone(self.table_name, where="id > 3"))
+
+    def test_row_format_of_streams_pages_and_bulk_returning(self):
+        sqlify = Sqlite3Sqlify(self.connection.cursor(), row_format=RowFormat.NAMEDTUPLE)
+
+        inserted = sqlify.bulk_insert(self.table_name, self.rows(3), returning=["id", "name"], batch_size=2)
+        self.assertEqual([row._asdict() for row in inserted], [dict(id=i, name=f"Book {i}") for i in range(1, 4)])
+
+        upserted = sqlify.upsert(self.table_name, [dict(id=1, name="New", price=0.0)], conflict_target="id",
+                                 returning="id, name")
+        self.assertEqual(upserted[0]._asdict(), dict(id=1, name="New"))
+
+        self.assertEqual([book.id for book in sqlify.iterate(self.table_name, order="id", batch_size=2)], [1, 2, 3])
+
+        page = sqlify.paginate(self.table_name, key="id", page_size=2)
+        self.assertEqual([book.name for book in page.rows], ["New", "Book 2"])
+        page = sqlify.paginate(self.table_name, key="id", page_size=2, cursor=page.cursor)
+        self.assertEqual([book.id for book in page.rows], [3])
+
+    def test_row_format_columnar_streams_and_pages(self):
+        sqlify = Sqlite3Sqlify(self.connection.cursor(), row_format=RowFormat.COLUMNAR)
+        inserted = sqlify.bulk_insert(self.table_name, self.rows(3), returning="id", batch_size=2)
+        self.assertEqual(inserted, dict(id=[1, 2, 3]))
+
+        self.assertEqual(list(sqlify.iterate(self.table_name, fields="id", order="id", batch_size=2)),
+                         [dict(id=1), dict(id=2), dict(id=3)])
+
+        pages = list(sqlify.iterate_pages(self.table_name, key="id", fields=["id", "price"], page_size=2))
+        self.assertEqual([page.rows for page in pages], [dict(id=[1, 2], price=[1.5, 3.0]), dict(id=[3], price=[4.5])])
+        self.assertEqual([len(page) for page in pages], [2, 1])
+        self.assertEqual(list(sqlify.iterate_pages(self.table_name, key="id", where="id > 3")), [])
+
+    def test_row_format_from_dict_rows(self):
+        self.connection.row_factory = lambda cursor, row: dict(zip([c[0] for c in cursor.description], row))
+        sqlify = Sqlite3Sqlify(self.connection.cursor(), row_format=RowFormat.TUPLE)
+        sqlify.bulk_insert(self.table_name, self.rows(2))
+
+        self.assertEqual(sqlify.fetchall(self.table_name, fields="id"), [(1,), (2,)])
+
+    def test_fetch_arrays(self):
+        self.sqlify.bulk_insert(self.table_name, self.rows(5))
+
+        arrays = self.sqlify.fetch_arrays(
+            self.table_name, fields=["id", "price"], where="id > 1", order="id", batch_size=2
+        )
+
+        self.assertEqual(list(arrays), ["id", "price"])
+        self.assertEqual(list(arrays["id"]), [2, 3, 4, 5])
+        self.assertEqual(list(arrays["price"]), [3.0, 4.5, 6.0, 7.5])
+
+    def test_batch_runs_sequentially(self):
+        self.sqlify.bulk_insert(self.table_name, self.rows(3))
+
+        with self.sqlify.batch() as batch:
+            book = batch.fetchone(self.table_name, fields="name", where=("id = ?", [2]))
+            books = batch.fetchall(self.table_name, fields="id", order="id")
+            with self.assertRaises(RuntimeError):
+                book.result()
+
+        self.assertEqual(book.result(), ("Book 2",))
+        self.assertEqual(books.result(), [(1,), (2,), (3,)])
+
+    def test_export_ndjson_chunks_and_load(self):
+        self.sqlify.bulk_insert(self.table_name, self.rows(5))
+
+        chunks = list(self.sqlify.export(self.table_name, format="ndjson", batch_size=2))
+
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[0].splitlines()[0], '{"id":1,"name":"Book 1","price":1.5}')
+
+        self.sqlify.delete(self.table_name)
+        self.assertEqual(self.sqlify.load(self.table_name, iter(chunks), format=DataFormat.NDJSON), 5)
+        self.assertEqual(self.sqlify.fetchone(self.table_name, fields="count(*)"), (5,))
+
+    def test_binary_export_is_postgres_only(self):
+        with self.assertRaises(NotImplementedError):
+            self.sqlify.export(self.table_name, io.BytesIO(), format=DataFormat.BINARY)
+
+    def test_upsert_in_batches(self):
+        self.sqlify.bulk_insert(self.table_name, self.rows(3))
+
+        affected = self.sqlify.upsert(
+            self.table_name,
+            (dict(id=i, name=f"New {i}", price=1) for i in range(2, 7)),
+            conflict_target="id",
+            update_fields=dict(name=RawSQL("excluded.name"), price=IncreaseSQL(10)),
+            batch_size=2,
+        )
+
+        self.assertEqual(affected, 5)
+        self.assertEqual(
+            self.sqlify.fetchall(self.table_name, order="id"),
+            [(1, "Book 1", 1.5), (2, "New 2", 13.0), (3, "New 3", 14.5), (4, "New 4", 1.0), (5, "New 5", 1.0),
+             (6, "New 6", 1.0)],
+        )
@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase, mock
+
+from sqlify import Psycopg2Sqlify, Session, Sqlite3Sqlify
+
+
+class TestSqlite3Transactions(TestCase):
+    table_name = "books"
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.connection = sqlite3.connect(self.path)
+        self.sqlify = Sqlite3Sqlify(self.connection.cursor())
+        self.sqlify.create(self.table_name, "id INTEGER PRIMARY KEY, name TEXT")
+        self.connection.commit()
+
+        # Reads through a second connection only see committed rows
+        self.reader = Sqlite3Sqlify(sqlite3.connect(self.path).cursor())
+
+    def tearDown(self):
+        self.reader._cursor.connection.close()
+        self.connection.close()
+        os.remove(self.path)
+
+    def committed(self):
+        return self.reader.fetchall(self.table_name, fields="name", order="id")
+
+    def test_transaction_commits(self):
+        with self.sqlify.transaction():
+            self.sqlify.insert(self.table_name, dict(name="a"))
+            self.assertEqual(self.committed(), [])
+
+        self.assertEqual(self.committed(), [("a",)])
+
+    def test_transaction_rolls_back(self):
+        with self.assertRaises(ZeroDivisionError):
+            with self.sqlify.transaction():
+                self.sqlify.insert(self.table_name, dict(name="a"))
+                1 / 0
+
+        self.assertEqual(self.sqlify.fetchall(self.table_name), [])
+
+    def test_nested_transaction_is_a_savepoint(self):
+        with self.sqlify.transaction():
+            self.sqlify.insert(self.table_name, dict(name="a"))
+            with self.assertRaises(ValueError):
+                with self.sqlify.transaction():
+                    self.sqlify.insert(self.table_name, dict(name="b"))
+                    raise ValueError()
+            with self.sqlify.savepoint():
+                self.sqlify.insert(self.table_name, dict(name="c"))
+
+        self.assertEqual(self.committed(), [("a",), ("c",)])
+
+    def test_commit_every(self):
+        with self.sqlify.commit_every(2) as batch:
+            for name in "abc":
+                self.sqlify.insert(self.table_name, dict(name=name))
+                batch.step()
+                if name == "c":
+                    self.assertEqual(self.committed(), [("a",), ("b",)])
+
+        self.assertEqual(batch.commits, 2)
+        self.assertEqual(self.committed(), [("a",), ("b",), ("c",)])
+
+    def test_commit_every_rolls_back_the_pending_steps(self):
+        with self.assertRaises(RuntimeError):
+            with self.sqlify.commit_every(2) as batch:
+                for name in "abc":
+                    self.sqlify.insert(self.table_name, dict(name=name))
+                    batch.step()
+                raise RuntimeError()
+
+        self.assertEqual(self.committed(), [("a",), ("b",)])
+
+    def test_commit_every_inside_a_transaction(self):
+        with self.sqlify.transaction():
+            with self.assertRaises(RuntimeError):
+                with self.sqlify.commit_every(10):
+                    pass
+
+    def test_session_rolls_back_on_exceptions(self):
+        with self.assertRaises(ValueError):
+            with Session(sqlite3.connect(self.path)) as sqlify:
+                sqlify.insert(self.table_name, dict(name="a"))
+                raise ValueError()
+
+        self.assertEqual(self.committed(), [])
+
+
+class TestPsycopg2Transactions(TestCase):
+    def setUp(self):
+        self.cursor = mock.MagicMock()
+        self.sqlify = Psycopg2Sqlify(self.cursor)
+
+    def statements(self):
+        return [call[0][0] for call in self.cursor.execute.call_args_list]
+
+    def test_autocommit_connection_uses_statements(self):
+        self.cursor.connection.autocommit = True
+
+        with self.sqlify.transaction():
+            with self.sqlify.savepoint("inner"):
+                self.sqlify.execute("SELECT 1")
+
+        self.assertEqual(
+            self.statements(), ["BEGIN", "SAVEPOINT inner", "SELECT 1", "RELEASE SAVEPOINT inner", "COMMIT"]
+        )
+
+    def test_implicit_transaction_uses_the_connection(self):
+        self.cursor.connection.autocommit = False
+
+        with self.assertRaises(ValueError):
+            with self.sqlify.transaction():
+                self.sqlify.execute("SELECT 1")
+                raise ValueError()
+
+        self.assertEqual(self.statements(), ["SELECT 1"])
+        self.cursor.connection.rollback.assert_called_once()
+        self.cursor.connection.commit.assert_not_called()
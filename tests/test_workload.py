@@ -0,0 +1,183 @@
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase, mock
+
+from sqlify import Migrations, Psycopg2Sqlify, Sqlite3Sqlify, QueryShape, WorkloadRecorder
+from sqlify.query import Delete, Select
+from sqlify.workload import index_definition_columns, shapes_of
+
+
+def select(table, where=None, group=None, order=None):
+    return Select(table, "*", where, group, None, order, None, None, None)
+
+
+class TestQueryShapes(TestCase):
+    def test_conditions(self):
+        shapes = shapes_of(select("books", where=("genre = ?", "price > ?", "author_id IN (1, 2)", "name LIKE ?")))
+        self.assertEqual(shapes, [QueryShape("books", ("genre", "author_id"), ("price", "name"), (), ())])
+
+        shapes = shapes_of(select("books", where="genre = %(genre)s AND price BETWEEN 1 AND 5"))
+        self.assertEqual(shapes, [QueryShape("books", ("genre",), ("price",), (), ())])
+
+    def test_conditions_that_cant_use_an_index(self):
+        shapes = shapes_of(select("books", where=("genre = :genre OR id = :id", "lower(name) = :name", "id <> 1")))
+        self.assertEqual(shapes, [])
+
+    def test_order_and_group(self):
+        self.assertEqual(shapes_of(select("books", order=("created", "DESC"))),
+                         [QueryShape("books", (), (), ("created",), ())])
+        self.assertEqual(shapes_of(select("books", order="books.genre, created DESC", group=("genre",))),
+                         [QueryShape("books", (), (), ("genre", "created"), ("genre",))])
+        self.assertEqual(shapes_of(select("books", order="random()")), [])
+
+    def test_joins_are_split_by_table(self):
+        shapes = shapes_of(select(
+            "books b JOIN authors a ON a.id = b.author_id", where=("a.name = ?", "b.price > ?", "genre = ?"),
+            order="b.price",
+        ))
+        self.assertEqual(shapes, [
+            QueryShape("authors", ("name",), (), (), ()),
+            QueryShape("books", (), ("price",), ("price",), ()),
+        ])
+
+    def test_deletes(self):
+        self.assertEqual(shapes_of(Delete("books", "created < ?", None)),
+                         [QueryShape("books", (), ("created",), (), ())])
+
+    def test_postgres_index_definitions(self):
+        self.assertEqual(index_definition_columns("CREATE UNIQUE INDEX books_pkey ON public.books USING btree (id)"),
+                         ("id",))
+        self.assertEqual(
+            index_definition_columns(
+                'CREATE INDEX books_idx ON public.books USING btree ("genre" text_pattern_ops, lower((name)::text), '
+                'created DESC)'
+            ),
+            ("genre", None, "created"),
+        )
+        self.assertIsNone(index_definition_columns("CREATE INDEX books_tags ON public.books USING gin (tags)"))
+        self.assertIsNone(index_definition_columns(
+            "CREATE INDEX books_active ON public.books USING btree (genre) WHERE (active)"
+        ))
+
+
+class TestSqliteIndexAdvisor(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.connection = sqlite3.connect(os.path.join(self.directory.name, "main.db"))
+        self.sqlify = Sqlite3Sqlify(self.connection.cursor())
+        self.sqlify.create("books", "id INTEGER PRIMARY KEY, name TEXT, genre TEXT, price REAL, created TEXT")
+        self.sqlify.execute("CREATE INDEX books_genre ON books (genre)")
+        self.recorder = self.sqlify.record_workload()
+
+    def tearDown(self):
+        self.connection.close()
+        self.directory.cleanup()
+
+    def run_workload(self):
+        for _ in range(3):
+            self.sqlify.fetchall("books", where=("genre = :genre", dict(genre="fiction")), order="created DESC")
+            self.sqlify.fetchone("books", where=("id = :id", dict(id=1)))
+            self.sqlify.fetchall("books", fields=["genre", "count(*)"], group="genre")
+        self.sqlify.delete("books", where=("price < :price", dict(price=1)))
+        self.sqlify.execute("SELECT * FROM books WHERE name = 'raw'")
+
+    def test_shapes_are_recorded_with_timing(self):
+        self.run_workload()
+
+        shapes = self.recorder.shapes()
+        self.assertEqual(len(shapes), 4)
+        stats = shapes[QueryShape("books", ("genre",), (), ("created",), ())]
+        self.assertEqual(stats["count"], 3)
+        self.assertGreater(stats["total"], 0)
+        self.assertEqual(stats["mean"], stats["total"] / 3)
+
+        self.recorder.reset()
+        self.assertEqual(self.recorder.shapes(), {})
+
+    def test_advice_against_existing_indexes(self):
+        self.run_workload()
+
+        report = self.sqlify.advise_indexes()
+
+        self.assertEqual(sorted((advice.table, advice.columns) for advice in report.advice),
+                         [("books", ("genre", "created")), ("books", ("price",))])
+        advice = {advice.columns: advice for advice in report.advice}
+        self.assertEqual(advice[("genre", "created")].extends, "books_genre")
+        self.assertEqual(advice[("genre", "created")].calls, 3)
+        self.assertEqual(advice[("price",)].sql, "CREATE INDEX books_price_idx ON books (price);")
+        self.assertEqual(report.covered, {
+            QueryShape("books", ("id",), (), (), ()): "PRIMARY KEY",
+            QueryShape("books", (), (), (), ("genre",)): "books_genre",
+        })
+
+        self.assertEqual(len(self.sqlify.advise_indexes(min_calls=2).advice), 1)
+
+    def test_advice_migration(self):
+        self.run_workload()
+        migrations = Migrations(os.path.join(self.directory.name, "migrations"), self.sqlify)
+
+        path = self.sqlify.advise_indexes().write_migration(migrations)
+        with open(path) as f:
+            content = f.read()
+        self.assertIn("-- 3 calls", content)
+        self.assertIn("CREATE INDEX books_genre_created_idx ON books (genre, created);", content)
+
+        migrations.migrate()
+        report = self.sqlify.advise_indexes()
+        self.assertEqual(report.advice, [])
+        self.assertIsNone(report.write_migration(migrations))
+        self.assertEqual(report.covered[QueryShape("books", ("genre",), (), ("created",), ())],
+                         "books_genre_created_idx")
+
+    def test_shared_recorder(self):
+        other = Sqlite3Sqlify(self.connection.cursor())
+        other.record_workload(self.recorder)
+
+        self.sqlify.fetchone("books", where=("id = :id", dict(id=1)))
+        other.fetchone("books", where=("id = :id", dict(id=2)))
+
+        self.assertEqual(self.recorder.shapes()[QueryShape("books", ("id",), (), (), ())]["count"], 2)
+
+    def test_statements_are_bounded(self):
+        recorder = self.sqlify.record_workload(WorkloadRecorder(maxlen=2))
+
+        self.sqlify.fetchone("books", where=("id = :id", dict(id=1)))
+        self.sqlify.fetchone("books", where=("genre = :genre", dict(genre="a")))
+        self.sqlify.fetchone("books", where=("id = :id", dict(id=2)))
+        self.sqlify.fetchone("books", where=("price = :price", dict(price=1)))
+
+        self.assertEqual(len(recorder._statements), 2)
+        self.assertEqual([shapes[0].equality for shapes in recorder._statements.values()], [("id",), ("price",)])
+        self.assertEqual(len(recorder.shapes()), 3)
+
+    def test_requires_a_recorder(self):
+        with self.assertRaises(ValueError):
+            Sqlite3Sqlify(self.connection.cursor()).advise_indexes()
+
+
+class TestPostgresIndexAdvisor(TestCase):
+    def test_indexes_from_pg_indexes(self):
+        connection = mock.MagicMock()
+        index_cursor = connection.cursor.return_value
+        index_cursor.fetchall.return_value = [
+            ("books", "books_pkey", "CREATE UNIQUE INDEX books_pkey ON public.books USING btree (id)"),
+            ("books", "books_tags", "CREATE INDEX books_tags ON public.books USING gin (tags)"),
+            ("authors", None, None),
+        ]
+        cursor = mock.MagicMock()
+        cursor.connection = connection
+        sqlify = Psycopg2Sqlify(cursor)
+
+        recorder = WorkloadRecorder()
+        sqlify.record_workload(recorder)
+        sqlify.fetchone("books", where=("id = %(id)s", dict(id=1)))
+        sqlify.fetchall("authors", where=("name = %(name)s", dict(name="a")))
+        sqlify.fetchall("missing", where=("name = %(name)s", dict(name="a")))
+
+        report = sqlify.advise_indexes()
+
+        self.assertIn("pg_indexes", index_cursor.execute.call_args[0][0])
+        self.assertEqual(sorted(index_cursor.execute.call_args[0][1][0]), ["authors", "books", "missing"])
+        self.assertEqual([advice.sql for advice in report.advice], ["CREATE INDEX authors_name_idx ON authors (name);"])
+        self.assertEqual(list(report.covered.values()), ["books_pkey"])